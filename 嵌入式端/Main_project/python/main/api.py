@@ -1,9 +1,11 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
 from typing import List, Dict, Any
 import json
 import asyncio
 from pydantic import BaseModel
 
+import metrics
+
 # 创建一个WebSocket连接管理器
 class ConnectionManager:
     def __init__(self):
@@ -26,12 +28,15 @@ class ConnectionManager:
         for connection in self.active_connections:
             try:
                 await connection.send_json(message)
+                metrics.websocket_messages.inc('sent')
             except WebSocketDisconnect:
                 # 捕获断开连接异常，将此连接标记为待移除
+                metrics.websocket_messages.inc('failed')
                 print(f"尝试向已断开的WebSocket连接发送消息失败: {connection.client}. 将移除该连接。")
                 connections_to_remove.append(connection)
             except Exception as e:
                 # 捕获其他可能的发送错误
+                metrics.websocket_messages.inc('failed')
                 print(f"发送WebSocket消息时发生未知错误到 {connection.client}: {e}")
                 connections_to_remove.append(connection) # 同样标记为待移除，以防是持续性问题
 
@@ -41,6 +46,7 @@ class ConnectionManager:
 
 # 创建连接管理器实例
 manager = ConnectionManager()
+metrics.gauge('server_websocket_connections', '当前WebSocket连接数', lambda: len(manager.active_connections))
 
 # 数据模型
 class AudioTextResponse(BaseModel):
@@ -61,6 +67,11 @@ def init_api(app: FastAPI):
         except WebSocketDisconnect:
             manager.disconnect(websocket)
 
+    @app.get("/metrics")
+    async def get_metrics():
+        """Prometheus格式的运行指标"""
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
     @app.get("/api/control/trend/rising")
     async def trend_rising():
         """上升趋势检测 API"""
@@ -0,0 +1,91 @@
+"""
+服务器运行指标
+UDP接收循环和WebSocket推送中只做整数加法和一次二分查找，GET /metrics 时输出Prometheus文本格式
+"""
+
+import math
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 语音识别用时直方图桶上限（秒）
+TRANSCRIBE_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """固定桶直方图（单位为秒）"""
+
+    def __init__(self, buckets):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)   # 最后一个为+Inf桶
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(bound)
+            yield f'{name}_bucket{{le="{le}"}} {cumulative}'
+        yield f'{name}_sum {self.sum!r}'
+        yield f'{name}_count {self.count}'
+
+
+class LabeledCounter:
+    """按一个标签分组的计数器"""
+
+    def __init__(self, label):
+        self.label = label
+        self.values = {}
+
+    def inc(self, value, amount=1):
+        self.values[value] = self.values.get(value, 0) + amount
+
+    def samples(self, name):
+        for value, count in self.values.items():
+            yield f'{name}{{{self.label}="{value}"}} {count}'
+
+
+# 指标名称 -> (类型, 说明, 指标对象或返回当前值的函数)
+_METRICS = {}
+
+
+def _register(name, kind, help_text, metric):
+    _METRICS[name] = (kind, help_text, metric)
+    return metric
+
+
+udp_datagrams = _register('server_udp_datagrams_total', 'counter', '按类型统计的UDP数据报数',
+                          LabeledCounter('kind'))
+udp_bytes = _register('server_udp_bytes_total', 'counter', '按类型统计的UDP字节数', LabeledCounter('kind'))
+udp_errors = _register('server_udp_errors_total', 'counter', 'UDP接收错误数', LabeledCounter('error'))
+trend_events = _register('server_trend_events_total', 'counter', '检测到的控制数据趋势事件数',
+                         LabeledCounter('trend'))
+audio_streams = _register('server_audio_streams_total', 'counter', '按结果统计的音频流数', LabeledCounter('result'))
+transcribe_seconds = _register('server_transcribe_seconds', 'histogram', '语音识别用时',
+                               Histogram(TRANSCRIBE_BUCKETS))
+websocket_messages = _register('server_websocket_messages_total', 'counter', '按结果统计的WebSocket推送消息数',
+                               LabeledCounter('result'))
+
+
+def gauge(name, help_text, func):
+    """注册输出时调用func读取的仪表值"""
+    _register(name, 'gauge', help_text, func)
+
+
+def render():
+    """Prometheus文本格式"""
+    lines = []
+    for name, (kind, help_text, metric) in _METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if callable(metric):
+            lines.append(f'{name} {metric()}')
+        else:
+            lines.extend(metric.samples(name))
+    return '\n'.join(lines) + '\n'
@@ -17,6 +17,7 @@ from datetime import datetime
 
 # 导入API模块
 import api
+import metrics
 
 DEFAULT_IP   = '0.0.0.0'         # IP address of the UDP server
 DEFAULT_PORT = 57345             # Port of the UDP server
@@ -171,6 +172,18 @@ async def echo_server(host, port):
             try:
                 data, addr = await loop.sock_recvfrom(sock, 225000)
 
+                # 按类型统计数据报
+                if data.startswith(b'C'):
+                    kind = 'control'
+                elif data == START_FLAG or data == END_FLAG:
+                    kind = 'flag'
+                elif recording and audio_started:
+                    kind = 'audio'
+                else:
+                    kind = 'ignored'
+                metrics.udp_datagrams.inc(kind)
+                metrics.udp_bytes.inc(kind, len(data))
+
                 # 检查是否是控制数据 (以b'C'开头)
                 if data.startswith(b'C'):
                     try:
@@ -207,6 +220,7 @@ async def echo_server(host, port):
                                 if len(control_history) >= 2:
                                     diff = abs(control_history[-1] - control_history[0])
                                     if diff >= THRESHOLD:
+                                        metrics.trend_events.inc(current_trend)
                                         if current_trend == "rising":
                                             print("True (上升趋势)")
                                             # 调用API返回给前端number:3
@@ -234,6 +248,7 @@ async def echo_server(host, port):
                             asyncio.create_task(api.send_control_stop())
 
                     except (ValueError, UnicodeDecodeError):
+                        metrics.udp_errors.inc('invalid_control')
                         print(f"收到无效控制数据: {data}")
                         # 调用API返回给前端number:-1
                         asyncio.create_task(api.send_control_invalid())
@@ -246,6 +261,7 @@ async def echo_server(host, port):
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         filename = f"audio_{timestamp}.wav"
                         filepath = save_as_wav(buffer, filename)
+                        metrics.audio_streams.inc('replaced')
                         print(f"\n音频文件已保存: {filepath}")
                         print(f"接收到 {packets_received} 个数据包，总大小: {len(buffer)} 字节")
 
@@ -267,7 +283,10 @@ async def echo_server(host, port):
                         print(f"\n收到结束标志，音频文件已保存: {filepath}")
                         print(f"接收到 {packets_received} 个数据包，总大小: {len(buffer)} 字节")
 
+                        transcribe_start = time.perf_counter()
                         text = await loop.run_in_executor(None, audio2text, filepath)
+                        metrics.transcribe_seconds.observe(time.perf_counter() - transcribe_start)
+                        metrics.audio_streams.inc('completed' if text and text != "None" else 'transcribe_failed')
                         print(f"语音识别返回：{text}")
                         asyncio.create_task(api.send_audio_text(text))
 
@@ -287,9 +306,11 @@ async def echo_server(host, port):
             except BlockingIOError:
                 await asyncio.sleep(0.001)  # 短暂休眠，释放控制权
             except ConnectionResetError:
+                metrics.udp_errors.inc('connection_reset')
                 print("客户端已断开连接。")
                 break
             except Exception as e:
+                metrics.udp_errors.inc(type(e).__name__)
                 print(f"发生错误: {e}")
                 break
 
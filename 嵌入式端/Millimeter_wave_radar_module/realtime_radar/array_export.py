@@ -0,0 +1,83 @@
+"""
+数组二进制导出工具
+将numpy数组以原始小端字节流（或.npy格式）的形式通过FastAPI返回，
+数组的形状和数据类型通过响应头传递，避免JSON序列化的开销。
+数组已是所需类型且C连续时直接引用其内存发送，不做拷贝
+"""
+
+import io
+
+import numpy as np
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+# 允许的下采样输出类型
+EXPORT_DTYPES = {
+    'float16': np.dtype('<f2'),
+    'float32': np.dtype('<f4'),
+    'float64': np.dtype('<f8'),
+}
+
+
+# 输出格式: 原始字节流或.npy文件
+EXPORT_FORMATS = ('raw', 'npy')
+
+
+def resolve_export_dtype(dtype_name):
+    """
+    解析请求中的数据类型名称
+
+    参数:
+        dtype_name: 数据类型名称，'float16'、'float32' 或 'float64'
+
+    返回:
+        对应的小端numpy数据类型
+    """
+    if dtype_name not in EXPORT_DTYPES:
+        raise ValueError(f"不支持的数据类型: {dtype_name}，仅支持 {', '.join(EXPORT_DTYPES)}")
+    return EXPORT_DTYPES[dtype_name]
+
+
+def array_response(array, dtype='float32', headers=None, fmt='raw'):
+    """
+    将numpy数组封装为二进制HTTP响应
+
+    参数:
+        array: 要导出的numpy数组（调用方保证之后不再修改，例如只读的结果快照）
+        dtype: 输出数据类型名称，默认float32；None表示保持数组原有的浮点类型
+        headers: 额外的响应头字典
+        fmt: 'raw'（原始字节）或 'npy'（带.npy文件头，可直接np.load）
+
+    返回:
+        FastAPI Response，内容为C顺序的小端数据，
+        响应头X-Array-Shape/X-Array-Dtype描述数组形状和类型
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}，仅支持 {', '.join(EXPORT_FORMATS)}")
+    out_dtype = np.asarray(array).dtype.newbyteorder('<') if dtype is None else resolve_export_dtype(dtype)
+    # 类型相同且已连续时不拷贝
+    data = np.ascontiguousarray(array, dtype=out_dtype)
+    body = memoryview(data).cast('B') if data.size else b''
+
+    response_headers = {
+        'X-Array-Shape': ','.join(str(n) for n in data.shape),
+        'X-Array-Dtype': data.dtype.str,
+    }
+    if headers:
+        response_headers.update({k: str(v) for k, v in headers.items()})
+
+    if fmt == 'raw':
+        return Response(content=body, media_type='application/octet-stream', headers=response_headers)
+
+    # .npy: 先发送文件头，再直接发送数组内存
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, np.lib.format.header_data_from_array_1_0(data))
+    header = header.getvalue()
+    response_headers['Content-Length'] = str(len(header) + data.nbytes)
+    response_headers['Content-Disposition'] = 'attachment; filename="array.npy"'
+
+    async def chunks():
+        yield header
+        yield body
+
+    return StreamingResponse(chunks(), media_type='application/octet-stream', headers=response_headers)
@@ -0,0 +1,132 @@
+"""
+预先计算的DSP计划
+由雷达参数（get_radar_params()）和处理参数一次生成窗函数、检测距离bin范围、bin到距离的换算表、
+角度导向矢量、相位带通滤波器、CWT滤波器组和各阶段的工作数组，流水线的每个阶段都从同一个计划中取用；
+稳态处理步骤只写入这些工作数组，不再分配窗口大小的新数组。
+雷达配置（采样点数、窗口帧数、接收天线数等）变化时重新生成计划。
+工作数组在各步骤之间复用，一个计划只能由一个流水线（一个处理线程）使用
+"""
+
+import numpy as np
+
+from radar_func import (window_function, range_bin_limits, steering_vectors, design_bandpass_sos,
+                        MIN_TARGET_RANGE, MAX_TARGET_RANGE)
+from phase_conditioning import BREATHING_BAND, HEART_BAND, FILTER_ORDER
+from radar_settings import default_rx_positions
+from signal_decomposition import CwtFilterBank
+
+ANGLE_GRID = np.arange(-60, 61, 2)  # 多接收天线时距离-角度图的方位角网格（度）
+
+
+class DspPlan:
+    """一种雷达配置和窗口长度下各处理阶段共用的常量和工作数组"""
+
+    def __init__(self, num_samples, num_frames, frame_rate, range_resolution, wavelength, num_rx=1,
+                 rx_positions=None, window_type='hann', zero_padding_factor=1, cwt_scales=None,
+                 cwt_wavelet='morl', max_targets=1, angle_grid=ANGLE_GRID,
+                 min_range=MIN_TARGET_RANGE, max_range=MAX_TARGET_RANGE, breathing_band=BREATHING_BAND,
+                 heart_band=HEART_BAND, filter_order=FILTER_ORDER):
+        """
+        参数:
+            num_samples: 每根天线每chirp的采样点数
+            num_frames: 处理窗口的帧数
+            frame_rate: 雷达帧率 (Hz)
+            range_resolution: 距离分辨率 (米/bin)
+            wavelength: 雷达波长 (米)
+            num_rx: 接收天线数
+            rx_positions: 各接收天线的水平位置（单位：波长），None使用默认布局（radar_settings.default_rx_positions）
+            window_type: 距离FFT窗函数类型
+            zero_padding_factor: 距离FFT零填充因子
+            cwt_scales: CWT尺度参数，None使用1-64
+            cwt_wavelet: CWT小波类型
+            max_targets: 每个窗口最多处理的目标数（CWT工作数组的大小）
+            angle_grid: 距离-角度图的方位角网格（度）
+            min_range、max_range: 目标检测距离范围（米）
+            breathing_band、heart_band: 相位流呼吸和心跳带通滤波器的通带（Hz）
+            filter_order: 相位流带通滤波器阶数
+        """
+        self.num_samples = num_samples
+        self.num_frames = num_frames
+        self.frame_rate = frame_rate
+        self.range_resolution = range_resolution
+        self.wavelength = wavelength
+        self.num_rx = num_rx
+        self.frame_size = num_samples * num_rx
+        self.max_targets = max_targets
+
+        # 距离FFT
+        self.window_type = window_type
+        self.window = window_function(window_type, num_samples)
+        self.fft_size = num_samples * zero_padding_factor
+        self.bin_limits = range_bin_limits(range_resolution, self.fft_size, min_range, max_range)
+        self.bin_distances = np.arange(self.fft_size) * range_resolution
+
+        # 角度：实数采样的距离谱共轭对称，距离-角度图只使用正频率一半
+        self.angle_range_bins = self.fft_size // 2
+        self.angle_bin_limits = range_bin_limits(range_resolution, self.angle_range_bins, min_range, max_range)
+        self.rx_positions = np.asarray(rx_positions if rx_positions is not None
+                                       else default_rx_positions(num_rx), dtype=float)
+        if len(self.rx_positions) != num_rx:
+            raise ValueError(f"天线位置数 {len(self.rx_positions)} 与接收天线数 {num_rx} 不一致")
+        self.angles = np.deg2rad(np.asarray(angle_grid, dtype=float))
+        self.angles_deg = np.rad2deg(self.angles)
+        self.steering = steering_vectors(self.rx_positions, self.angles)
+
+        # 相位流带通滤波器（二阶节系数和单位稳态状态）
+        self.breathing_band = tuple(breathing_band)
+        self.heart_band = tuple(heart_band)
+        self.breathing_sos, self.breathing_zi = design_bandpass_sos(*breathing_band, frame_rate, filter_order)
+        self.heart_sos, self.heart_zi = design_bandpass_sos(*heart_band, frame_rate, filter_order)
+
+        # CWT滤波器组（第一次使用时生成）
+        self.cwt_scales = np.asarray(cwt_scales if cwt_scales is not None else np.arange(1, 65))
+        self.cwt_wavelet = cwt_wavelet
+        self._cwt_bank = None
+
+        # 工作数组：距离FFT在其中原地计算，MTI滤波也原地写回
+        self.range_cube = np.empty((num_frames, num_rx, 1, self.fft_size), dtype=complex)
+
+    @classmethod
+    def from_params(cls, params, num_frames, **options):
+        """
+        由雷达参数字典（get_radar_params()的返回值）生成计划
+
+        参数:
+            params: 雷达参数字典
+            num_frames: 处理窗口的帧数
+            options: 其余构造参数；num_rx、rx_positions未指定时使用参数中的rx_antennas、rx_positions
+        """
+        num_rx = options.pop('num_rx', None) or params.get('rx_antennas', 1)
+        rx_positions = options.pop('rx_positions', None)
+        if rx_positions is None and params.get('rx_antennas', 1) == num_rx:
+            rx_positions = params.get('rx_positions')
+        return cls(num_samples=params['num_samples'], num_frames=num_frames, frame_rate=params['frame_rate'],
+                   range_resolution=params['range_resolution'], wavelength=params['wavelength'],
+                   num_rx=num_rx, rx_positions=rx_positions, **options)
+
+    def matches(self, num_frames, frame_size):
+        """窗口形状是否与计划一致"""
+        return num_frames == self.num_frames and frame_size == self.frame_size
+
+    @property
+    def cwt_bank(self):
+        """CWT滤波器组（按尺度预先计算的频域小波核和工作数组）"""
+        if self._cwt_bank is None:
+            self._cwt_bank = CwtFilterBank(self.cwt_scales, self.cwt_wavelet, 1.0 / self.frame_rate,
+                                           self.num_frames, self.max_targets)
+        return self._cwt_bank
+
+    def describe(self):
+        """计划的主要参数（用于日志和状态输出）"""
+        return {
+            'num_samples': self.num_samples,
+            'num_frames': self.num_frames,
+            'num_rx': self.num_rx,
+            'fft_size': self.fft_size,
+            'window': self.window_type,
+            'bin_limits': [int(b) for b in self.bin_limits],
+            'breathing_band': list(self.breathing_band),
+            'heart_band': list(self.heart_band),
+            'cwt_scales': len(self.cwt_scales),
+            'work_bytes': int(self.range_cube.nbytes + (self._cwt_bank.nbytes if self._cwt_bank else 0)),
+        }
@@ -0,0 +1,145 @@
+"""
+雷达帧环形缓冲区
+使用预分配的二维numpy数组保存最近的若干帧数据，
+写入时直接拷贝到固定位置，避免逐帧创建新对象
+"""
+
+import threading
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    固定容量的帧环形缓冲区
+    每一行保存一帧数据，写满后覆盖最旧的帧，读取时按时间从旧到新返回副本
+    """
+
+    def __init__(self, capacity, frame_size=None, dtype=np.float32):
+        """
+        初始化环形缓冲区
+
+        参数:
+            capacity: 最多保存的帧数
+            frame_size: 每帧的数据点数，None表示在写入第一帧时确定
+            dtype: 存储的数据类型
+        """
+        self.capacity = capacity
+        self.frame_size = frame_size
+        self.dtype = dtype
+        self._data = None
+        self._write_index = 0   # 下一帧写入位置
+        self._count = 0         # 当前有效帧数
+        self._total = 0         # 累计写入帧数
+        self._last_tag = None   # 最近一帧写入时附带的标记（例如帧号）
+        self._lock = threading.Lock()
+        if frame_size is not None:
+            self._data = np.zeros((capacity, frame_size), dtype=dtype)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def total_frames(self):
+        """累计写入的帧数"""
+        return self._total
+
+    def _ensure_storage(self, frame_size):
+        """按帧长度分配存储空间，帧长度变化时清空缓冲区"""
+        if self._data is None or self.frame_size != frame_size:
+            self.frame_size = frame_size
+            self._data = np.zeros((self.capacity, frame_size), dtype=self.dtype)
+            self._write_index = 0
+            self._count = 0
+
+    def clear(self):
+        """清空缓冲区（保留已分配的存储空间）"""
+        with self._lock:
+            self._write_index = 0
+            self._count = 0
+
+    def append(self, frame, tag=None):
+        """
+        写入一帧数据
+
+        参数:
+            frame: 一维数组，长度为frame_size
+            tag: 可选的帧标记（例如帧号），与帧数据在同一把锁内更新，可由latest_window()一起读出
+        """
+        with self._lock:
+            self._ensure_storage(len(frame))
+            self._data[self._write_index] = frame
+            self._write_index = (self._write_index + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._total += 1
+            self._last_tag = tag
+
+    def extend(self, frames):
+        """
+        写入多帧数据
+
+        参数:
+            frames: 形状为(frames, frame_size)的数组
+        """
+        n = frames.shape[0]
+        if n == 0:
+            return
+        # 超过容量时只保留最新的capacity帧
+        if n > self.capacity:
+            frames = frames[-self.capacity:]
+            n = self.capacity
+
+        with self._lock:
+            self._ensure_storage(frames.shape[1])
+            end = self._write_index + n
+            if end <= self.capacity:
+                self._data[self._write_index:end] = frames
+            else:
+                first = self.capacity - self._write_index
+                self._data[self._write_index:] = frames[:first]
+                self._data[:n - first] = frames[first:]
+            self._write_index = end % self.capacity
+            self._count = min(self._count + n, self.capacity)
+            self._total += frames.shape[0]
+
+    def latest(self, num_frames=None, out=None):
+        """
+        获取最新的若干帧（按时间从旧到新排列的副本）
+
+        参数:
+            num_frames: 帧数，None表示全部有效帧
+            out: 可选的输出数组（至少num_frames行，每行frame_size个点），指定时拷贝到其中，不分配新数组
+
+        返回:
+            形状为(frames, frame_size)的数组（指定out时为out的前frames行）
+        """
+        with self._lock:
+            return self._copy_latest(num_frames, out)
+
+    def latest_window(self, num_frames=None, out=None):
+        """
+        获取最新的若干帧，以及拷贝时的累计帧数和最新帧的标记（三者在同一把锁内读取，属于同一个窗口）
+
+        参数:
+            num_frames、out: 同latest()
+
+        返回:
+            (frames, total_frames, tag)
+        """
+        with self._lock:
+            return self._copy_latest(num_frames, out), self._total, self._last_tag
+
+    def _copy_latest(self, num_frames, out):
+        """拷贝最新的若干帧（调用方持有锁）"""
+        if self._data is None:
+            return np.zeros((0, self.frame_size or 0), dtype=self.dtype)
+        n = self._count if num_frames is None else min(num_frames, self._count)
+        start = (self._write_index - n) % self.capacity
+        if out is not None:
+            out = out[:n]
+            first = min(n, self.capacity - start)
+            out[:first] = self._data[start:start + first]
+            out[first:] = self._data[:n - first]
+            return out
+        if start + n <= self.capacity:
+            return self._data[start:start + n].copy()
+        return np.concatenate((self._data[start:], self._data[:(start + n) % self.capacity]))
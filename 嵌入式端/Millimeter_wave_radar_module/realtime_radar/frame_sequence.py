@@ -0,0 +1,237 @@
+"""
+雷达帧序号跟踪模块
+根据UDP包中的4字节帧号检测丢帧、乱序和重复帧：
+在一个小的抖动窗口内重排乱序帧，缺失的帧在相位域插值补齐以保持时间基准，
+并统计丢帧率和缺口长度分布
+"""
+
+import time
+import numpy as np
+
+FRAME_NUMBER_MOD = 1 << 32      # 帧号为32位无符号整数，会回绕
+REORDER_WINDOW = 4              # 乱序重排窗口（最多等待的帧数）
+REORDER_TIMEOUT = 0.2           # 乱序等待超时（秒），超时后按丢帧处理
+MAX_INTERP_GAP = 3              # 不超过该长度的缺口视为短缺口（插值结果可信）
+RESYNC_GAP = 300                # 帧号跳变超过该值时重新同步（设备重启或长时间中断）
+
+# 缺口长度直方图的分桶上界
+GAP_HISTOGRAM_BUCKETS = (1, 2, 3, 5, 10, 30, 100)
+
+
+def interpolate_frames_phase(prev_frame, next_frame, count):
+    """
+    在相位域对两帧之间的缺失帧进行插值
+
+    对两帧做实数FFT，在每个频点上对幅度线性插值、对相位沿最短路径线性插值，
+    再逆变换回时域，使距离bin上的目标相位平滑过渡
+
+    参数:
+        prev_frame: 缺口前的最后一帧，一维实数数组
+        next_frame: 缺口后的第一帧，与prev_frame等长
+        count: 需要插值生成的帧数
+
+    返回:
+        形状为(count, samples)的float32数组
+    """
+    num_samples = len(prev_frame)
+    prev_spec = np.fft.rfft(prev_frame)
+    next_spec = np.fft.rfft(next_frame)
+
+    alpha = (np.arange(1, count + 1) / (count + 1))[:, np.newaxis]
+    magnitude = (1 - alpha) * np.abs(prev_spec) + alpha * np.abs(next_spec)
+    phase_step = np.angle(next_spec * np.conj(prev_spec))
+    phase = np.angle(prev_spec) + alpha * phase_step
+
+    frames = np.fft.irfft(magnitude * np.exp(1j * phase), n=num_samples, axis=1)
+    return frames.astype(np.float32)
+
+
+class FrameSequencer:
+    """
+    帧序号跟踪和重排器
+
+    按帧号顺序把帧交给output回调：output(frame_number, samples, filled)，
+    filled为True表示该帧是插值补齐的。连续到达的帧直接输出，不做拷贝；
+    只有出现缺口时才缓存后续帧，等待乱序帧到达或超时后补齐缺口
+    """
+
+    def __init__(self, output, on_resync=None, reorder_window=REORDER_WINDOW,
+                 reorder_timeout=REORDER_TIMEOUT, max_interp_gap=MAX_INTERP_GAP,
+                 resync_gap=RESYNC_GAP):
+        """
+        初始化帧序号跟踪器
+
+        参数:
+            output: 按序输出帧的回调 (frame_number, samples, filled)
+            on_resync: 重新同步时的回调（无参数），用于清空下游缓冲区
+            reorder_window: 乱序重排窗口（帧数）
+            reorder_timeout: 乱序等待超时（秒）
+            max_interp_gap: 短缺口的最大长度（帧数）
+            resync_gap: 触发重新同步的帧号跳变（帧数）
+        """
+        self.output = output
+        self.on_resync = on_resync
+        self.reorder_window = reorder_window
+        self.reorder_timeout = reorder_timeout
+        self.max_interp_gap = max_interp_gap
+        self.resync_gap = resync_gap
+
+        self.expected = None            # 下一个应输出的帧号
+        self._pending = {}              # 缺口之后提前到达的帧: 帧号 -> (样本副本, 到达时间)
+        self._last_samples = None       # 最近输出的一帧（用于插值）
+
+        # 统计
+        self.received = 0               # 收到的帧数
+        self.released = 0               # 输出的真实帧数
+        self.reordered = 0              # 乱序到达但在窗口内被重排的帧数
+        self.duplicates = 0             # 等待重排期间收到的重复帧数
+        self.late = 0                   # 该帧号已输出或已补齐后才到达的帧数（被丢弃）
+        self.gaps = 0                   # 缺口次数
+        self.lost = 0                   # 丢失的帧数
+        self.interpolated = 0           # 插值补齐的帧数
+        self.long_gap_frames = 0        # 长缺口中补齐的帧数
+        self.resyncs = 0                # 重新同步次数
+        self.gap_histogram = [0] * (len(GAP_HISTOGRAM_BUCKETS) + 1)
+
+    def _distance(self, frame_number):
+        """帧号相对于期望帧号的有符号距离（考虑32位回绕）"""
+        diff = (frame_number - self.expected) % FRAME_NUMBER_MOD
+        if diff >= FRAME_NUMBER_MOD // 2:
+            diff -= FRAME_NUMBER_MOD
+        return diff
+
+    def push(self, frame_number, samples, arrival_time=None):
+        """
+        输入一帧
+
+        参数:
+            frame_number: 帧号
+            samples: 一维样本数组（可以是只在调用期间有效的视图）
+            arrival_time: 到达时间（秒），默认当前时间
+        """
+        if arrival_time is None:
+            arrival_time = time.monotonic()
+        self.received += 1
+
+        if self.expected is None:
+            self._release(frame_number, samples)
+            return
+
+        distance = self._distance(frame_number)
+
+        if abs(distance) >= self.resync_gap:
+            # 帧号大幅跳变：设备重启或长时间中断，丢弃旧状态重新开始
+            self._resync()
+            self._release(frame_number, samples)
+            return
+
+        if distance < 0:
+            # 该帧号已经输出（或已被插值补齐），迟到或重复的帧直接丢弃
+            self.late += 1
+            return
+
+        if distance == 0:
+            if self._pending:
+                self.reordered += 1
+            self._release(frame_number, samples)
+        elif frame_number in self._pending:
+            self.duplicates += 1
+            return
+        else:
+            # 出现缺口，缓存该帧等待缺失的帧
+            self._pending[frame_number] = (np.array(samples, dtype=np.float32), arrival_time)
+
+        self._drain(arrival_time)
+
+    def _drain(self, now):
+        """输出缓存中已经连续的帧；缓存超过窗口或超时时补齐缺口"""
+        while self._pending:
+            if self.expected in self._pending:
+                samples, _ = self._pending.pop(self.expected)
+                self._release(self.expected, samples)
+                continue
+
+            oldest = min(t for _, t in self._pending.values())
+            if len(self._pending) <= self.reorder_window and now - oldest < self.reorder_timeout:
+                break
+
+            # 放弃等待，补齐到缓存中最早的帧
+            next_number = min(self._pending, key=self._distance)
+            samples, _ = self._pending.pop(next_number)
+            self._fill_gap(self._distance(next_number), samples)
+            self._release(next_number, samples)
+
+    def poll(self, now=None):
+        """
+        检查缓存中的帧是否等待超时（需要定期调用：数据流中断时没有新帧触发push中的超时检查）
+
+        参数:
+            now: 当前时间（秒），与push的arrival_time使用同一时钟，默认当前时间
+        """
+        if self._pending:
+            self._drain(time.monotonic() if now is None else now)
+
+    def flush(self):
+        """立即补齐所有缺口并输出缓存的帧（例如数据流结束时）"""
+        self._drain(float('inf'))
+
+    def _release(self, frame_number, samples):
+        """按序输出一帧真实数据"""
+        self.output(frame_number, samples, False)
+        self.released += 1
+        if self._last_samples is None or len(self._last_samples) != len(samples):
+            self._last_samples = np.empty(len(samples), dtype=np.float32)
+        self._last_samples[:] = samples
+        self.expected = (frame_number + 1) % FRAME_NUMBER_MOD
+
+    def _fill_gap(self, gap, next_samples):
+        """在相位域插值补齐gap个缺失帧"""
+        self.gaps += 1
+        self.lost += gap
+        bucket = np.searchsorted(GAP_HISTOGRAM_BUCKETS, gap)
+        self.gap_histogram[bucket] += 1
+
+        if self._last_samples is None or len(self._last_samples) != len(next_samples):
+            return
+
+        filled = interpolate_frames_phase(self._last_samples, next_samples, gap)
+        for i in range(gap):
+            self.output((self.expected + i) % FRAME_NUMBER_MOD, filled[i], True)
+        self.interpolated += gap
+        if gap > self.max_interp_gap:
+            self.long_gap_frames += gap
+
+    def _resync(self):
+        """丢弃缓存和期望帧号，通知下游清空缓冲区"""
+        self.resyncs += 1
+        self._pending.clear()
+        self._last_samples = None
+        self.expected = None
+        if self.on_resync is not None:
+            self.on_resync()
+
+    def get_stats(self):
+        """统计数据字典（用于API输出）"""
+        expected_frames = self.released + self.lost
+        labels = []
+        lower = 1
+        for upper in GAP_HISTOGRAM_BUCKETS:
+            labels.append(str(upper) if upper == lower else f"{lower}-{upper}")
+            lower = upper + 1
+        labels.append(f">{GAP_HISTOGRAM_BUCKETS[-1]}")
+
+        return {
+            'received': self.received,
+            'released': self.released,
+            'lost': self.lost,
+            'loss_rate': self.lost / expected_frames if expected_frames else 0.0,
+            'interpolated': self.interpolated,
+            'long_gap_frames': self.long_gap_frames,
+            'gaps': self.gaps,
+            'reordered': self.reordered,
+            'late': self.late,
+            'duplicates': self.duplicates,
+            'resyncs': self.resyncs,
+            'pending': len(self._pending),
+            'gap_histogram': dict(zip(labels, self.gap_histogram)),
+        }
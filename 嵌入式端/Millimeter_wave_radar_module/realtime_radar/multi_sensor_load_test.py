@@ -0,0 +1,108 @@
+"""
+多雷达服务负载测试
+在本机启动MultiSensorRadarServer，用N个模拟雷达（各自独立的UDP源端口）以雷达帧率发送数据，
+统计接收/处理情况和CPU占用，估算单核可以承载的传感器数量
+"""
+
+import argparse
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+
+import realtime_radar_processing as rrp
+from multi_sensor_server import MultiSensorRadarServer
+from radar_simulator import UdpLoadGenerator
+
+
+def cpu_seconds():
+    """当前进程（含所有线程）已使用的CPU时间"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_load_test(num_sensors, duration, port, workers, load_models, warmup):
+    """
+    执行一次负载测试
+
+    返回:
+        测试结果字典
+    """
+    server = MultiSensorRadarServer(port=port, workers=workers, max_sensors=num_sensors,
+                                    load_models=load_models, api_enabled=False)
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    frame_rate = rrp.FRAME_RATE
+    generator = UdpLoadGenerator(port, num_sensors, frame_rate=frame_rate)
+    sender = generator.start(warmup + duration)
+
+    # 预热：等待所有传感器的缓冲区填满并完成首次处理
+    time.sleep(warmup)
+    processed_start = sum(s.processing_count for s in server.sensors.values())
+    sent_start = generator.frames_sent
+    received_start = server.receiver.stats.datagrams
+    drops_start = server.receiver.kernel_drops() or 0
+    cpu_start = cpu_seconds()
+    wall_start = time.perf_counter()
+
+    sender.join()
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+    time.sleep(0.5)
+
+    sensors = list(server.sensors.values())
+    processed = sum(s.processing_count for s in sensors) - processed_start
+    received = server.receiver.stats.datagrams - received_start
+    drops = (server.receiver.kernel_drops() or 0) - drops_start
+    step_ms = [s.total_processing_time / s.processing_count * 1000 for s in sensors if s.processing_count]
+    expected_steps = num_sensors * duration * frame_rate / rrp.STEP_SIZE
+
+    server.stop()
+
+    # 发送端与服务端在同一进程中，CPU占用包含发送开销，估算结果偏保守
+    cores_used = cpu / wall if wall > 0 else 0.0
+    return {
+        'sensors': num_sensors,
+        'workers': server.workers,
+        'duration': wall,
+        'frames_sent': generator.frames_sent - sent_start,
+        'sender_late_ticks': generator.late_ticks,
+        'frames_received': received,
+        'kernel_drops': drops,
+        'steps': processed,
+        'expected_steps': expected_steps,
+        'step_completion': processed / expected_steps if expected_steps else 0.0,
+        'avg_step_ms': float(np.mean(step_ms)) if step_ms else 0.0,
+        'cpu_cores_used': cores_used,
+        'sensors_per_core': num_sensors / cores_used if cores_used > 0 else float('inf'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多雷达服务负载测试')
+    parser.add_argument('--sensors', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='模拟传感器数量，可指定多个值依次测试')
+    parser.add_argument('--duration', type=float, default=20, help='每轮测试时长（秒，不含预热）')
+    parser.add_argument('--warmup', type=float, default=None, help='预热时长（秒），默认窗口时长+2秒')
+    parser.add_argument('--port', type=int, default=57399, help='测试使用的UDP端口')
+    parser.add_argument('--workers', type=int, default=None, help='处理线程数，默认CPU核数')
+    parser.add_argument('--with-model', action='store_true', help='加载并运行心率模型')
+    parser.add_argument('--presence', action='store_true',
+                        help='启用存在检测门控（默认关闭，使每一步都执行信号分解）')
+    args = parser.parse_args()
+
+    rrp.ENABLE_PRESENCE_DETECTION = args.presence
+    warmup = args.warmup if args.warmup is not None else rrp.WINDOW_SIZE_SECONDS + 2
+
+    print(f"CPU核数: {os.cpu_count()} | 分解类型: {rrp.DECOMP_TYPE} | 模型推理: {args.with_model}")
+    print(f"{'传感器':>6} {'接收/发送':>14} {'丢包':>6} {'完成率':>7} {'步骤ms':>8} {'占用核':>7} {'单核容量':>8}")
+    for i, num_sensors in enumerate(args.sensors):
+        r = run_load_test(num_sensors, args.duration, args.port + i, args.workers,
+                          args.with_model, warmup)
+        print(f"{r['sensors']:>6} {r['frames_received']:>6}/{r['frames_sent']:<7} {r['kernel_drops']:>6} "
+              f"{r['step_completion']*100:>6.1f}% {r['avg_step_ms']:>8.1f} {r['cpu_cores_used']:>7.2f} "
+              f"{r['sensors_per_core']:>8.1f}")
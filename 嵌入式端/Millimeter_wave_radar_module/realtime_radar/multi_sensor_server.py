@@ -0,0 +1,400 @@
+"""
+多雷达实时处理服务
+一个UDP接收器接收多个雷达的数据，按源地址（或配置的传感器ID）分发到各自的处理状态，
+处理步骤由工作线程池调度执行，API按传感器提供心率和目标数据
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+import uvicorn
+
+import realtime_radar_processing as rrp
+from frame_buffer import FrameRingBuffer
+from frame_sequence import REORDER_TIMEOUT, FrameSequencer
+from radar_pipeline import load_models as load_vital_models
+from radar_receiver import RadarUdpReceiver
+from step_scheduler import StepScheduler
+
+DEFAULT_MAX_SENSORS = 64        # 最多接受的传感器数量
+SENSOR_TIMEOUT_SECONDS = 10     # 超过该时间未收到数据的传感器视为离线
+
+
+class SensorState:
+    """单个雷达传感器的接收和处理状态"""
+
+    def __init__(self, sensor_id, addr, pipeline, overload_policy='skip'):
+        """
+        初始化传感器状态
+
+        参数:
+            sensor_id: 传感器ID
+            addr: 传感器源地址 (ip, port)
+            pipeline: 该传感器专用的RadarPipeline
+            overload_policy: 处理跟不上数据速率时的策略
+        """
+        self.sensor_id = sensor_id
+        self.addr = addr
+        self.pipeline = pipeline
+        self.data_buffer = FrameRingBuffer(rrp.WINDOW_SIZE)
+        self.frame_filled = FrameRingBuffer(rrp.WINDOW_SIZE, 1)
+        self.sequencer = FrameSequencer(self._append_frame, on_resync=self._on_resync)
+        self.scheduler = StepScheduler(rrp.WINDOW_SIZE, rrp.STEP_SIZE, rrp.FRAME_RATE, policy=overload_policy,
+                                       degradable=rrp.DECOMPOSE_SIGNAL and rrp.DECOMP_TYPE == 'eemd')
+
+        # 接收统计
+        self.total_frames_received = 0
+        self.last_frame_number = 0
+        self.last_seen = time.time()
+
+        # 处理状态
+        self.busy = False               # 是否有处理任务正在执行或排队
+        self.processing_count = 0
+        self.processing_errors = 0
+        self.total_processing_time = 0.0
+        self.last_processing_time = 0.0
+        self.result = None              # 最近一次处理结果
+        self.result_time = None         # 最近一次结果的生成时间
+
+    def _append_frame(self, frame_number, samples, filled):
+        """帧序号跟踪器按序输出的帧"""
+        self.data_buffer.append(samples)
+        self.frame_filled.append((1.0 if filled else 0.0,))
+        self.last_frame_number = frame_number
+        self.scheduler.frame_arrived(len(self.data_buffer), self.last_seen)
+
+    def _on_resync(self):
+        """帧号大幅跳变时清空缓冲区"""
+        self.data_buffer.clear()
+        self.frame_filled.clear()
+        self.scheduler.reset()
+
+    def next_step(self):
+        """没有正在执行的处理任务且累积了足够步长的新帧时返回一个处理步骤，否则返回None"""
+        if self.busy:
+            # 处理期间新帧继续累积，任务完成后由调度器判断是否积压
+            return None
+        return self.scheduler.poll_step()
+
+    def status(self):
+        """传感器状态字典（用于API输出）"""
+        return {
+            'sensor_id': self.sensor_id,
+            'address': f"{self.addr[0]}:{self.addr[1]}",
+            'online': time.time() - self.last_seen < SENSOR_TIMEOUT_SECONDS,
+            'total_frames': self.total_frames_received,
+            'last_frame': self.last_frame_number,
+            'buffer': len(self.data_buffer),
+            'processed': self.processing_count,
+            'errors': self.processing_errors,
+            'last_processing_ms': self.last_processing_time * 1000,
+            'avg_processing_ms': (self.total_processing_time / self.processing_count * 1000
+                                  if self.processing_count else 0.0),
+            'last_seen': self.last_seen,
+            'sequence': self.sequencer.get_stats(),
+            'scheduler': self.scheduler.get_stats(),
+            **self.scheduler.staleness(),
+        }
+
+
+class MultiSensorRadarServer:
+    """多雷达实时处理服务"""
+
+    def __init__(self, port=57345, sensor_ids=None, workers=None, max_sensors=DEFAULT_MAX_SENSORS,
+                 load_models=True, cwt_model_path=None, eemd_model_path=None,
+                 api_enabled=True, api_port=8000, overload_policy='skip'):
+        """
+        初始化多雷达服务
+
+        参数:
+            port: 本地UDP监听端口（所有雷达发送到同一端口）
+            sensor_ids: 源地址到传感器ID的映射，键为"ip"或"ip:port"，未配置的源使用"ip:port"作为ID
+            workers: 处理线程池大小，None使用CPU核数
+            max_sensors: 最多接受的传感器数量
+            load_models: 是否加载预训练模型（所有传感器共享同一组模型）
+            cwt_model_path: CWT模型路径
+            eemd_model_path: EEMD模型路径
+            api_enabled: 是否启用FastAPI接口
+            api_port: FastAPI服务器端口
+            overload_policy: 处理跟不上数据速率时的策略 'skip'、'degrade' 或 'throttle'
+        """
+        self.port = port
+        self.overload_policy = overload_policy
+        self.sensor_ids = dict(sensor_ids or {})
+        self.max_sensors = max_sensors
+        self.sensors = {}               # 传感器ID -> SensorState
+        self._addr_index = {}           # 源地址 -> SensorState
+        self._lock = threading.Lock()
+        self.running = False
+        self.rejected_frames = 0        # 因超过传感器数量上限被丢弃的帧
+
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='radar-dsp')
+        self.receiver = RadarUdpReceiver(port, self._handle_frame)
+
+        # 所有传感器共享模型
+        self.cwt_model = None
+        self.eemd_model = None
+        self.enable_model_inference = False
+        if load_models:
+            self.cwt_model, self.eemd_model, self.enable_model_inference = load_vital_models(
+                rrp.DECOMP_TYPE, cwt_model_path, eemd_model_path)
+
+        self.api_enabled = api_enabled
+        self.api_port = api_port
+        self.app = None
+        if api_enabled:
+            self._init_api()
+
+    def _resolve_sensor_id(self, addr):
+        """根据源地址确定传感器ID"""
+        key = f"{addr[0]}:{addr[1]}"
+        return self.sensor_ids.get(key) or self.sensor_ids.get(addr[0]) or key
+
+    def _get_sensor(self, addr):
+        """获取（或注册）源地址对应的传感器状态，超过上限返回None"""
+        state = self._addr_index.get(addr)
+        if state is not None:
+            return state
+
+        with self._lock:
+            sensor_id = self._resolve_sensor_id(addr)
+            state = self.sensors.get(sensor_id)
+            if state is None:
+                if len(self.sensors) >= self.max_sensors:
+                    return None
+                pipeline = rrp.create_pipeline(self.cwt_model, self.eemd_model, verbose=False)
+                pipeline.enable_model_inference = self.enable_model_inference
+                state = SensorState(sensor_id, addr, pipeline, self.overload_policy)
+                self.sensors[sensor_id] = state
+                print(f"新传感器接入: {sensor_id} ({addr[0]}:{addr[1]})")
+            else:
+                # 已配置ID的传感器源端口变化
+                state.addr = addr
+            self._addr_index[addr] = state
+        return state
+
+    def _handle_frame(self, payload, addr, arrival_ns):
+        """接收器回调：按源地址分发帧，缓冲区就绪时调度处理任务"""
+        state = self._get_sensor(addr)
+        if state is None:
+            self.rejected_frames += 1
+            return
+
+        state.total_frames_received += 1
+        state.last_seen = arrival_ns / 1e9
+        state.sequencer.push(int.from_bytes(payload[2:6], 'little'),
+                             np.frombuffer(payload, dtype='<f2', offset=6), state.last_seen)
+
+        step = state.next_step()
+        if step is not None:
+            state.busy = True
+            frames = state.data_buffer.latest(rrp.WINDOW_SIZE)
+            window_loss = float(state.frame_filled.latest(rrp.WINDOW_SIZE).mean())
+            self.executor.submit(self._process_sensor, state, step, frames, window_loss)
+
+    def _process_sensor(self, state, step, frames, window_loss):
+        """在工作线程中执行一个传感器的处理步骤"""
+        try:
+            result = state.pipeline.process(frames, step['new_frames'], window_loss, step['fidelity'])
+            state.result = result
+            state.result_time = time.time()
+            state.processing_count += 1
+            state.last_processing_time = result['processing_time']
+            state.total_processing_time += result['processing_time']
+        except Exception as e:
+            state.processing_errors += 1
+            print(f"传感器 {state.sensor_id} 处理出错: {e}")
+        finally:
+            state.scheduler.step_finished(step)
+            state.busy = False
+
+    def _init_api(self):
+        """初始化FastAPI应用"""
+        self.app = FastAPI(title="多雷达心率监测API",
+                           description="按传感器提供实时雷达心率监测数据的API接口",
+                           version="1.0.0")
+        self.app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+        def sensor_or_404(sensor_id):
+            state = self.sensors.get(sensor_id)
+            if state is None:
+                raise HTTPException(status_code=404, detail=f"未知传感器: {sensor_id}")
+            return state
+
+        @self.app.get("/")
+        async def root():
+            return {"message": "多雷达心率监测API服务正在运行"}
+
+        @self.app.get("/sensors")
+        async def list_sensors():
+            """列出所有已接入的传感器"""
+            return {"sensors": [state.status() for state in list(self.sensors.values())],
+                    "timestamp": time.time()}
+
+        @self.app.get("/sensors/{sensor_id}/heartrate")
+        async def get_heart_rate(sensor_id: str):
+            """获取指定传感器的最新心率值"""
+            state = sensor_or_404(sensor_id)
+            result = state.result
+            heart_rate = result['heart_rate'] if result else None
+            return {"sensor_id": sensor_id,
+                    "heart_rate": float(heart_rate) if heart_rate is not None else None,
+                    "timestamp": time.time(),
+                    **state.scheduler.staleness(),
+                    "status": "ok" if heart_rate is not None else "no_data"}
+
+        @self.app.get("/sensors/{sensor_id}/target")
+        async def get_target_data(sensor_id: str):
+            """获取指定传感器的目标距离和心率数据"""
+            state = sensor_or_404(sensor_id)
+            result = state.result
+            if result is None:
+                return {"sensor_id": sensor_id, "heart_rate": None, "target_distance": None,
+                        "target_bin": None, "presence": None, "timestamp": time.time(),
+                        **state.scheduler.staleness(), "status": "no_data"}
+            heart_rate = result['heart_rate']
+            return {"sensor_id": sensor_id,
+                    "heart_rate": float(heart_rate) if heart_rate is not None else None,
+                    "target_distance": float(result['target_distance']),
+                    "target_bin": int(result['target_bin']),
+                    "presence": bool(result['presence_stable']),
+                    "window_valid": bool(result['window_valid']),
+                    "timestamp": time.time(),
+                    **state.scheduler.staleness(),
+                    "status": "ok"}
+
+        @self.app.get("/sensors/{sensor_id}/status")
+        async def get_sensor_status(sensor_id: str):
+            """获取指定传感器的状态"""
+            return sensor_or_404(sensor_id).status()
+
+        @self.app.get("/status")
+        async def get_status():
+            """获取服务整体状态"""
+            return self.get_status()
+
+    def get_status(self):
+        """服务整体状态"""
+        return {
+            "running": self.running,
+            "sensors": len(self.sensors),
+            "workers": self.workers,
+            "overload_policy": self.overload_policy,
+            "overload_events": sum(s.scheduler.overload_events for s in list(self.sensors.values())),
+            "rejected_frames": self.rejected_frames,
+            "receiver": self.receiver.get_stats(),
+            "timestamp": time.time(),
+        }
+
+    def _run_api_server(self):
+        """在单独的线程中运行FastAPI服务器"""
+        try:
+            uvicorn.run(self.app, host="0.0.0.0", port=self.api_port, log_level="info")
+        except Exception as e:
+            print(f"API服务器启动失败: {e}")
+
+    def start(self):
+        """启动接收和处理（阻塞直到stop()被调用）"""
+        self.running = True
+        self.receiver.open()
+
+        if self.api_enabled and self.app:
+            api_thread = threading.Thread(target=self._run_api_server, daemon=True)
+            api_thread.start()
+            print(f"API服务已启动在 http://0.0.0.0:{self.api_port}")
+
+        print("================================================================================")
+        print("多雷达实时处理服务启动")
+        print("================================================================================")
+        print(f"监听端口: {self.port} | 处理线程: {self.workers} | 最大传感器数: {self.max_sensors}")
+        print(f"窗口: {rrp.WINDOW_SIZE}帧 | 步长: {rrp.STEP_SIZE}帧 | 过载策略: {self.overload_policy}")
+
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            print("用户中断，正在关闭...")
+        finally:
+            self.stop()
+
+    async def _serve(self):
+        """事件循环主协程：接收数据并定期检查各传感器的乱序超时"""
+        poller = asyncio.ensure_future(self._poll_sequencers())
+        try:
+            await self.receiver.serve()
+        finally:
+            poller.cancel()
+
+    async def _poll_sequencers(self):
+        """乱序超时检查协程：传感器数据流中断时按超时输出重排缓存中的帧"""
+        while self.running:
+            await asyncio.sleep(REORDER_TIMEOUT)
+            now = time.time()
+            for state in list(self.sensors.values()):
+                state.sequencer.poll(now)
+
+    def stop(self):
+        """停止服务"""
+        if not self.running:
+            return
+        self.running = False
+        self.receiver.stop()
+        self.executor.shutdown(wait=False)
+        self.receiver.close()
+        print("多雷达实时处理服务已停止")
+
+
+def parse_sensor_ids(items):
+    """解析命令行中的 地址=ID 映射列表"""
+    mapping = {}
+    for item in items or []:
+        if '=' not in item:
+            raise ValueError(f"传感器映射格式应为 地址=ID: {item}")
+        addr, sensor_id = item.split('=', 1)
+        mapping[addr.strip()] = sensor_id.strip()
+    return mapping
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='多雷达实时处理服务')
+    parser.add_argument('--port', type=int, default=57345, help='UDP监听端口')
+    parser.add_argument('--sensor', action='append', default=[],
+                        help='源地址到传感器ID的映射，格式 ip[:port]=ID，可重复')
+    parser.add_argument('--workers', type=int, default=None, help='处理线程数，默认CPU核数')
+    parser.add_argument('--max-sensors', type=int, default=DEFAULT_MAX_SENSORS, help='最多接受的传感器数量')
+    parser.add_argument('--no-model', action='store_true', help='禁用模型推理')
+    parser.add_argument('--cwt-model', type=str, default=None, help='CWT模型路径')
+    parser.add_argument('--eemd-model', type=str, default=None, help='EEMD模型路径')
+    parser.add_argument('--no-api', action='store_true', help='禁用FastAPI接口')
+    parser.add_argument('--api-port', type=int, default=8000, help='API服务器端口')
+    parser.add_argument('--overload-policy', type=str, choices=rrp.OVERLOAD_POLICIES, default=rrp.OVERLOAD_POLICY,
+                        help='处理跟不上数据速率时的策略')
+    args = parser.parse_args()
+
+    server = MultiSensorRadarServer(
+        port=args.port,
+        sensor_ids=parse_sensor_ids(args.sensor),
+        workers=args.workers,
+        max_sensors=args.max_sensors,
+        load_models=not args.no_model,
+        cwt_model_path=args.cwt_model,
+        eemd_model_path=args.eemd_model,
+        api_enabled=not args.no_api,
+        api_port=args.api_port,
+        overload_policy=args.overload_policy
+    )
+    server.start()
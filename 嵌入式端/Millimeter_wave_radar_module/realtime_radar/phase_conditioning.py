@@ -0,0 +1,138 @@
+"""
+相位流调理
+每个目标的相位按新到达的帧增量处理：与上一步的最后一个样本衔接解缠绕、减去冷启动时拟合的线性趋势，
+再经过呼吸和心跳频带的二阶节(SOS)带通滤波。滤波器状态在步骤之间保存，每步只滤波新增的样本，
+不会因为每个窗口重新滤波而在窗口边缘产生瞬态；目标距离bin或合并方向变化、跳过积压窗口或新出现的目标从整个窗口冷启动。
+
+MTI按窗口减去均值，每一步的相位参考点（复平面上的静态杂波）都不同，直接取MTI输出的相位会在每个步骤边界
+给滤波器状态引入一个相位阶跃。因此相位流保存自己的参考点：冷启动时取窗口均值，之后每步按时间常数
+CLUTTER_TIME_CONSTANT向当前窗口均值缓慢靠拢，新样本的相位相对于这个参考点计算。
+参考点更新仍会在步骤边界留下很小的阶跃（约为窗口均值变化的 步长/时间常数 倍）
+"""
+
+import numpy as np
+from scipy import signal
+
+BREATHING_BAND = (0.1, 0.6)     # 呼吸频带（Hz，6-36次/分钟）
+HEART_BAND = (0.8, 2.5)         # 心跳频带（Hz，48-150次/分钟）
+FILTER_ORDER = 4                # 带通滤波器阶数
+CLUTTER_TIME_CONSTANT = 30.0    # 相位参考点（静态杂波）的跟踪时间常数（秒）
+
+
+class PhaseStream:
+    """一个目标的相位流状态"""
+
+    def __init__(self, target_bin, samples, clutter, breathing_filter, heart_filter, angle_index=None):
+        """
+        用整个窗口冷启动
+
+        参数:
+            target_bin: 目标距离bin（bin变化时相位不连续，需要重新冷启动）
+            samples: 窗口内MTI滤波后的复数样本
+            clutter: MTI减去的窗口均值（作为初始相位参考点）
+            breathing_filter、heart_filter: (sos, zi) 带通滤波器及其单位稳态状态
+            angle_index: 多接收天线相干合并所用的角度网格索引（方向变化时合并后的相位有固定偏移，
+                         需要重新冷启动），单天线时为None
+        """
+        self.bin = target_bin
+        self.angle_index = angle_index
+        self.reference = clutter
+        phase = np.angle(samples)
+        self.length = len(phase)
+        unwrapped = np.unwrap(phase)
+        t = np.arange(self.length)
+        # 线性趋势按冷启动窗口拟合一次，之后的样本沿用同一条趋势线，去趋势后的序列在步骤之间连续
+        self.slope, self.intercept = np.polyfit(t, unwrapped, 1)
+        self.next_t = self.length
+        self.last_wrapped = phase[-1]
+        self.last_unwrapped = unwrapped[-1]
+        detrended = unwrapped - (self.intercept + self.slope * t)
+
+        # 滤波器状态按第一个样本的稳态初始化，避免从零状态开始的阶跃瞬态
+        (self.breathing_sos, breathing_zi), (self.heart_sos, heart_zi) = breathing_filter, heart_filter
+        self.breathing, self.breathing_state = signal.sosfilt(
+            self.breathing_sos, detrended, zi=breathing_zi * detrended[0])
+        self.heart, self.heart_state = signal.sosfilt(self.heart_sos, detrended, zi=heart_zi * detrended[0])
+
+    def update(self, samples, clutter, new_count, tracking):
+        """
+        追加窗口末尾的new_count个新样本（0 < new_count < 窗口长度）
+
+        参数:
+            samples: 窗口内MTI滤波后的复数样本，最后new_count个为新样本
+            clutter: MTI减去的窗口均值
+            new_count: 新样本数
+            tracking: 本步参考点向窗口均值靠拢的比例 (0-1]
+        """
+        # 参考点缓慢跟踪静态杂波，新样本的相位相对于参考点计算（而不是相对于每步都变化的窗口均值）
+        self.reference += tracking * (clutter - self.reference)
+        new = np.angle(samples[-new_count:] + (clutter - self.reference))
+        # 与上一步的最后一个样本一起解缠绕，得到连续的展开相位
+        unwrapped = np.unwrap(np.concatenate(([self.last_wrapped], new)))
+        unwrapped = self.last_unwrapped + (unwrapped[1:] - unwrapped[0])
+        self.last_wrapped = new[-1]
+        self.last_unwrapped = unwrapped[-1]
+        t = self.next_t + np.arange(new_count)
+        self.next_t += new_count
+        detrended = unwrapped - (self.intercept + self.slope * t)
+
+        breathing, self.breathing_state = signal.sosfilt(self.breathing_sos, detrended, zi=self.breathing_state)
+        heart, self.heart_state = signal.sosfilt(self.heart_sos, detrended, zi=self.heart_state)
+        # 窗口左移new_count个样本（原地移动，不分配新数组）
+        for buffer, filtered in ((self.breathing, breathing), (self.heart, heart)):
+            buffer[:-new_count] = buffer[new_count:]
+            buffer[-new_count:] = filtered
+
+
+class PhaseConditioner:
+    """按目标ID保存相位流状态的流式调理器（每个流水线一个）"""
+
+    def __init__(self):
+        self.streams = {}
+
+    def update(self, plan, target_ids, target_bins, target_samples, new_frame_count=None, angle_indices=None,
+               target_clutter=None):
+        """
+        用本步骤的相位窗口更新各目标的相位流
+
+        参数:
+            plan: DspPlan（提供呼吸和心跳带通滤波器）
+            target_ids: 各目标的跟踪ID
+            target_bins: 各目标的距离bin
+            target_samples: 形状为(目标数, 帧数)的MTI滤波后的复数样本
+            new_frame_count: 自上一步以来的新增帧数，None表示整个窗口都是新帧
+            angle_indices: 多接收天线时各目标相干合并所用的角度网格索引，单天线时为None
+            target_clutter: 各目标MTI减去的窗口均值（复数），None时相位直接相对于每个窗口的均值计算
+
+        返回:
+            breathing: 形状为(目标数, 帧数)的呼吸频带相位（新数组）
+            heart: 形状为(目标数, 帧数)的心跳频带相位（新数组）
+        """
+        breathing_filter = (plan.breathing_sos, plan.breathing_zi)
+        heart_filter = (plan.heart_sos, plan.heart_zi)
+        if angle_indices is None:
+            angle_indices = [None] * len(target_ids)
+        if target_clutter is None:
+            target_clutter = np.zeros(len(target_ids), dtype=complex)
+        streams = {}
+        for target_id, target_bin, angle_index, samples, clutter in zip(
+                target_ids, target_bins, angle_indices, target_samples, target_clutter):
+            stream = self.streams.get(target_id)
+            window = len(samples)
+            if (stream is None or stream.bin != target_bin or stream.angle_index != angle_index
+                    or stream.length != window or new_frame_count is None or new_frame_count >= window):
+                stream = PhaseStream(target_bin, samples, complex(clutter), breathing_filter, heart_filter,
+                                     angle_index)
+            elif new_frame_count > 0:
+                tracking = -np.expm1(-new_frame_count / (CLUTTER_TIME_CONSTANT * plan.frame_rate))
+                stream.update(samples, complex(clutter), new_frame_count, tracking)
+            streams[target_id] = stream
+        # 本步骤没有出现的目标丢弃状态，重新出现时冷启动
+        self.streams = streams
+        selected = [streams[target_id] for target_id in target_ids]
+        return (np.stack([stream.breathing for stream in selected]),
+                np.stack([stream.heart for stream in selected]))
+
+    def reset(self):
+        """清除所有相位流状态（雷达配置变化时调用）"""
+        self.streams = {}
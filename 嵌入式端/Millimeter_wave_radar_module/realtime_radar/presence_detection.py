@@ -132,23 +132,28 @@ class RadarPresenceDetector:
     def get_distance_profile(self, radar_data, num_distance_bins=50):
         """
         获取距离剖面图数据，用于可视化不同距离的检测结果
-        
+
+        各bin的能量相对于算法当前的慢速平均值给出检测值，
+        一次向量化计算，不会更新存在检测算法的滤波器状态
+
         参数:
             radar_data: 雷达数据，形状为 (chirps, samples)
             num_distance_bins: 要分析的距离bin数量
-            
+
         返回:
             distance_values: 各距离bin的检测值列表
         """
         if radar_data is None:
             return [0] * num_distance_bins
-            
-        distance_values = []
-        for i in range(num_distance_bins):
-            _, detection_value = self.presence_algorithm.calculate(radar_data, i)
-            distance_values.append(detection_value)
-            
-        return distance_values
+
+        algo = self.presence_algorithm
+        if not algo.initialized or algo.slow_avg is None:
+            return [0] * num_distance_bins
+
+        energy = np.mean(np.abs(radar_data[:, :num_distance_bins])**2, axis=0)
+        distance_values = energy / (algo.slow_avg + 1e-10)
+
+        return distance_values.tolist()
 
 
 # 使用示例
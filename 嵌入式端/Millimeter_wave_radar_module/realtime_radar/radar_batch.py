@@ -0,0 +1,387 @@
+"""
+录制文件离线批处理
+把多个录制文件（以及长录制文件按帧范围切分后的分片）分发到进程池，
+对每个处理窗口执行完整的 FFT -> MTI -> 相位 -> CWT/EEMD -> 模型 流水线，结果按列保存。
+每个工作进程只加载一次模型；分片结果单独落盘，中断后重新运行会跳过已完成的分片
+"""
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+import realtime_radar_processing as rrp
+from frame_buffer import FrameRingBuffer
+from frame_sequence import FrameSequencer
+from radar_recording import open_recording, RECORDING_EXTENSION
+
+SHARD_SECONDS = 1800            # 每个分片负责的录制时长（秒）
+WARMUP_STEPS = 120              # 分片起点之前额外处理的步数，使存在检测的滑动平均收敛
+SHARD_DIR = 'shards'            # 输出目录中保存分片结果的子目录
+MANIFEST_NAME = 'manifest.json'
+READ_CHUNK = 4096               # 每次读取的记录数（压缩录制文件按块解码）
+
+# 传递给工作进程的处理参数（realtime_radar_processing中的模块级配置）
+PIPELINE_PARAMS = (
+    'DECOMPOSE_SIGNAL', 'DECOMP_TYPE', 'CWT_SCALES', 'CWT_WAVELET',
+    'EEMD_NOISE_WIDTH', 'EEMD_ENSEMBLE_SIZE', 'EEMD_MAX_IMF',
+    'ENABLE_PRESENCE_DETECTION', 'PRESENCE_HISTORY_LENGTH', 'PRESENCE_COUNT_THRESHOLD',
+    'MAX_TARGETS', 'NUM_RX', 'RX_POSITIONS', 'PHASE_FILTER',
+)
+
+# 结果列
+COLUMNS = ('step_record', 'frame_number', 'arrival_ns', 'target_bin', 'target_distance',
+           'presence_detected', 'presence_stable', 'window_loss', 'window_valid',
+           'heart_rate', 'processing_time')
+
+# 工作进程中的全局状态（进程池initializer中设置，同一进程处理的所有分片共享模型）
+_worker = {}
+
+
+def find_recordings(inputs):
+    """
+    展开输入路径：文件直接使用，目录递归查找其中的录制文件
+
+    返回:
+        排序后的录制文件路径列表
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(glob.glob(os.path.join(item, '**', '*' + RECORDING_EXTENSION), recursive=True))
+        else:
+            paths.append(item)
+    return sorted(set(os.path.abspath(p) for p in paths))
+
+
+def recording_key(path):
+    """录制文件在输出目录中使用的名称"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def plan_shards(paths, shard_seconds=SHARD_SECONDS):
+    """
+    把录制文件切分为分片
+
+    分片按记录序号划分为[start, end)，步骤边界在全局对齐（窗口结束于记录序号r时，
+    (r + 1 - WINDOW_SIZE) 是STEP_SIZE的整数倍），因此分片方式不影响处理哪些窗口
+
+    返回:
+        分片列表，每个分片为字典: path、key、start、end、shard_id，按长度从大到小排列以平衡负载
+    """
+    shard_frames = max(rrp.STEP_SIZE, int(shard_seconds * rrp.FRAME_RATE) // rrp.STEP_SIZE * rrp.STEP_SIZE)
+    keys = {}
+    shards = []
+    for path in paths:
+        key = recording_key(path)
+        if key in keys:
+            raise ValueError(f"录制文件名重复: {keys[key]} 和 {path}")
+        keys[key] = path
+
+        with open_recording(path) as rec:
+            num_frames = len(rec)
+        if num_frames < rrp.WINDOW_SIZE:
+            print(f"跳过 {path}: 只有 {num_frames} 帧，不足一个处理窗口")
+            continue
+        for start in range(0, num_frames, shard_frames):
+            end = min(start + shard_frames, num_frames)
+            shards.append({'path': path, 'key': key, 'start': start, 'end': end,
+                           'shard_id': f"{key}.{start:09d}-{end:09d}"})
+
+    shards.sort(key=lambda s: s['end'] - s['start'], reverse=True)
+    return shards
+
+
+def pipeline_config(load_models=True, cwt_model_path=None, eemd_model_path=None,
+                    warmup_steps=WARMUP_STEPS, save_phase=False):
+    """传递给工作进程的配置"""
+    return {
+        'params': {name: getattr(rrp, name) for name in PIPELINE_PARAMS},
+        'load_models': load_models,
+        'cwt_model_path': cwt_model_path,
+        'eemd_model_path': eemd_model_path,
+        'warmup_steps': warmup_steps,
+        'save_phase': save_phase,
+    }
+
+
+def init_worker(config):
+    """进程池initializer：应用处理参数并加载一次模型"""
+    for key, value in config['params'].items():
+        setattr(rrp, key, value)
+
+    cwt_model = eemd_model = None
+    enable_model_inference = False
+    if config['load_models']:
+        cwt_model, eemd_model, enable_model_inference = rrp.load_vital_models(
+            rrp.DECOMP_TYPE, config['cwt_model_path'], config['eemd_model_path'])
+        try:
+            # 每个进程只使用一个线程推理，多进程并行时避免线程争用
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(1)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except (ImportError, RuntimeError):
+            pass
+
+    _worker.update(config=config, cwt_model=cwt_model, eemd_model=eemd_model,
+                   enable_model_inference=enable_model_inference)
+
+
+def process_shard(shard, output_path):
+    """
+    处理一个分片并把结果写入output_path（先写临时文件再改名，中断时不会留下不完整的结果）
+
+    从分片起点之前WINDOW_SIZE + warmup_steps * STEP_SIZE帧开始读取：前面的帧用于填满窗口和
+    预热存在检测状态，只有窗口结束位置在[start, end)内的步骤才输出
+
+    返回:
+        分片统计字典
+    """
+    config = _worker['config']
+    pipeline = rrp.create_pipeline(_worker['cwt_model'], _worker['eemd_model'], verbose=False)
+    pipeline.enable_model_inference = _worker['enable_model_inference']
+    decompose = pipeline.decompose
+
+    window, step_size = rrp.WINDOW_SIZE, rrp.STEP_SIZE
+    data_buffer = FrameRingBuffer(window)
+    frame_filled = FrameRingBuffer(window, 1)
+    last_frame = [0]
+    # 自上一步以来追加的帧数，None表示还没有处理过步骤或重新同步后缓冲区被清空（相位流需要冷启动）
+    new_frames = [None]
+
+    def append_frame(frame_number, samples, filled):
+        data_buffer.append(samples)
+        frame_filled.append((1.0 if filled else 0.0,))
+        last_frame[0] = frame_number
+        if new_frames[0] is not None:
+            new_frames[0] += 1
+
+    def on_resync():
+        data_buffer.clear()
+        frame_filled.clear()
+        new_frames[0] = None
+
+    sequencer = FrameSequencer(append_frame, on_resync=on_resync)
+    columns = {name: [] for name in COLUMNS}
+    phases = []
+
+    started = time.perf_counter()
+    read_start = max(0, shard['start'] - window - config['warmup_steps'] * step_size)
+    with open_recording(shard['path']) as rec:
+        # 按录制时的雷达参数（接收天线数、天线位置等）生成DSP计划
+        pipeline.configure(rec.params)
+        # 分段读取：压缩录制文件只需解码当前段涉及的块
+        for chunk_start in range(read_start, shard['end'], READ_CHUNK):
+            records = rec.read(chunk_start, min(chunk_start + READ_CHUNK, shard['end']))
+            frame_numbers = records['frame_number']
+            arrivals = records['arrival_ns']
+            samples = records['samples']
+
+            for i in range(len(records)):
+                record_index = chunk_start + i
+                sequencer.push(int(frame_numbers[i]), samples[i], int(arrivals[i]) / 1e9)
+                if (record_index + 1 - window) % step_size or len(data_buffer) < window:
+                    continue
+
+                output = record_index >= shard['start']
+                # 预热步骤只需要更新存在检测状态，跳过信号分解和模型推理
+                pipeline.decompose = decompose and output
+                window_loss = float(frame_filled.latest(window).mean())
+                result = pipeline.process(data_buffer.latest(window), new_frames[0], window_loss)
+                new_frames[0] = 0
+                if not output:
+                    continue
+
+                columns['step_record'].append(record_index)
+                columns['frame_number'].append(last_frame[0])
+                columns['arrival_ns'].append(int(arrivals[i]))
+                columns['target_bin'].append(result['target_bin'])
+                columns['target_distance'].append(result['target_distance'])
+                columns['presence_detected'].append(result['presence_detected'])
+                columns['presence_stable'].append(result['presence_stable'])
+                columns['window_loss'].append(result['window_loss'])
+                columns['window_valid'].append(result['window_valid'])
+                columns['heart_rate'].append(np.nan if result['heart_rate'] is None else result['heart_rate'])
+                columns['processing_time'].append(result['processing_time'])
+                if config['save_phase']:
+                    phases.append(np.asarray(result['phase_values'], dtype=np.float32))
+
+    arrays = {
+        'step_record': np.array(columns['step_record'], dtype=np.int64),
+        'frame_number': np.array(columns['frame_number'], dtype=np.uint32),
+        'arrival_ns': np.array(columns['arrival_ns'], dtype=np.int64),
+        'target_bin': np.array(columns['target_bin'], dtype=np.int32),
+        'target_distance': np.array(columns['target_distance'], dtype=np.float32),
+        'presence_detected': np.array(columns['presence_detected'], dtype=bool),
+        'presence_stable': np.array(columns['presence_stable'], dtype=bool),
+        'window_loss': np.array(columns['window_loss'], dtype=np.float32),
+        'window_valid': np.array(columns['window_valid'], dtype=bool),
+        'heart_rate': np.array(columns['heart_rate'], dtype=np.float32),
+        'processing_time': np.array(columns['processing_time'], dtype=np.float32),
+    }
+    if config['save_phase']:
+        arrays['phase'] = np.stack(phases) if phases else np.zeros((0, window), dtype=np.float32)
+
+    tmp_path = output_path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, output_path)
+
+    return {
+        'shard_id': shard['shard_id'],
+        'frames': shard['end'] - shard['start'],
+        'frames_read': shard['end'] - read_start,
+        'steps': len(arrays['step_record']),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def shard_output_path(out_dir, shard):
+    return os.path.join(out_dir, SHARD_DIR, shard['shard_id'] + '.npz')
+
+
+def merge_results(out_dir, shards):
+    """
+    把每个录制文件的所有分片结果按步骤顺序合并为 <out_dir>/<录制名>.npz
+
+    只合并所有分片都已完成的录制文件
+
+    返回:
+        合并后的文件路径列表
+    """
+    by_key = {}
+    for shard in shards:
+        by_key.setdefault(shard['key'], []).append(shard)
+
+    merged = []
+    for key, parts in by_key.items():
+        paths = [shard_output_path(out_dir, s) for s in sorted(parts, key=lambda s: s['start'])]
+        if not all(os.path.exists(p) for p in paths):
+            continue
+        columns = {}
+        for path in paths:
+            with np.load(path) as data:
+                for name in data.files:
+                    columns.setdefault(name, []).append(data[name])
+        output_path = os.path.join(out_dir, key + '.npz')
+        tmp_path = output_path + '.tmp.npz'
+        np.savez(tmp_path, **{name: np.concatenate(parts) for name, parts in columns.items()})
+        os.replace(tmp_path, output_path)
+        merged.append(output_path)
+    return merged
+
+
+def load_results(path):
+    """读取合并后的结果文件，返回列名到数组的字典"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def run_batch(inputs, out_dir, workers=None, shard_seconds=SHARD_SECONDS, load_models=True,
+              cwt_model_path=None, eemd_model_path=None, warmup_steps=WARMUP_STEPS, save_phase=False):
+    """
+    执行批处理
+
+    参数:
+        inputs: 录制文件或目录列表
+        out_dir: 输出目录
+        workers: 进程数，None使用CPU核数
+        shard_seconds: 每个分片负责的录制时长
+        load_models: 是否加载模型推理心率
+        cwt_model_path: CWT模型路径
+        eemd_model_path: EEMD模型路径
+        warmup_steps: 分片预热步数
+        save_phase: 是否同时保存每个窗口的相位信号（用于模型训练）
+
+    返回:
+        批处理统计字典
+    """
+    paths = find_recordings(inputs)
+    shards = plan_shards(paths, shard_seconds)
+    os.makedirs(os.path.join(out_dir, SHARD_DIR), exist_ok=True)
+
+    pending = [s for s in shards if not os.path.exists(shard_output_path(out_dir, s))]
+    workers = workers or os.cpu_count() or 1
+    print(f"录制文件: {len(paths)} | 分片: {len(shards)} (已完成 {len(shards) - len(pending)}) | 进程: {workers}")
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'recordings': paths, 'shard_seconds': shard_seconds, 'warmup_steps': warmup_steps,
+                   'decomp_type': rrp.DECOMP_TYPE, 'window_size': rrp.WINDOW_SIZE, 'step_size': rrp.STEP_SIZE,
+                   'shards': [s['shard_id'] for s in shards]}, f, ensure_ascii=False, indent=2)
+
+    # 工作进程内的数值库只使用单线程，由进程数提供并行度（需在创建进程前设置）
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(name, '1')
+
+    config = pipeline_config(load_models, cwt_model_path, eemd_model_path, warmup_steps, save_phase)
+    total_frames = sum(s['end'] - s['start'] for s in pending)
+    done_frames = done_steps = 0
+    started = time.perf_counter()
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'),
+                                 initializer=init_worker, initargs=(config,)) as pool:
+            futures = {pool.submit(process_shard, s, shard_output_path(out_dir, s)): s for s in pending}
+            try:
+                for future in as_completed(futures):
+                    stats = future.result()
+                    done_frames += stats['frames']
+                    done_steps += stats['steps']
+                    elapsed = time.perf_counter() - started
+                    rate = done_frames / elapsed if elapsed > 0 else 0.0
+                    eta = (total_frames - done_frames) / rate if rate > 0 else 0.0
+                    print(f"完成 {stats['shard_id']}: {stats['steps']}步 {stats['seconds']:.1f}秒 | "
+                          f"进度 {done_frames / total_frames * 100:.1f}% | {rate / rrp.FRAME_RATE:.1f}倍实时 | "
+                          f"剩余约 {eta:.0f}秒")
+            except KeyboardInterrupt:
+                print("用户中断，已完成的分片会在下次运行时跳过")
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    elapsed = time.perf_counter() - started
+    merged = merge_results(out_dir, shards)
+    return {
+        'recordings': len(paths),
+        'shards': len(shards),
+        'processed_shards': len(pending),
+        'frames': done_frames,
+        'steps': done_steps,
+        'seconds': elapsed,
+        'realtime_factor': done_frames / rrp.FRAME_RATE / elapsed if elapsed > 0 else 0.0,
+        'merged': merged,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='录制文件离线批处理')
+    parser.add_argument('inputs', nargs='+', help='录制文件或包含录制文件的目录')
+    parser.add_argument('-o', '--output', type=str, required=True, help='输出目录（重新运行时跳过已完成的分片）')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--shard-seconds', type=float, default=SHARD_SECONDS,
+                        help=f'每个分片负责的录制时长（秒），默认：{SHARD_SECONDS}')
+    parser.add_argument('--warmup-steps', type=int, default=WARMUP_STEPS,
+                        help=f'分片预热步数，默认：{WARMUP_STEPS}')
+    parser.add_argument('--save-phase', action='store_true', help='同时保存每个窗口的相位信号')
+    parser.add_argument('--decomp-type', type=str, choices=['cwt', 'eemd'], default=rrp.DECOMP_TYPE, help='信号分解类型')
+    parser.add_argument('--no-presence', action='store_true', help='禁用存在检测功能')
+    parser.add_argument('--no-model', action='store_true', help='禁用模型推理')
+    parser.add_argument('--cwt-model', type=str, default=None, help='CWT模型路径')
+    parser.add_argument('--eemd-model', type=str, default=None, help='EEMD模型路径')
+    args = parser.parse_args()
+
+    rrp.DECOMP_TYPE = args.decomp_type
+    rrp.ENABLE_PRESENCE_DETECTION = not args.no_presence
+
+    summary = run_batch(args.inputs, args.output, workers=args.workers, shard_seconds=args.shard_seconds,
+                        load_models=not args.no_model, cwt_model_path=args.cwt_model,
+                        eemd_model_path=args.eemd_model, warmup_steps=args.warmup_steps,
+                        save_phase=args.save_phase)
+    print(f"批处理完成: {summary['processed_shards']}/{summary['shards']}个分片 | {summary['steps']}步 | "
+          f"用时 {summary['seconds']:.1f}秒 | {summary['realtime_factor']:.1f}倍实时")
+    for path in summary['merged']:
+        print(f"结果: {path}")
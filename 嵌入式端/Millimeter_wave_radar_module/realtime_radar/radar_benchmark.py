@@ -0,0 +1,363 @@
+"""
+雷达信号处理性能基准
+用固定的仿真输入（实际使用的尺寸：300x512窗口、64个CWT尺度、50次EEMD集合、64 chirp距离-多普勒、3根接收天线）
+测量radar_func、signal_decomposition、phase_conditioning、presence_detection中的函数和完整处理步骤的用时与峰值内存，
+结果保存为JSON，并可与基准结果比较，超过阈值的变慢/内存增长视为回归
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from radar_func import (range_fft, doppler_fft, mti_filter, cfar_detector, extract_phase, extract_phase_edacm,
+                        detect_targets, extract_phases, deinterleave_rx, steering_vectors, range_angle_map,
+                        estimate_respiration_rate)
+from radar_pipeline import ANGLE_GRID
+from radar_pipeline import RadarPipeline
+from dsp_plan import DspPlan
+from phase_conditioning import PhaseConditioner
+from radar_settings import get_radar_params
+from radar_simulator import RadarFrameSimulator, SimTarget
+from presence_detection import RadarPresenceDetector
+from signal_decomposition import apply_cwt, apply_eemd, CwtFilterBank
+
+BENCHMARK_VERSION = 1
+WINDOW_FRAMES = 300             # 处理窗口帧数（10秒@30Hz）
+CWT_SCALES = np.arange(1, 65)   # CWT尺度
+EEMD_TRIALS = 50                # EEMD集合大小
+EEMD_MAX_IMF = 5
+DOPPLER_CHIRPS = 64             # 距离-多普勒的chirp数
+MULTI_TARGET_RANGES = (0.8, 1.3, 1.8)   # 多目标基准中各目标的距离（米）
+NUM_RX = 3                      # 多接收天线基准的天线数（BGT60TR13C）
+RX_TARGET_ANGLES = (-30, 35)    # 多接收天线基准中各目标的方位角（度，距离相同）
+STEP_FRAMES = 30                # 流式相位调理基准每步的新增帧数（1秒@30Hz）
+SEED = 0
+
+MIN_REPEATS = 3                 # 每项至少重复次数
+MAX_REPEATS = 50                # 每项最多重复次数
+MIN_TIME = 1.0                  # 每项至少测量的总时间（秒）
+TIME_THRESHOLD = 0.2            # 中位数用时增加超过该比例视为回归
+MEMORY_THRESHOLD = 0.2          # 峰值内存增加超过该比例视为回归
+MEMORY_FLOOR_KB = 64            # 峰值内存低于该值的项不比较内存
+
+
+class BenchmarkInputs:
+    """所有基准项共用的固定输入（只生成一次，各项不修改）"""
+
+    def __init__(self, params=None, seed=SEED):
+        self.params = params or get_radar_params()
+        self.range_resolution = self.params['range_resolution']
+        self.wavelength = self.params['wavelength']
+        self.frame_rate = self.params['frame_rate']
+
+        simulator = RadarFrameSimulator(params=self.params, seed=seed)
+        self.frames = simulator.frames(0, WINDOW_FRAMES).astype(np.float32)
+        self.cube = self.frames[:, np.newaxis, np.newaxis, :].astype(complex)
+        self.range_profile = range_fft(self.cube, window='hann')
+        self.mti = mti_filter(self.range_profile)[:, 0, 0, :]
+        self.phase, self.target_bin = extract_phase(self.mti, self.range_resolution, self.wavelength)
+
+        # 用连续64帧仿真数据作为一帧内的64个chirp（目标的相位随chirp缓慢变化）
+        chirps = simulator.frames(0, DOPPLER_CHIRPS).astype(np.float32)
+        self.chirp_cube = chirps[np.newaxis, np.newaxis, :, :].astype(complex)
+        self.chirp_range_profile = range_fft(self.chirp_cube, window='hann')
+        rd = doppler_fft(self.chirp_range_profile, window='hann')[0, 0]
+        self.rd_power = np.abs(rd[:, :rd.shape[1] // 2]) ** 2
+
+        # 多个目标（不同距离、不同呼吸/心跳频率）的窗口
+        targets = [SimTarget(range_m=r, breathing_rate=12 + 4 * k, heart_rate=65 + 8 * k)
+                   for k, r in enumerate(MULTI_TARGET_RANGES)]
+        multi = RadarFrameSimulator(targets=targets, params=self.params, seed=seed)
+        self.multi_frames = multi.frames(0, WINDOW_FRAMES).astype(np.float32)
+        multi_cube = self.multi_frames[:, np.newaxis, np.newaxis, :].astype(complex)
+        self.multi_mti = mti_filter(range_fft(multi_cube, window='hann'))[:, 0, 0, :]
+        self.multi_bins, _ = detect_targets(self.multi_mti, self.range_resolution, len(MULTI_TARGET_RANGES))
+
+        # 多接收天线：同一距离、不同方向的目标
+        targets = [SimTarget(range_m=1.0, angle_deg=angle, breathing_rate=12 + 8 * k)
+                   for k, angle in enumerate(RX_TARGET_ANGLES)]
+        rx = RadarFrameSimulator(targets=targets, params=self.params, seed=seed, rx_antennas=NUM_RX)
+        self.rx_frames = rx.frames(0, WINDOW_FRAMES).astype(np.float32)
+        rx_cube = deinterleave_rx(self.rx_frames, NUM_RX).astype(complex)
+        rx_mti = mti_filter(range_fft(rx_cube, window='hann'))[:, :, 0, :]
+        self.rx_mti = np.ascontiguousarray(rx_mti[:, :, :rx_mti.shape[-1] // 2])
+        self.steering = steering_vectors(rx.rx_positions, np.deg2rad(ANGLE_GRID))
+
+
+def _pipeline(inputs, decomp_type, max_targets=1, num_rx=1):
+    return RadarPipeline(
+        frame_rate=inputs.frame_rate, range_resolution=inputs.range_resolution,
+        wavelength=inputs.wavelength, window_type='hann', decompose=True, decomp_type=decomp_type,
+        cwt_scales=CWT_SCALES, eemd_ensemble_size=EEMD_TRIALS, eemd_max_imf=EEMD_MAX_IMF,
+        presence_detection=False, max_targets=max_targets, num_rx=num_rx, verbose=False)
+
+
+def _presence_benchmark(inputs):
+    detector = RadarPresenceDetector()
+    latest = inputs.mti[-1:, :]
+    return lambda: detector.detect_presence(latest)
+
+
+def _pipeline_benchmark(decomp_type, max_targets=1, num_rx=1):
+    def setup(inputs):
+        pipeline = _pipeline(inputs, decomp_type, max_targets, num_rx)
+        if num_rx > 1:
+            frames = inputs.rx_frames
+        else:
+            frames = inputs.multi_frames if max_targets > 1 else inputs.frames
+        return lambda: pipeline.process(frames, WINDOW_FRAMES)
+    return setup
+
+
+def _cwt_bank_benchmark(inputs):
+    bank = CwtFilterBank(CWT_SCALES, 'morl', 1.0 / inputs.frame_rate, WINDOW_FRAMES)
+    phase = inputs.phase[np.newaxis, :]
+    return lambda: bank.transform(phase)
+
+
+def _phase_conditioning_benchmark(inputs):
+    # 先用整个窗口冷启动，之后每步只滤波新增的帧（稳态）
+    plan = DspPlan.from_params(inputs.params, WINDOW_FRAMES)
+    conditioner = PhaseConditioner()
+    samples = np.ascontiguousarray(inputs.mti[:, [inputs.target_bin]].T)
+    conditioner.update(plan, [1], [inputs.target_bin], samples)
+    return lambda: conditioner.update(plan, [1], [inputs.target_bin], samples, STEP_FRAMES)
+
+
+def _require_pyemd():
+    try:
+        import PyEMD  # noqa: F401
+    except ImportError:
+        return "未安装PyEMD库 (pip install EMD-signal)"
+    return None
+
+
+# 基准项: 名称 -> (说明, setup(inputs) -> 无参数函数, 可选的前提检查)
+BENCHMARKS = {
+    'range_fft': ('距离FFT 300x512', lambda i: lambda: range_fft(i.cube, window='hann'), None),
+    'mti_filter': ('MTI滤波 300x512', lambda i: lambda: mti_filter(i.range_profile), None),
+    'extract_phase': ('相位提取 300x512',
+                      lambda i: lambda: extract_phase(i.mti, i.range_resolution, i.wavelength), None),
+    'extract_phase_edacm': ('EDACM相位提取 300x512',
+                            lambda i: lambda: extract_phase_edacm(i.mti, i.range_resolution, i.wavelength), None),
+    'presence_detect': ('存在检测 单帧', _presence_benchmark, None),
+    'detect_targets': ('多目标检测 CFAR+峰值聚类 300x256',
+                       lambda i: lambda: detect_targets(i.multi_mti, i.range_resolution, len(MULTI_TARGET_RANGES)),
+                       None),
+    'extract_phases': (f'多目标相位提取 {len(MULTI_TARGET_RANGES)}目标',
+                       lambda i: lambda: extract_phases(i.multi_mti, i.multi_bins), None),
+    'respiration_rate': ('呼吸频率估计 300点',
+                         lambda i: lambda: estimate_respiration_rate(i.phase, i.frame_rate), None),
+    'phase_conditioning': (f'流式相位调理 呼吸+心跳带通 每步{STEP_FRAMES}帧',
+                           _phase_conditioning_benchmark, None),
+    'range_angle_map': (f'距离-角度图 {NUM_RX}天线 x {len(ANGLE_GRID)}角度 x 256',
+                        lambda i: lambda: range_angle_map(i.rx_mti, i.steering), None),
+    'range_doppler': ('距离+多普勒FFT 64x512',
+                      lambda i: lambda: doppler_fft(range_fft(i.chirp_cube, window='hann'), window='hann'), None),
+    'cfar_detector': ('CA-CFAR 64x256', lambda i: lambda: cfar_detector(i.rd_power), None),
+    'apply_cwt': ('CWT 64尺度 x 300点',
+                  lambda i: lambda: apply_cwt(i.phase, scales=CWT_SCALES, sampling_period=1.0 / i.frame_rate), None),
+    'cwt_filter_bank': ('CWT滤波器组 64尺度 x 300点', _cwt_bank_benchmark, None),
+    'apply_eemd': (f'EEMD {EEMD_TRIALS}次集合 x 300点',
+                   lambda i: lambda: apply_eemd(i.phase, ensemble_size=EEMD_TRIALS, max_imf=EEMD_MAX_IMF),
+                   _require_pyemd),
+    'pipeline_step_cwt': ('完整处理步骤（CWT）', _pipeline_benchmark('cwt'), None),
+    'pipeline_step_cwt_multi': (f'完整处理步骤（CWT，{len(MULTI_TARGET_RANGES)}个目标）',
+                                _pipeline_benchmark('cwt', len(MULTI_TARGET_RANGES)), None),
+    'pipeline_step_cwt_rx': (f'完整处理步骤（CWT，{NUM_RX}天线，{len(RX_TARGET_ANGLES)}个目标）',
+                             _pipeline_benchmark('cwt', len(RX_TARGET_ANGLES), NUM_RX), None),
+    'pipeline_step_eemd': ('完整处理步骤（EEMD）', _pipeline_benchmark('eemd'), _require_pyemd),
+}
+
+
+def measure(func, min_repeats=MIN_REPEATS, max_repeats=MAX_REPEATS, min_time=MIN_TIME):
+    """
+    测量一个无参数函数的用时和峰值内存
+
+    先预热一次，再重复调用直到达到min_repeats次且总时间达到min_time（最多max_repeats次）；
+    峰值内存在单独一次调用中用tracemalloc测量（tracemalloc会拖慢执行，不与计时混在一起）
+
+    返回:
+        结果字典: repeats、min_ms、median_ms、mean_ms、max_ms、peak_kb
+    """
+    func()
+    times = []
+    total = 0.0
+    while len(times) < max_repeats and (len(times) < min_repeats or total < min_time):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        total += elapsed
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    times_ms = np.array(times) * 1000
+    return {
+        'repeats': len(times),
+        'min_ms': float(times_ms.min()),
+        'median_ms': float(np.median(times_ms)),
+        'mean_ms': float(times_ms.mean()),
+        'max_ms': float(times_ms.max()),
+        'peak_kb': peak / 1024,
+    }
+
+
+def run_benchmarks(names=None, min_repeats=MIN_REPEATS, max_repeats=MAX_REPEATS, min_time=MIN_TIME, verbose=True):
+    """
+    运行基准测试
+
+    参数:
+        names: 要运行的基准项名称列表（支持前缀匹配），None表示全部
+        min_repeats / max_repeats / min_time: 见measure()
+        verbose: 是否逐项打印结果
+
+    返回:
+        结果字典 {'version', 'environment', 'results': {名称: 结果}}，不满足前提的项记录skipped原因
+    """
+    selected = [name for name in BENCHMARKS
+                if not names or any(name.startswith(prefix) for prefix in names)]
+    if not selected:
+        raise ValueError(f"没有匹配的基准项，可选: {', '.join(BENCHMARKS)}")
+
+    inputs = BenchmarkInputs()
+    results = {}
+    for name in selected:
+        description, setup, requirement = BENCHMARKS[name]
+        reason = requirement() if requirement else None
+        if reason:
+            results[name] = {'description': description, 'skipped': reason}
+            if verbose:
+                print(f"  {name:<24} 跳过: {reason}")
+            continue
+        result = measure(setup(inputs), min_repeats, max_repeats, min_time)
+        result['description'] = description
+        results[name] = result
+        if verbose:
+            print(f"  {name:<24} {result['median_ms']:9.2f}ms (最小 {result['min_ms']:.2f}ms, "
+                  f"{result['repeats']}次) | 峰值内存 {result['peak_kb']:9.1f}KB")
+
+    return {
+        'version': BENCHMARK_VERSION,
+        'environment': environment_info(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+
+
+def environment_info():
+    """运行环境（比较不同机器上的结果时作为参考）"""
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        import scipy
+        info['scipy'] = scipy.__version__
+    except ImportError:
+        pass
+    try:
+        import pywt
+        info['pywt'] = pywt.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def compare_results(baseline, current, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """
+    与基准结果比较
+
+    参数:
+        baseline: 基准结果（run_benchmarks()的返回值或其JSON）
+        current: 当前结果
+        time_threshold: 中位数用时增加超过该比例视为回归
+        memory_threshold: 峰值内存增加超过该比例视为回归
+
+    返回:
+        (是否通过, 逐项比较列表)，每项包含name、time_ratio、memory_ratio、status
+    """
+    rows = []
+    passed = True
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if 'skipped' in result or base is None or 'skipped' in base:
+            rows.append({'name': name, 'time_ratio': None, 'memory_ratio': None,
+                         'status': 'skipped' if 'skipped' in result else 'new'})
+            continue
+        time_ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] else None
+        memory_ratio = None
+        if max(result['peak_kb'], base['peak_kb']) >= MEMORY_FLOOR_KB and base['peak_kb'] > 0:
+            memory_ratio = result['peak_kb'] / base['peak_kb']
+
+        status = 'ok'
+        if time_ratio is not None and time_ratio > 1 + time_threshold:
+            status = 'slower'
+        elif memory_ratio is not None and memory_ratio > 1 + memory_threshold:
+            status = 'memory'
+        elif time_ratio is not None and time_ratio < 1 / (1 + time_threshold):
+            status = 'faster'
+        if status in ('slower', 'memory'):
+            passed = False
+        rows.append({'name': name, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio, 'status': status,
+                     'baseline_ms': base['median_ms'], 'current_ms': result['median_ms']})
+    return passed, rows
+
+
+def print_comparison(passed, rows, time_threshold=TIME_THRESHOLD):
+    status_names = {'ok': '正常', 'faster': '变快', 'slower': '变慢', 'memory': '内存增长',
+                    'skipped': '跳过', 'new': '无基准'}
+    print(f"\n与基准比较（阈值 +{time_threshold*100:.0f}%）:")
+    for row in rows:
+        if row['time_ratio'] is None:
+            print(f"  {row['name']:<24} {status_names[row['status']]}")
+            continue
+        memory = f"{row['memory_ratio']:.2f}x" if row['memory_ratio'] is not None else '-'
+        print(f"  {row['name']:<24} {row['baseline_ms']:9.2f}ms -> {row['current_ms']:9.2f}ms "
+              f"({row['time_ratio']:.2f}x) | 内存 {memory:>6} | {status_names[row['status']]}")
+    print(f"结果: {'通过' if passed else '性能回归'}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='雷达信号处理性能基准')
+    parser.add_argument('benchmarks', nargs='*', help=f"要运行的基准项（前缀匹配），可选: {', '.join(BENCHMARKS)}")
+    parser.add_argument('-o', '--output', type=str, default=None, help='结果保存为JSON文件')
+    parser.add_argument('-b', '--baseline', type=str, default=None, help='与指定的基准结果JSON比较')
+    parser.add_argument('--threshold', type=float, default=TIME_THRESHOLD,
+                        help=f'用时回归阈值（比例），默认：{TIME_THRESHOLD}')
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD,
+                        help=f'峰值内存回归阈值（比例），默认：{MEMORY_THRESHOLD}')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help=f'每项至少测量的时间（秒），默认：{MIN_TIME}')
+    parser.add_argument('--max-repeats', type=int, default=MAX_REPEATS, help=f'每项最多重复次数，默认：{MAX_REPEATS}')
+    args = parser.parse_args()
+
+    print("雷达信号处理性能基准")
+    report = run_benchmarks(args.benchmarks, max_repeats=args.max_repeats, min_time=args.min_time)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        passed, rows = compare_results(baseline, report, args.threshold, args.memory_threshold)
+        print_comparison(passed, rows, args.threshold)
+        sys.exit(0 if passed else 1)
@@ -0,0 +1,449 @@
+"""
+雷达设备模拟器
+在本机模拟PSoC6雷达设备（UDP_Server_Radar固件）的UDP控制协议：
+接收 {"radar_transmission": "enable"|"disable"|"test"} 控制命令，
+启用后以帧率发送录制文件或仿真生成的雷达帧，并可注入丢包、抖动和突发，
+用于在没有硬件的情况下测试接收端和处理流程
+"""
+
+import heapq
+import json
+import select
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from radar_simulator import RadarFrameSimulator
+
+# 与固件radar_task.h一致：数据报第1字节为命令，第2字节为填充
+RADAR_DATA_COMMAND = 1
+DUMMY_BYTE = 0xFF
+CONTROL_KEY = 'radar_transmission'
+CONTROL_BUFFER_SIZE = 1024
+
+SOURCE_CHUNK = 256              # 每次从数据源读取的帧数
+MAX_CATCH_UP = 10               # 发送线程落后时一次最多补发的帧数
+STATE_IDLE = 'idle'
+STATE_DATA = 'data'
+STATE_TEST = 'test'
+
+
+class NetworkImpairment:
+    """
+    网络损伤模型：为每帧计算实际发送时间，或决定丢弃
+
+    - loss: 独立随机丢包概率
+    - burst_rate/burst_length: 每帧开始一次连续丢包的概率和丢包帧数（模拟WiFi短时中断）
+    - jitter_ms: 发送延迟（半正态分布的标准差，毫秒），延迟超过帧间隔时帧会乱序到达
+    - stall_rate/stall_ms: 每帧开始一次发送停顿的概率和停顿时长，停顿期间的帧在结束时集中发出
+    """
+
+    def __init__(self, loss=0.0, burst_rate=0.0, burst_length=10, jitter_ms=0.0,
+                 stall_rate=0.0, stall_ms=200.0, seed=0):
+        self.loss = loss
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.jitter_ms = jitter_ms
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self._rng = np.random.default_rng(seed)
+        self._burst_remaining = 0
+        self._stall_until = 0.0
+
+        self.dropped_random = 0
+        self.dropped_burst = 0
+        self.bursts = 0
+        self.stalls = 0
+
+    def schedule(self, nominal_time):
+        """
+        计算一帧的发送时间
+
+        参数:
+            nominal_time: 按帧率计算的发送时间（perf_counter秒）
+
+        返回:
+            实际发送时间，丢弃时返回None
+        """
+        rng = self._rng
+        if self._burst_remaining == 0 and self.burst_rate and rng.random() < self.burst_rate:
+            self._burst_remaining = self.burst_length
+            self.bursts += 1
+        if self._burst_remaining:
+            self._burst_remaining -= 1
+            self.dropped_burst += 1
+            return None
+        if self.loss and rng.random() < self.loss:
+            self.dropped_random += 1
+            return None
+
+        send_time = nominal_time
+        if self.jitter_ms:
+            send_time += abs(rng.normal(0.0, self.jitter_ms / 1000))
+        if self.stall_rate and nominal_time >= self._stall_until and rng.random() < self.stall_rate:
+            self._stall_until = nominal_time + self.stall_ms / 1000
+            self.stalls += 1
+        return max(send_time, self._stall_until)
+
+    def get_stats(self):
+        return {
+            'dropped_random': self.dropped_random,
+            'dropped_burst': self.dropped_burst,
+            'dropped': self.dropped_random + self.dropped_burst,
+            'bursts': self.bursts,
+            'stalls': self.stalls,
+        }
+
+
+class RadarDeviceEmulator:
+    """
+    雷达设备模拟器
+
+    行为与固件一致：帧号在发送数据帧时递增（从1开始，disable后再enable继续递增），
+    test模式下发送"Frame N received correctly"文本。固件把数据发到固定的服务器地址，
+    模拟器默认发到最近一次发送控制命令的地址，指定target时与固件一样发到固定地址
+    """
+
+    def __init__(self, port=57345, host='0.0.0.0', target=None, recording=None, simulator=None,
+                 frame_rate=None, impairment=None, autostart=False, verbose=False):
+        """
+        参数:
+            port: 控制命令监听端口（同时是数据发送的源端口）
+            host: 监听地址
+            target: 固定的数据接收地址 (ip, port)，None表示发给控制命令的发送方
+            recording: 录制文件路径，循环发送其中的帧；None时使用simulator
+            simulator: RadarFrameSimulator，默认一个1米处的目标
+            frame_rate: 发送帧率，默认使用数据源的帧率
+            impairment: NetworkImpairment，None表示不注入网络损伤
+            autostart: 启动后立即开始发送（固件上电时的行为，需要指定target）
+            verbose: 打印每个控制命令
+        """
+        if autostart and target is None:
+            raise ValueError("autostart需要指定固定的target地址")
+        self.host = host
+        self.port = port
+        self.target = target
+        self.impairment = impairment or NetworkImpairment()
+        self.verbose = verbose
+        self.state = STATE_DATA if autostart else STATE_IDLE
+
+        self._recording = None
+        if recording is not None:
+            from radar_recording import open_recording
+            self._recording = open_recording(recording)
+            if len(self._recording) == 0:
+                raise ValueError(f"录制文件 {recording} 中没有帧")
+            self.frame_size = self._recording.frame_size
+            source_rate = self._recording.frame_rate
+        else:
+            self._simulator = simulator or RadarFrameSimulator()
+            self.frame_size = self._simulator.frame_size
+            source_rate = self._simulator.frame_rate
+        self.frame_rate = frame_rate or source_rate
+        self._chunk = None
+        self._chunk_pos = 0
+        self._source_pos = 0
+
+        self.sock = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = []          # (发送时间, 序号, 数据)
+        self._sequence = 0
+        self._peer = None
+        self._next_time = 0.0
+
+        self.frame_number = 0
+        self.test_frame = 0
+        self.frames_generated = 0
+        self.frames_sent = 0
+        self.control_messages = 0
+        self.invalid_messages = 0
+        self.send_errors = 0
+
+    # ------------------------------------------------------------------ 数据源
+
+    def _next_samples(self):
+        """下一帧样本（数据源循环使用）"""
+        if self._chunk is None or self._chunk_pos >= len(self._chunk):
+            if self._recording is not None:
+                if self._source_pos >= len(self._recording):
+                    self._source_pos = 0
+                self._chunk = self._recording.read(self._source_pos, self._source_pos + SOURCE_CHUNK)['samples']
+            else:
+                self._chunk = self._simulator.frames(self._source_pos, SOURCE_CHUNK)
+            self._source_pos += len(self._chunk)
+            self._chunk_pos = 0
+        samples = self._chunk[self._chunk_pos]
+        self._chunk_pos += 1
+        return samples
+
+    def _make_frame(self):
+        """生成下一个数据报（数据模式为雷达帧，test模式为校验文本）"""
+        if self.state == STATE_TEST:
+            self.test_frame += 1
+            return f"Frame {self.test_frame} received correctly".encode()
+        self.frame_number = (self.frame_number + 1) % (1 << 32)
+        return (struct.pack('<BBI', RADAR_DATA_COMMAND, DUMMY_BYTE, self.frame_number)
+                + np.asarray(self._next_samples(), dtype='<f2').tobytes())
+
+    # ------------------------------------------------------------------ 控制协议
+
+    def _handle_control(self, data, addr):
+        """解析一条控制命令（与固件json_parser_cb相同的取值）"""
+        self.control_messages += 1
+        try:
+            command = json.loads(data.decode('utf-8'))
+            value = command[CONTROL_KEY]
+        except (UnicodeDecodeError, json.JSONDecodeError, TypeError, KeyError):
+            self.invalid_messages += 1
+            print(f"模拟设备: 无效的参数名 {data[:64]!r}")
+            return
+
+        previous = self.state
+        if value == 'enable':
+            self.state = STATE_DATA
+        elif value == 'disable':
+            self.state = STATE_IDLE
+        elif value == 'test':
+            self.state = STATE_TEST
+        else:
+            self.invalid_messages += 1
+            print(f"模拟设备: 无效的设置值 {value!r}")
+            return
+
+        if self.target is None:
+            self._peer = addr
+        if self.state != previous:
+            # 重新开始按帧率计时，不补发停止期间的帧
+            self._next_time = time.perf_counter()
+        if self.verbose:
+            print(f"模拟设备: 收到 {value} 来自 {addr[0]}:{addr[1]} | 状态: {self.state}")
+
+    # ------------------------------------------------------------------ 主循环
+
+    def open(self):
+        """绑定控制端口，返回套接字对象"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((self.host, self.port))
+        self.sock = sock
+        return sock
+
+    def run(self):
+        """运行模拟器直到stop()被调用（阻塞）"""
+        if self.sock is None:
+            self.open()
+        sock = self.sock
+        interval = 1.0 / self.frame_rate
+        self._next_time = time.perf_counter()
+
+        try:
+            while not self._stop.is_set():
+                now = time.perf_counter()
+                deadlines = [now + 0.1]
+                if self.state != STATE_IDLE:
+                    deadlines.append(self._next_time)
+                if self._pending:
+                    deadlines.append(self._pending[0][0])
+                timeout = max(0.0, min(deadlines) - now)
+
+                readable, _, _ = select.select([sock], [], [], timeout)
+                if readable:
+                    data, addr = sock.recvfrom(CONTROL_BUFFER_SIZE)
+                    self._handle_control(data, addr)
+
+                now = time.perf_counter()
+                destination = self.target or self._peer
+                if self.state != STATE_IDLE and destination is not None:
+                    generated = 0
+                    while self._next_time <= now and generated < MAX_CATCH_UP:
+                        payload = self._make_frame()
+                        self.frames_generated += 1
+                        send_time = self.impairment.schedule(self._next_time)
+                        if send_time is not None:
+                            heapq.heappush(self._pending, (send_time, self._sequence, payload))
+                            self._sequence += 1
+                        self._next_time += interval
+                        generated += 1
+                    if self._next_time <= now:
+                        # 落后超过MAX_CATCH_UP帧时放弃追赶，从当前时刻重新计时
+                        self._next_time = now + interval
+
+                while self._pending and self._pending[0][0] <= now:
+                    _, _, payload = heapq.heappop(self._pending)
+                    if destination is None:
+                        continue
+                    try:
+                        sock.sendto(payload, destination)
+                        self.frames_sent += 1
+                    except OSError:
+                        self.send_errors += 1
+        finally:
+            sock.close()
+            self.sock = None
+            if self._recording is not None:
+                self._recording.close()
+
+    def start(self):
+        """在后台线程中运行，返回线程对象"""
+        if self.sock is None:
+            self.open()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """停止模拟器"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def get_stats(self):
+        """模拟器统计"""
+        return {
+            'state': self.state,
+            'frame_number': self.frame_number,
+            'frames_generated': self.frames_generated,
+            'frames_sent': self.frames_sent,
+            'pending': len(self._pending),
+            'control_messages': self.control_messages,
+            'invalid_messages': self.invalid_messages,
+            'send_errors': self.send_errors,
+            'impairment': self.impairment.get_stats(),
+        }
+
+
+def run_receiver_benchmark(duration, impairment=None, port=57400, recording=None, frame_rate=None):
+    """
+    用模拟设备测试接收端：RadarUdpReceiver + FrameSequencer在网络损伤下的表现
+
+    接收端与实际处理器一样从自己的套接字向设备发送enable，结束时发送disable，
+    然后对比设备注入的丢包与帧序号跟踪器检测到的丢包、乱序
+
+    参数:
+        duration: 测试时长（秒）
+        impairment: NetworkImpairment
+        port: 设备控制端口，接收端使用port+1
+        recording: 录制文件路径，None时使用仿真数据
+        frame_rate: 发送帧率
+
+    返回:
+        结果字典
+    """
+    import asyncio
+
+    from frame_sequence import FrameSequencer
+    from radar_receiver import RadarUdpReceiver
+
+    emulator = RadarDeviceEmulator(port=port, host='127.0.0.1', recording=recording,
+                                   frame_rate=frame_rate, impairment=impairment)
+    emulator.start()
+
+    released = [0]
+    text_messages = [0]
+
+    def output(frame_number, samples, filled):
+        released[0] += 1
+
+    sequencer = FrameSequencer(output)
+
+    def handle(payload, addr, arrival_ns):
+        if len(payload) < 6 or payload[0] != RADAR_DATA_COMMAND:
+            text_messages[0] += 1
+            return
+        frame_number = int.from_bytes(payload[2:6], 'little')
+        sequencer.push(frame_number, np.frombuffer(payload, dtype='<f2', offset=6), arrival_ns / 1e9)
+
+    receiver = RadarUdpReceiver(port + 1, handle, host='127.0.0.1')
+    sock = receiver.open()
+    device = ('127.0.0.1', port)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        loop.call_later(duration, receiver.stop)
+        await receiver.serve()
+
+    sock.sendto(json.dumps({CONTROL_KEY: 'enable'}).encode(), device)
+    started = time.perf_counter()
+    asyncio.run(serve())
+    elapsed = time.perf_counter() - started
+    sock.sendto(json.dumps({CONTROL_KEY: 'disable'}).encode(), device)
+    time.sleep(0.1)
+    sequencer.flush()
+    emulator.stop()
+    # 内核丢包数从套接字读取，必须在关闭之前读取
+    kernel_drops = receiver.kernel_drops()
+    receiver.close()
+
+    device_stats = emulator.get_stats()
+    sequence = sequencer.get_stats()
+    return {
+        'duration': elapsed,
+        'device': device_stats,
+        'datagrams_received': receiver.stats.datagrams,
+        'kernel_drops': kernel_drops,
+        'sequence': sequence,
+        'injected_loss': device_stats['impairment']['dropped'],
+        'detected_loss': sequence['lost'],
+        'frames_released': released[0],
+    }
+
+
+def parse_address(text):
+    """解析 ip:port 形式的地址"""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='雷达设备模拟器（UDP控制协议 + 数据流）')
+    parser.add_argument('--port', type=int, default=57345, help='控制命令监听端口')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='监听地址')
+    parser.add_argument('--target', type=str, default=None,
+                        help='固定的数据接收地址 ip:port（默认发给控制命令的发送方）')
+    parser.add_argument('--recording', type=str, default=None, help='循环发送的录制文件（默认使用仿真数据）')
+    parser.add_argument('--frame-rate', type=float, default=None, help='发送帧率')
+    parser.add_argument('--autostart', action='store_true', help='启动后立即发送（需要--target）')
+    parser.add_argument('--loss', type=float, default=0.0, help='随机丢包概率')
+    parser.add_argument('--burst-rate', type=float, default=0.0, help='每帧开始连续丢包的概率')
+    parser.add_argument('--burst-length', type=int, default=10, help='连续丢包的帧数')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='发送延迟抖动（毫秒）')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='每帧开始发送停顿的概率')
+    parser.add_argument('--stall-ms', type=float, default=200.0, help='发送停顿时长（毫秒）')
+    parser.add_argument('--seed', type=int, default=0, help='网络损伤随机种子')
+    parser.add_argument('--benchmark', type=float, default=None, metavar='SECONDS',
+                        help='不作为独立设备运行，而是在本进程中测试接收端指定秒数')
+    args = parser.parse_args()
+
+    impairment = NetworkImpairment(args.loss, args.burst_rate, args.burst_length, args.jitter_ms,
+                                   args.stall_rate, args.stall_ms, args.seed)
+
+    if args.benchmark:
+        result = run_receiver_benchmark(args.benchmark, impairment, port=args.port,
+                                        recording=args.recording, frame_rate=args.frame_rate)
+        sequence = result['sequence']
+        print(f"时长: {result['duration']:.1f}秒 | 设备生成: {result['device']['frames_generated']}帧 | "
+              f"发送: {result['device']['frames_sent']}帧 | 接收: {result['datagrams_received']}个数据报")
+        print(f"注入丢包: {result['injected_loss']} | 检测到丢帧: {result['detected_loss']} | "
+              f"乱序: {sequence['reordered']} | 迟到: {sequence['late']} | 重新同步: {sequence['resyncs']} | "
+              f"内核丢包: {result['kernel_drops']}")
+        print(f"缺口分布: {sequence['gap_histogram']}")
+    else:
+        target = parse_address(args.target) if args.target else None
+        emulator = RadarDeviceEmulator(args.port, args.host, target, args.recording,
+                                       frame_rate=args.frame_rate, impairment=impairment,
+                                       autostart=args.autostart, verbose=True)
+        emulator.open()
+        print(f"模拟设备监听 {args.host}:{args.port} | 帧率: {emulator.frame_rate:.0f}Hz | "
+              f"数据源: {args.recording or '仿真'} | 状态: {emulator.state}")
+        try:
+            emulator.run()
+        except KeyboardInterrupt:
+            pass
+        stats = emulator.get_stats()
+        print(f"已发送 {stats['frames_sent']}帧 | 注入丢包 {stats['impairment']['dropped']} | "
+              f"控制命令 {stats['control_messages']}")
@@ -1,44 +1,73 @@
 import numpy as np
 from scipy import signal
+from scipy import fft as scipy_fft
 
-def range_fft(data, window='hanning', zero_padding_factor=1):
+# 目标检测的默认距离范围（米）
+MIN_TARGET_RANGE = 0.2
+MAX_TARGET_RANGE = 2.0
+
+def window_function(window, length):
     """
-    对雷达数据执行距离FFT（在采样点维度）
+    按名称生成窗函数
     
     参数:
-        data: 形状为(frames, antennas, chirps, samples)的雷达原始数据
-        window: 窗函数类型，默认为hanning
-        zero_padding_factor: 零填充因子，默认为1（不进行零填充）
+        window: 窗函数类型（hann/hanning、hamming、blackman、rectangular/none）
+        length: 窗长度
     
     返回:
-        距离FFT结果，形状为(frames, antennas, chirps, samples*zero_padding_factor)
+        长度为length的窗函数数组
     """
-    frames, antennas, chirps, samples = data.shape
-    
-    # 应用窗函数
     if window.lower() == 'hanning' or window.lower() == 'hann':  # 同时接受hann和hanning
-        win = np.hanning(samples)
+        return np.hanning(length)
     elif window.lower() == 'hamming':
-        win = np.hamming(samples)
+        return np.hamming(length)
     elif window.lower() == 'blackman':
-        win = np.blackman(samples)
+        return np.blackman(length)
     elif window.lower() == 'rectangular' or window.lower() == 'none':
-        win = np.ones(samples)
+        return np.ones(length)
     else:
         raise ValueError(f"不支持的窗函数类型: {window}")
+
+def range_bin_limits(range_resolution, num_range_bins, min_range=MIN_TARGET_RANGE, max_range=MAX_TARGET_RANGE):
+    """
+    检测距离范围对应的距离bin范围（不使用可能代表DC分量的bin 0；范围无效时使用全部bin）
     
-    # 准备输出数组
-    fft_size = samples * zero_padding_factor
-    range_fft_data = np.zeros((frames, antennas, chirps, fft_size), dtype=complex)
+    返回:
+        (min_bin, max_bin)，包含两端
+    """
+    min_bin = max(1, int(min_range / range_resolution))
+    max_bin = min(num_range_bins - 1, int(max_range / range_resolution))
+    if max_bin <= min_bin:
+        min_bin, max_bin = 0, num_range_bins - 1
+    return min_bin, max_bin
+
+def range_fft(data, window='hanning', zero_padding_factor=1, out=None):
+    """
+    对雷达数据执行距离FFT（在采样点维度）
     
-    # 应用窗函数并执行FFT
-    for f in range(frames):
-        for a in range(antennas):
-            for c in range(chirps):
-                windowed_data = data[f, a, c, :] * win
-                range_fft_data[f, a, c, :] = np.fft.fft(windowed_data, n=fft_size)
+    参数:
+        data: 形状为(frames, antennas, chirps, samples)的雷达原始数据（实数或复数）
+        window: 窗函数类型，默认为hanning；也可以是预先计算的窗函数数组
+        zero_padding_factor: 零填充因子，默认为1（不进行零填充）
+        out: 可选的C连续复数工作数组，形状为(frames, antennas, chirps, samples*zero_padding_factor)，
+             指定时加窗结果写入其中并原地执行FFT，不分配新的大数组
     
-    return range_fft_data
+    返回:
+        距离FFT结果，形状为(frames, antennas, chirps, samples*zero_padding_factor)（指定out时与out共享内存）
+    """
+    frames, antennas, chirps, samples = data.shape
+    
+    # 应用窗函数
+    win = window if isinstance(window, np.ndarray) else window_function(window, samples)
+    
+    # 应用窗函数并沿采样点维度一次对所有帧、天线和chirp执行FFT
+    fft_size = samples * zero_padding_factor
+    if out is None:
+        # 加窗结果本身就是新数组，原地FFT，不再分配第二个窗口大小的数组
+        return scipy_fft.fft(np.multiply(data, win, dtype=complex), n=fft_size, axis=-1, overwrite_x=True)
+    np.multiply(data, win, out=out[..., :samples])
+    out[..., samples:] = 0
+    return scipy_fft.fft(out, axis=-1, overwrite_x=True)
 
 
 
@@ -81,7 +110,7 @@ def doppler_fft(range_fft_data, window='hanning', zero_padding_factor=1):
     
     return doppler_fft_data
 
-def mti_filter(data, filter_order=2):
+def mti_filter(data, filter_order=2, out=None, return_clutter=False):
     """
     应用移动目标指示(MTI)滤波器，去除静态杂波
     使用均值相消法实现MTI
@@ -89,28 +118,19 @@ def mti_filter(data, filter_order=2):
     参数:
         data: 形状为(frames, antennas, chirps, samples)的雷达原始数据
         filter_order: 保留参数（为兼容接口），在均值相消实现中不起作用
+        out: 可选的输出数组（可以是data本身，即原地滤波）
+        return_clutter: 是否同时返回减去的均值（静态杂波）
     
     返回:
-        MTI处理后的数据，形状与输入相同
+        MTI处理后的数据，形状与输入相同；return_clutter为True时同时返回
+        形状为(1, antennas, chirps, samples)的均值
     """
-    # 获取数据维度
-    frames, antennas, chirps, samples = data.shape
-    
-    # 使用与原始数据相同类型的空数组初始化结果
-    mti_data = np.zeros_like(data)
-    
-    # 分别处理每个天线和chirp，避免一次性分配大量内存
-    for a in range(antennas):
-        for c in range(chirps):
-            for s in range(samples):
-                # 提取当前处理的1D时间序列
-                time_series = data[:, a, c, s]
-                # 计算该时间序列的均值
-                mean_val = np.mean(time_series)
-                # 减去均值并存储结果
-                mti_data[:, a, c, s] = time_series - mean_val
-    
-    return mti_data
+    # 沿帧维度对所有天线、chirp和采样点一次减去各自时间序列的均值
+    clutter = np.mean(data, axis=0, keepdims=True)
+    filtered = np.subtract(data, clutter, out=out)
+    if return_clutter:
+        return filtered, clutter
+    return filtered
 
 def cfar_detector(rd_matrix, guard_cells=2, reference_cells=4, pfa=1e-4, method='ca'):
     """
@@ -184,7 +204,7 @@ def cfar_detector(rd_matrix, guard_cells=2, reference_cells=4, pfa=1e-4, method=
     
     return detections
 
-def extract_phase(radar_data, range_resolution, wavelength, verbose=False):
+def extract_phase(radar_data, range_resolution, wavelength, verbose=False, bin_limits=None):
     """
     使用最大功率距离bin选择法提取目标相位。
     
@@ -193,6 +213,7 @@ def extract_phase(radar_data, range_resolution, wavelength, verbose=False):
     range_resolution: float，距离分辨率（米/bin）
     wavelength: float，雷达波长（米）
     verbose: bool，是否打印目标信息，默认为False
+    bin_limits: 可选的预先计算的(min_bin, max_bin)，None时按0.2-2.0米计算
     
     返回:
     phase_values: 1D numpy数组，目标的相位值
@@ -200,13 +221,16 @@ def extract_phase(radar_data, range_resolution, wavelength, verbose=False):
     """
     num_frames, num_range_bins = radar_data.shape
     
-    # 设置最小和最大距离范围（米）
-    min_range = 0.2  # 最小为0.2米
-    max_range = 2.0  # 最大为2.0米
-    
-    # 转换为bin索引（确保不使用bin 0，它可能代表DC分量）
-    min_bin = max(1, int(min_range / range_resolution))
-    max_bin = min(num_range_bins - 1, int(max_range / range_resolution))
+    if bin_limits is not None:
+        min_bin, max_bin = bin_limits
+    else:
+        # 设置最小和最大距离范围（米）
+        min_range = 0.2  # 最小为0.2米
+        max_range = 2.0  # 最大为2.0米
+        
+        # 转换为bin索引（确保不使用bin 0，它可能代表DC分量）
+        min_bin = max(1, int(min_range / range_resolution))
+        max_bin = min(num_range_bins - 1, int(max_range / range_resolution))
     
     # 计算距离范围内的平均功率
     if max_bin > min_bin:
@@ -232,6 +256,239 @@ def extract_phase(radar_data, range_resolution, wavelength, verbose=False):
     
     return phase_values, target_bin 
 
+def ca_cfar_1d(power, guard_cells=2, reference_cells=8, pfa=1e-3):
+    """
+    沿最后一维（距离）的一维CA-CFAR检测，用前缀和一次计算所有单元两侧参考单元的平均功率，
+    边缘处只使用存在的参考单元。
+    
+    参数:
+    power: 1D或2D numpy数组，功率（2D时每行独立检测，例如距离-角度图的每个角度）
+    guard_cells: int，单侧保护单元数
+    reference_cells: int，单侧参考单元数
+    pfa: float，虚警概率
+    
+    返回:
+    detections: 与power形状相同的布尔数组
+    """
+    num_cells = power.shape[-1]
+    window = guard_cells + reference_cells
+    zeros = np.zeros(power.shape[:-1] + (1,))
+    padded = np.concatenate((zeros, np.cumsum(power, axis=-1)), axis=-1)
+    cells = np.arange(num_cells)
+    def window_sum(lo, hi):
+        lo = np.clip(lo, 0, num_cells)
+        hi = np.clip(hi, 0, num_cells)
+        return padded[..., hi] - padded[..., lo], hi - lo
+    left_sum, left_count = window_sum(cells - window, cells - guard_cells)
+    right_sum, right_count = window_sum(cells + guard_cells + 1, cells + window + 1)
+    count = np.maximum(left_count + right_count, 1)
+    num_ref_cells = 2 * reference_cells
+    threshold_factor = num_ref_cells * (pfa ** (-1/num_ref_cells) - 1)
+    return power > (left_sum + right_sum) / count * threshold_factor
+
+def detect_targets(radar_data, range_resolution, max_targets=3, min_range=MIN_TARGET_RANGE,
+                   max_range=MAX_TARGET_RANGE, guard_cells=2, reference_cells=8, pfa=1e-3, min_separation=0.15,
+                   bin_limits=None):
+    """
+    在距离剖面上检测多个目标（一维CA-CFAR + 峰值聚类）。
+    对窗口内每个距离bin的平均功率做CA-CFAR，过检测门限的bin中取局部最大值作为峰值，
+    再按功率从大到小选取彼此距离不小于min_separation的峰值（相邻的旁瓣并入同一个目标）。
+    
+    参数:
+    radar_data: 2D numpy数组，形状为(num_frames, num_range_bins)，雷达距离谱数据
+    range_resolution: float，距离分辨率（米/bin）
+    max_targets: int，最多返回的目标数
+    min_range: float，最小检测距离（米）
+    max_range: float，最大检测距离（米）
+    guard_cells: int，单侧保护单元数
+    reference_cells: int，单侧参考单元数
+    pfa: float，虚警概率
+    min_separation: float，两个目标之间的最小距离（米）
+    bin_limits: 可选的预先计算的(min_bin, max_bin)，指定时忽略min_range和max_range
+    
+    返回:
+    target_bins: 1D int数组，目标的距离bin索引（按功率从大到小）；
+                 没有bin通过CFAR时只包含范围内功率最强的bin（与extract_phase选择的bin相同）
+    target_powers: 1D numpy数组，各目标bin的平均功率
+    """
+    num_frames, num_range_bins = radar_data.shape
+    bin_power = np.mean(np.abs(radar_data)**2, axis=0)
+    
+    min_bin, max_bin = bin_limits or range_bin_limits(range_resolution, num_range_bins, min_range, max_range)
+    
+    detections = ca_cfar_1d(bin_power, guard_cells, reference_cells, pfa)
+    
+    # 只保留检测范围内的局部最大值
+    local_max = np.zeros(num_range_bins, dtype=bool)
+    local_max[1:-1] = (bin_power[1:-1] >= bin_power[:-2]) & (bin_power[1:-1] >= bin_power[2:])
+    candidates = min_bin + np.flatnonzero((detections & local_max)[min_bin:max_bin+1])
+    if len(candidates) == 0:
+        candidates = np.array([min_bin + np.argmax(bin_power[min_bin:max_bin+1])])
+    
+    # 按功率从大到小选取，距离已选目标太近的峰值视为同一个目标的旁瓣
+    separation_bins = min_separation / range_resolution
+    selected = []
+    for candidate in candidates[np.argsort(bin_power[candidates])[::-1]]:
+        if all(abs(candidate - b) >= separation_bins for b in selected):
+            selected.append(candidate)
+            if len(selected) >= max_targets:
+                break
+    target_bins = np.array(selected, dtype=int)
+    return target_bins, bin_power[target_bins]
+
+def extract_phases(radar_data, target_bins):
+    """
+    一次提取多个距离bin的相位序列。
+    
+    参数:
+    radar_data: 2D numpy数组，形状为(num_frames, num_range_bins)，雷达距离谱数据
+    target_bins: 1D int数组，目标的距离bin索引
+    
+    返回:
+    phases: 2D numpy数组，形状为(len(target_bins), num_frames)，每行为一个目标的相位
+    """
+    return np.ascontiguousarray(np.angle(radar_data[:, target_bins]).T)
+
+def deinterleave_rx(frames, num_rx, num_chirps=1):
+    """
+    把设备FIFO顺序的帧（每个采样点的各接收天线样本相邻存放）整理为(frames, antennas, chirps, samples)。
+    整个窗口一次重排（返回视图，不拷贝）。
+    
+    参数:
+    frames: 2D numpy数组，形状为(num_frames, num_chirps * num_samples * num_rx)
+    num_rx: int，接收天线数
+    num_chirps: int，每帧chirp数
+    
+    返回:
+    形状为(num_frames, num_rx, num_chirps, num_samples)的数组视图
+    """
+    num_frames, frame_size = frames.shape
+    if frame_size % (num_rx * num_chirps):
+        raise ValueError(f"帧长度 {frame_size} 不是 天线数{num_rx} × chirp数{num_chirps} 的整数倍")
+    return frames.reshape(num_frames, num_chirps, -1, num_rx).transpose(0, 3, 1, 2)
+
+def steering_vectors(rx_positions, angles):
+    """
+    线阵的导向矢量。
+    
+    参数:
+    rx_positions: 1D数组，各接收天线的水平位置（单位：波长）
+    angles: 1D数组，方位角（弧度，0为正前方）
+    
+    返回:
+    steering: 2D复数数组，形状为(len(angles), len(rx_positions))
+    """
+    rx_positions = np.asarray(rx_positions, dtype=float)
+    return np.exp(2j * np.pi * np.sin(np.asarray(angles))[:, np.newaxis] * rx_positions[np.newaxis, :])
+
+def range_angle_map(radar_data, steering):
+    """
+    距离-角度功率图（Bartlett波束形成）。
+    先对整个窗口计算每个距离bin的天线协方差矩阵，再对所有角度一次扫描，
+    计算量与帧数无关（不需要对每帧做波束形成或角度FFT）。
+    
+    参数:
+    radar_data: 3D复数数组，形状为(num_frames, num_rx, num_range_bins)，MTI滤波后的距离谱
+    steering: 导向矢量，形状为(num_angles, num_rx)
+    
+    返回:
+    power: 2D数组，形状为(num_angles, num_range_bins)，各角度、各距离bin的平均功率
+    """
+    num_frames, num_rx, _ = radar_data.shape
+    # 每个距离bin的协方差矩阵 R[b] = E[x x^H]，形状(bins, rx, rx)；
+    # 用实部、虚部视图分别累加（x x^H的虚部是反对称的），不生成整个窗口的共轭副本
+    real, imag = radar_data.real, radar_data.imag
+    cross = np.einsum('fab,fcb->bac', imag, real)
+    covariance = np.einsum('fab,fcb->bac', real, real) + np.einsum('fab,fcb->bac', imag, imag)
+    covariance = (covariance + 1j * (cross - cross.transpose(0, 2, 1))) / num_frames
+    # P(θ, b) = a(θ)^H R[b] a(θ) / N^2
+    power = np.einsum('na,bac,nc->nb', steering.conj(), covariance, steering, optimize=True)
+    return power.real / num_rx**2
+
+def detect_range_angle_targets(ra_power, range_resolution, angles, max_targets=3, min_range=MIN_TARGET_RANGE,
+                               max_range=MAX_TARGET_RANGE, guard_cells=2, reference_cells=8, pfa=1e-3,
+                               min_separation=0.15, min_angle_separation=np.deg2rad(30), bin_limits=None):
+    """
+    在距离-角度图上检测多个目标：每个角度沿距离做CA-CFAR，取二维局部最大值，
+    再按功率从大到小选取；距离和角度都与已选目标太近的峰值视为同一个目标，
+    因此同一距离、不同方向的两个人可以分开。
+    
+    参数:
+    ra_power: 2D数组，形状为(num_angles, num_range_bins)，距离-角度功率图
+    range_resolution: float，距离分辨率（米/bin）
+    angles: 1D数组，ra_power各行对应的方位角（弧度）
+    max_targets: int，最多返回的目标数
+    min_range、max_range: float，检测距离范围（米）
+    guard_cells、reference_cells、pfa: CA-CFAR参数
+    min_separation: float，同一方向上两个目标之间的最小距离（米）
+    min_angle_separation: float，同一距离上两个目标之间的最小角度差（弧度）
+    bin_limits: 可选的预先计算的(min_bin, max_bin)，指定时忽略min_range和max_range
+    
+    返回:
+    target_bins: 1D int数组，目标的距离bin索引（按功率从大到小）；
+                 没有单元通过CFAR时只包含范围内功率最强的单元
+    angle_indices: 1D int数组，目标的角度索引
+    target_powers: 1D numpy数组，各目标单元的功率
+    """
+    num_angles, num_range_bins = ra_power.shape
+    min_bin, max_bin = bin_limits or range_bin_limits(range_resolution, num_range_bins, min_range, max_range)
+    
+    detections = ca_cfar_1d(ra_power, guard_cells, reference_cells, pfa)
+    
+    # 二维局部最大值（与8个相邻单元比较，边界外视为负无穷）
+    padded = np.pad(ra_power, 1, constant_values=-np.inf)
+    local_max = np.ones_like(detections)
+    for da in (-1, 0, 1):
+        for db in (-1, 0, 1):
+            if da or db:
+                local_max &= ra_power >= padded[1+da:1+da+num_angles, 1+db:1+db+num_range_bins]
+    in_range = np.zeros(num_range_bins, dtype=bool)
+    in_range[min_bin:max_bin+1] = True
+    angle_idx, bin_idx = np.nonzero(detections & local_max & in_range[np.newaxis, :])
+    if len(bin_idx) == 0:
+        flat = np.argmax(ra_power[:, min_bin:max_bin+1])
+        angle_idx, bin_idx = np.unravel_index(flat, (num_angles, max_bin - min_bin + 1))
+        angle_idx, bin_idx = np.array([angle_idx]), np.array([min_bin + bin_idx])
+    
+    # 按功率从大到小选取
+    separation_bins = min_separation / range_resolution
+    selected = []
+    for i in np.argsort(ra_power[angle_idx, bin_idx])[::-1]:
+        b, a = bin_idx[i], angle_idx[i]
+        if all(abs(b - sb) >= separation_bins or abs(angles[a] - angles[sa]) >= min_angle_separation
+               for sb, sa in selected):
+            selected.append((b, a))
+            if len(selected) >= max_targets:
+                break
+    target_bins = np.array([b for b, _ in selected], dtype=int)
+    angle_indices = np.array([a for _, a in selected], dtype=int)
+    return target_bins, angle_indices, ra_power[angle_indices, target_bins]
+
+def beamform_signals(radar_data, target_bins, weights):
+    """
+    对多个目标做相干合并：每个目标的各天线信号按其方向的导向矢量加权求和，
+    相位一致的目标回波叠加而各天线的噪声不相关，相位信噪比约提高天线数倍。
+    
+    参数:
+    radar_data: 3D复数数组，形状为(num_frames, num_rx, num_range_bins)
+    target_bins: 1D int数组，目标的距离bin索引
+    weights: 2D复数数组，形状为(len(target_bins), num_rx)，各目标的导向矢量
+    
+    返回:
+    signals: 2D复数数组，形状为(len(target_bins), num_frames)
+    """
+    # 一次取出所有目标bin的数据 (frames, rx, targets)，再按目标加权合并
+    return np.einsum('fak,ka->kf', radar_data[:, :, target_bins], weights.conj())
+
+def beamform_phases(radar_data, target_bins, weights):
+    """
+    对多个目标做相干合并后提取相位（见beamform_signals）
+    
+    返回:
+    phases: 2D numpy数组，形状为(len(target_bins), num_frames)
+    """
+    return np.angle(beamform_signals(radar_data, target_bins, weights))
+
 def extract_phase_edacm(radar_data, range_resolution, wavelength, verbose=False):
     """
     使用增强差分交叉相乘(EDACM)方法提取目标相位。
@@ -310,4 +567,69 @@ def extract_phase_edacm(radar_data, range_resolution, wavelength, verbose=False)
         target_distance = target_bin * range_resolution
         print(f"检测到目标：距离bin = {target_bin}，距离 = {target_distance:.2f}米")
     
-    return phase_values, phase_diff, target_bin
\ No newline at end of file
+    return phase_values, phase_diff, target_bin
+
+def estimate_respiration_rate(phase_values, frame_rate, min_bpm=6.0, max_bpm=30.0, nfft=2048,
+                              min_band_ratio=0.3):
+    """
+    从目标相位序列估计呼吸频率。
+    相位解缠绕并去除线性趋势后加汉宁窗，补零做FFT，在呼吸频带内找功率峰值并用抛物线插值细化；
+    呼吸频带能量占0.05Hz以上总能量的比例作为可信度，低于阈值时认为没有可靠的呼吸信号。
+    
+    参数:
+    phase_values: 1D numpy数组，目标相位（可以是缠绕的相位）
+    frame_rate: float，相位序列的采样率（Hz）
+    min_bpm: float，呼吸频带下限（次/分钟）
+    max_bpm: float，呼吸频带上限（次/分钟）
+    nfft: int，FFT点数（补零提高峰值定位精度），小于序列长度时使用序列长度
+    min_band_ratio: float，呼吸频带能量占比的最小值
+    
+    返回:
+    respiration_rate: float，呼吸频率（次/分钟），没有可靠的呼吸信号时为None
+    band_ratio: float，呼吸频带能量占比
+    """
+    num_samples = len(phase_values)
+    if num_samples < 4:
+        return None, 0.0
+    
+    # 解缠绕后去除线性趋势（目标缓慢移动造成的相位漂移）
+    phase = signal.detrend(np.unwrap(phase_values))
+    nfft = max(nfft, num_samples)
+    power = np.abs(np.fft.rfft(phase * np.hanning(num_samples), n=nfft)) ** 2
+    freqs = np.fft.rfftfreq(nfft, 1.0 / frame_rate)
+    
+    band = (freqs >= min_bpm / 60.0) & (freqs <= max_bpm / 60.0)
+    total = power[freqs >= 0.05].sum()
+    if not band.any() or total <= 0:
+        return None, 0.0
+    band_ratio = float(power[band].sum() / total)
+    if band_ratio < min_band_ratio:
+        return None, band_ratio
+    
+    # 频带内的最大峰值，用相邻两点做抛物线插值
+    band_indices = np.flatnonzero(band)
+    peak = band_indices[np.argmax(power[band])]
+    offset = 0.0
+    if 0 < peak < len(power) - 1:
+        left, center, right = power[peak - 1], power[peak], power[peak + 1]
+        denominator = left - 2 * center + right
+        if denominator < 0:
+            offset = 0.5 * (left - right) / denominator
+    respiration_rate = (peak + offset) * frame_rate / nfft * 60.0
+    return float(respiration_rate), band_ratio
+
+def design_bandpass_sos(low_hz, high_hz, frame_rate, order=4):
+    """
+    设计相位流的Butterworth带通滤波器（二阶节形式，数值上比传递函数形式稳定）。
+    
+    参数:
+    low_hz、high_hz: float，通带下限和上限（Hz）
+    frame_rate: float，相位序列的采样率（雷达帧率，Hz）
+    order: int，滤波器阶数
+    
+    返回:
+    sos: 2D numpy数组，形状为(节数, 6)
+    zi: 2D numpy数组，形状为(节数, 2)，输入为1时的稳态滤波器状态（乘以第一个样本作为初始状态）
+    """
+    sos = signal.butter(order, [low_hz, high_hz], btype='bandpass', fs=frame_rate, output='sos')
+    return sos, signal.sosfilt_zi(sos)
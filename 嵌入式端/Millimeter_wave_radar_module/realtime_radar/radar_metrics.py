@@ -0,0 +1,141 @@
+"""
+处理延迟直方图和计数器
+指标在热路径中只做一次二分查找和几次整数加法，GET /metrics 时再汇总为Prometheus文本格式；
+已有统计对象中的计数（接收器、序号跟踪器、录制等）通过回调在输出时读取，不增加热路径开销
+"""
+
+import math
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 直方图桶上限（秒）
+DECODE_BUCKETS = (10e-6, 25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 10e-3)
+STAGE_BUCKETS = (0.5e-3, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0)
+LATENCY_BUCKETS = (10e-3, 25e-3, 50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    固定桶直方图
+
+    observe()只应在一个线程中调用（每个直方图一个写入方）；
+    输出时读取到的桶计数和总数可能相差正在写入的一次观测，对监控没有影响
+    """
+
+    def __init__(self, buckets, labels=None):
+        self.bounds = tuple(buckets)
+        self.labels = labels or {}
+        self.counts = [0] * (len(self.bounds) + 1)   # 最后一个为+Inf桶
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """记录一次观测值（秒）"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(bound)
+            yield f'{name}_bucket{_format_labels(self.labels, ("le", le))} {cumulative}'
+        yield f'{name}_sum{_format_labels(self.labels)} {_format_value(self.sum)}'
+        yield f'{name}_count{_format_labels(self.labels)} {self.count}'
+
+
+class Counter:
+    """单调递增计数器（只应在一个线程中递增）"""
+
+    def __init__(self, labels=None):
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name):
+        yield f'{name}{_format_labels(self.labels)} {_format_value(self.value)}'
+
+
+class _Callback:
+    """输出时调用函数读取的计数器或仪表值"""
+
+    def __init__(self, func, labels=None):
+        self.func = func
+        self.labels = labels or {}
+
+    def samples(self, name):
+        try:
+            value = self.func()
+        except Exception:
+            value = None
+        # 不可用的值（例如尚未启动的接收器）不输出样本
+        if value is not None:
+            yield f'{name}{_format_labels(self.labels)} {_format_value(value)}'
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标可以有多组标签，输出时按名称分组"""
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._families = {}         # 名称 -> (类型, 说明, [指标])
+        self._lock = threading.Lock()
+
+    def _register(self, name, kind, help_text, metric):
+        name = self.prefix + name
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, []))
+            if family[0] != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family[0]} 类型")
+            family[2].append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=STAGE_BUCKETS, labels=None):
+        """注册直方图（单位为秒）"""
+        return self._register(name, 'histogram', help_text, Histogram(buckets, labels))
+
+    def counter(self, name, help_text, labels=None):
+        """注册由调用方递增的计数器"""
+        return self._register(name, 'counter', help_text, Counter(labels))
+
+    def counter_func(self, name, help_text, func, labels=None):
+        """注册输出时读取的计数器（func返回累计值，返回None时不输出）"""
+        return self._register(name, 'counter', help_text, _Callback(func, labels))
+
+    def gauge_func(self, name, help_text, func, labels=None):
+        """注册输出时读取的仪表值"""
+        return self._register(name, 'gauge', help_text, _Callback(func, labels))
+
+    def render(self):
+        """Prometheus文本格式"""
+        with self._lock:
+            families = list(self._families.items())
+        lines = []
+        for name, (kind, help_text, metrics) in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for metric in metrics:
+                lines.extend(metric.samples(name))
+        return '\n'.join(lines) + '\n'
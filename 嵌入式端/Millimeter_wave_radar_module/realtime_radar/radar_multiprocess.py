@@ -0,0 +1,532 @@
+"""
+多进程实时雷达处理
+接收进程只负责UDP接收、帧序号跟踪和写入共享内存环形缓冲区；
+一个或多个DSP进程直接读取共享内存中的窗口视图执行信号处理和模型推理，结果通过队列返回主进程。
+主进程监控子进程：DSP进程崩溃后自动重启，期间接收进程继续写入，接收数据流不会中断
+"""
+
+import asyncio
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+
+import numpy as np
+
+from frame_sequence import FrameSequencer
+from radar_receiver import RadarUdpReceiver
+from radar_recording import default_frame_size
+from shared_frame_ring import SharedFrameRing
+
+RING_MARGIN_SECONDS = 10        # 环形缓冲区在处理窗口之外额外保存的时长（DSP处理延迟的余量）
+SUPERVISE_INTERVAL = 0.5        # 子进程检查间隔（秒）
+RESTART_DELAY = 1.0             # 子进程退出后至少等待多久再重启（秒），避免反复崩溃时空转
+STATUS_INTERVAL = 5             # 状态报告间隔（秒）
+
+# 传递给DSP进程的处理参数（realtime_radar_processing中的模块级配置）
+PIPELINE_PARAMS = (
+    'DECOMPOSE_SIGNAL', 'DECOMP_TYPE', 'CWT_SCALES', 'CWT_WAVELET',
+    'EEMD_NOISE_WIDTH', 'EEMD_ENSEMBLE_SIZE', 'EEMD_MAX_IMF',
+    'ENABLE_PRESENCE_DETECTION', 'PRESENCE_HISTORY_LENGTH', 'PRESENCE_COUNT_THRESHOLD',
+    'MAX_TARGETS', 'NUM_RX', 'RX_POSITIONS', 'PHASE_FILTER',
+)
+
+
+def receiver_process(ring_name, port, server_ip):
+    """
+    接收进程入口：UDP接收 -> 帧序号跟踪 -> 写入共享内存环形缓冲区
+
+    只依赖numpy和接收相关模块，不加载FastAPI和TensorFlow
+
+    参数:
+        ring_name: 共享内存名称
+        port: 本地UDP监听端口
+        server_ip: 雷达设备IP（停止时发送关闭传输命令）
+    """
+    # Ctrl+C由主进程统一处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    ring = SharedFrameRing.attach(ring_name)
+    ring.writer_started()
+    arrival = [0]
+
+    def output(frame_number, samples, filled):
+        ring.append(samples, frame_number, filled, arrival[0])
+
+    sequencer = FrameSequencer(output, on_resync=ring.new_segment)
+
+    def handle_frame(payload, addr, arrival_ns):
+        arrival[0] = arrival_ns
+        sequencer.push(int.from_bytes(payload[2:6], 'little'),
+                       np.frombuffer(payload, dtype='<f2', offset=6), arrival_ns / 1e9)
+        ring.update_counters(sequencer.received, sequencer.lost, sequencer.resyncs)
+
+    receiver = RadarUdpReceiver(port, handle_frame)
+    sock = receiver.open()
+
+    def wait_for_stop():
+        while not ring.stop_requested:
+            time.sleep(SUPERVISE_INTERVAL)
+        receiver.stop()
+
+    async def serve():
+        # 在接收器的事件循环中定期检查乱序超时，数据流中断时缓存的帧不会一直滞留
+        poller = asyncio.ensure_future(poll_sequencer())
+        try:
+            await receiver.serve()
+        finally:
+            poller.cancel()
+
+    async def poll_sequencer():
+        while True:
+            await asyncio.sleep(sequencer.reorder_timeout)
+            sequencer.poll(time.time())
+            ring.update_counters(sequencer.received, sequencer.lost, sequencer.resyncs)
+
+    threading.Thread(target=wait_for_stop, daemon=True).start()
+    try:
+        asyncio.run(serve())
+    finally:
+        try:
+            sock.sendto('{"radar_transmission":"disable"}'.encode(), (server_ip, port))
+        except OSError as e:
+            print(f"发送停止命令失败: {e}")
+        receiver.close()
+        ring.close()
+
+
+def dsp_worker_process(ring_name, worker_index, num_workers, config, result_queue):
+    """
+    DSP进程入口：按步长从共享内存读取窗口视图并执行处理流水线
+
+    多个DSP进程轮流处理步骤（第k步由k % num_workers号进程处理），
+    每个进程有独立的流水线和模型，因此存在检测的历史只包含该进程处理过的步骤。
+    处理落后超过一轮时跳到该进程最新的步骤
+
+    参数:
+        ring_name: 共享内存名称
+        worker_index: 进程序号
+        num_workers: DSP进程总数
+        config: 处理参数字典（见SplitRadarProcessor.pipeline_config）
+        result_queue: 结果队列
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # 处理相关的重量级依赖只在DSP进程中导入
+    import realtime_radar_processing as rrp
+    for key, value in config['params'].items():
+        setattr(rrp, key, value)
+
+    cwt_model = eemd_model = None
+    enable_model_inference = False
+    if config['load_models']:
+        cwt_model, eemd_model, enable_model_inference = rrp.load_vital_models(
+            rrp.DECOMP_TYPE, config['cwt_model_path'], config['eemd_model_path'])
+    pipeline = rrp.create_pipeline(cwt_model, eemd_model, verbose=False)
+    pipeline.enable_model_inference = enable_model_inference
+
+    ring = SharedFrameRing.attach(ring_name)
+    window = config['window_size']
+    step = config['step_size']
+    frame_rate = config['frame_rate']
+    stride = step * num_workers
+    segment = None
+    next_end = None
+    prev_end = None         # 本进程在当前数据段中上一步的窗口结束序号
+    steps = skipped = overwritten = 0
+    frames = filled = arrival_ns = None
+
+    try:
+        while not ring.stop_requested:
+            write_seq = ring.write_seq
+            if ring.segment_start != segment:
+                # 新的连续数据段（启动、帧号跳变或接收进程重启），重新对齐步骤
+                segment = ring.segment_start
+                next_end = segment + window + worker_index * step
+                prev_end = None
+
+            if write_seq < next_end:
+                # 按帧率估计下一步就绪的时间，期间不占用CPU
+                time.sleep(min(SUPERVISE_INTERVAL, max(0.005, (next_end - write_seq) / frame_rate)))
+                continue
+
+            behind = (write_seq - next_end) // stride
+            if behind > 0:
+                next_end += behind * stride
+                skipped += behind
+            end_seq = next_end
+            next_end += stride
+
+            frames, filled, arrival_ns = ring.window(end_seq, window)
+            window_loss = float(filled.mean())
+            data_time = int(arrival_ns[-1]) / 1e9
+            # 新增帧数按实际的窗口移动计算（跳过积压窗口时大于stride），数据段的第一步整个窗口都是新帧，
+            # 流水线的相位滤波器据此衔接上一步的状态或重新冷启动
+            new_frame_count = None if prev_end is None else end_seq - prev_end
+            prev_end = end_seq
+            result = pipeline.process(frames, new_frame_count, window_loss)
+
+            # 处理期间窗口被写端覆盖（处理严重落后）时丢弃结果
+            if not ring.is_valid(end_seq, window):
+                overwritten += 1
+                continue
+
+            steps += 1
+            result_queue.put({
+                'worker': worker_index,
+                'end_seq': end_seq,
+                'heart_rate': result['heart_rate'],
+                'respiration_rate': result['respiration_rate'],
+                'target_bin': result['target_bin'],
+                'target_distance': result['target_distance'],
+                'target_angle': result['target_angle'],
+                'targets': result['targets'],
+                'presence_detected': result['presence_detected'],
+                'presence_stable': result['presence_stable'],
+                'window_loss': result['window_loss'],
+                'window_valid': result['window_valid'],
+                'processing_time': result['processing_time'],
+                'data_time': data_time,
+                'result_time': time.time(),
+                'steps': steps,
+                'skipped': skipped,
+                'overwritten': overwritten,
+            })
+    finally:
+        # 共享内存上的视图释放后才能关闭
+        frames = filled = arrival_ns = None
+        ring.close()
+
+
+class SplitRadarProcessor:
+    """多进程实时雷达处理器（主进程：创建共享内存、启动并监控子进程、汇总结果和提供API）"""
+
+    def __init__(self, server_ip='192.168.10.184', server_port=57345, dsp_workers=1,
+                 load_models=True, cwt_model_path=None, eemd_model_path=None,
+                 api_enabled=True, api_port=8000, ring_margin_seconds=RING_MARGIN_SECONDS):
+        """
+        初始化多进程处理器
+
+        参数:
+            server_ip: 雷达设备的IP地址
+            server_port: 雷达设备的端口号（同时是本地UDP监听端口）
+            dsp_workers: DSP进程数量
+            load_models: 是否在DSP进程中加载预训练模型
+            cwt_model_path: CWT模型路径
+            eemd_model_path: EEMD模型路径
+            api_enabled: 是否启用FastAPI接口
+            api_port: FastAPI服务器端口
+            ring_margin_seconds: 环形缓冲区在处理窗口之外额外保存的时长
+        """
+        # 在主进程中读取处理配置；接收进程不导入该模块
+        import realtime_radar_processing as rrp
+        self.rrp = rrp
+
+        self.server_ip = server_ip
+        self.server_port = server_port
+        self.dsp_workers = dsp_workers
+        self.load_models = load_models
+        self.cwt_model_path = cwt_model_path
+        self.eemd_model_path = eemd_model_path
+        self.api_enabled = api_enabled
+        self.api_port = api_port
+        self.ring_capacity = rrp.WINDOW_SIZE + int(ring_margin_seconds * rrp.FRAME_RATE)
+
+        # 使用spawn启动子进程，避免fork继承主进程中的线程和TensorFlow状态
+        self.ctx = mp.get_context('spawn')
+        self.result_queue = self.ctx.Queue()
+        self.ring = None
+        self.receiver = None
+        self.workers = [None] * dsp_workers
+        self.receiver_restarts = 0
+        self.worker_restarts = [0] * dsp_workers
+        self._last_start = {}
+        self.running = False
+        self.start_time = time.time()
+
+        # 结果
+        self.latest = None              # 最新的处理结果（按窗口结束序号）
+        self.results_received = 0
+        self.worker_stats = {}          # DSP进程序号 -> 最近一次上报的步骤统计
+
+        self.app = None
+        if api_enabled:
+            self._init_api()
+
+    def pipeline_config(self):
+        """传递给DSP进程的处理参数"""
+        return {
+            'params': {name: getattr(self.rrp, name) for name in PIPELINE_PARAMS},
+            'window_size': self.rrp.WINDOW_SIZE,
+            'step_size': self.rrp.STEP_SIZE,
+            'frame_rate': self.rrp.FRAME_RATE,
+            'load_models': self.load_models,
+            'cwt_model_path': self.cwt_model_path,
+            'eemd_model_path': self.eemd_model_path,
+        }
+
+    def _start_receiver(self):
+        self.receiver = self.ctx.Process(
+            target=receiver_process, name='radar-receiver', daemon=True,
+            args=(self.ring.name, self.server_port, self.server_ip))
+        self.receiver.start()
+        self._last_start['receiver'] = time.time()
+
+    def _start_worker(self, index):
+        worker = self.ctx.Process(
+            target=dsp_worker_process, name=f'radar-dsp-{index}', daemon=True,
+            args=(self.ring.name, index, self.dsp_workers, self.pipeline_config(),
+                  self.result_queue))
+        worker.start()
+        self.workers[index] = worker
+        self._last_start[index] = time.time()
+
+    def _supervise(self):
+        """检查子进程，退出的进程在延迟后重启"""
+        now = time.time()
+        if not self.receiver.is_alive() and now - self._last_start['receiver'] >= RESTART_DELAY:
+            print(f"接收进程已退出 (退出码 {self.receiver.exitcode})，正在重启")
+            self.receiver_restarts += 1
+            self._start_receiver()
+
+        for index, worker in enumerate(self.workers):
+            if not worker.is_alive() and now - self._last_start[index] >= RESTART_DELAY:
+                # 接收进程不受影响，重启后的DSP进程从最新的窗口继续处理
+                print(f"DSP进程 {index} 已退出 (退出码 {worker.exitcode})，正在重启")
+                self.worker_restarts[index] += 1
+                self._start_worker(index)
+
+    def _collect_results(self):
+        """结果汇总线程：保留窗口结束序号最新的结果"""
+        while self.running:
+            try:
+                result = self.result_queue.get(timeout=SUPERVISE_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            self.results_received += 1
+            self.worker_stats[result['worker']] = {
+                'steps': result['steps'],
+                'skipped': result['skipped'],
+                'overwritten': result['overwritten'],
+                'last_processing_ms': result['processing_time'] * 1000,
+            }
+            if self.latest is None or result['end_seq'] >= self.latest['end_seq']:
+                self.latest = result
+
+    def _init_api(self):
+        """初始化FastAPI应用"""
+        from fastapi import FastAPI
+        from fastapi.middleware.cors import CORSMiddleware
+
+        self.app = FastAPI(title="雷达心率监测API",
+                           description="多进程实时雷达心率监测数据的API接口",
+                           version="1.0.0")
+        self.app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+        @self.app.get("/")
+        async def root():
+            return {"message": "雷达心率监测API服务正在运行"}
+
+        @self.app.get("/heartrate")
+        async def get_heart_rate():
+            """获取最新的心率值"""
+            result = self.latest
+            heart_rate = result['heart_rate'] if result else None
+            return {"heart_rate": float(heart_rate) if heart_rate is not None else None,
+                    "timestamp": time.time(),
+                    **self.result_age(),
+                    "status": "ok" if heart_rate is not None else "no_data"}
+
+        @self.app.get("/target")
+        async def get_target_data():
+            """同时获取目标距离、方位角、心率和呼吸频率数据（targets为各目标的结果）"""
+            result = self.latest
+            if result is None:
+                return {"heart_rate": None, "respiration_rate": None, "target_distance": None,
+                        "target_bin": None, "target_angle": None, "targets": [],
+                        "timestamp": time.time(), "status": "no_data"}
+            heart_rate = result['heart_rate']
+            respiration_rate = result['respiration_rate']
+            return {"heart_rate": float(heart_rate) if heart_rate is not None else None,
+                    "respiration_rate": float(respiration_rate) if respiration_rate is not None else None,
+                    "target_distance": float(result['target_distance']),
+                    "target_bin": int(result['target_bin']),
+                    "target_angle": result['target_angle'],
+                    "targets": result['targets'],
+                    "window_valid": bool(result['window_valid']),
+                    "timestamp": time.time(),
+                    **self.result_age(),
+                    "status": "ok"}
+
+        @self.app.get("/status")
+        async def get_status():
+            """获取系统状态信息"""
+            return self.get_status()
+
+    def result_age(self):
+        """最新结果的产生时间和所用数据距今的时长（秒）"""
+        result = self.latest
+        now = time.time()
+        return {
+            'result_age': now - result['result_time'] if result else None,
+            'data_age': now - result['data_time'] if result else None,
+        }
+
+    def get_status(self):
+        """系统状态（环形缓冲区、子进程和结果统计）"""
+        return {
+            "running": self.running,
+            "uptime": time.time() - self.start_time,
+            "ring": self.ring.stats() if self.ring else None,
+            "receiver_alive": bool(self.receiver and self.receiver.is_alive()),
+            "receiver_restarts": self.receiver_restarts,
+            "dsp_workers": [{
+                "index": index,
+                "alive": bool(worker and worker.is_alive()),
+                "restarts": self.worker_restarts[index],
+                **self.worker_stats.get(index, {}),
+            } for index, worker in enumerate(self.workers)],
+            "results": self.results_received,
+            "timestamp": time.time(),
+        }
+
+    def _run_api_server(self):
+        """在单独的线程中运行FastAPI服务器"""
+        import uvicorn
+        try:
+            uvicorn.run(self.app, host="0.0.0.0", port=self.api_port, log_level="info")
+        except Exception as e:
+            print(f"API服务器启动失败: {e}")
+
+    def _report_status(self):
+        """打印状态摘要"""
+        ring = self.ring.stats()
+        print("\n--- 状态报告 ---")
+        print(f"运行: {time.time() - self.start_time:.1f}秒 | 已写入: {ring['write_seq']}帧 | "
+              f"接收: {ring['received']} | 丢帧: {ring['lost']} | 重新同步: {ring['resyncs']}")
+        print(f"重启: 接收进程 {self.receiver_restarts}次 | DSP进程 {sum(self.worker_restarts)}次 | "
+              f"结果: {self.results_received}")
+        if self.latest is not None and self.latest['heart_rate'] is not None:
+            print(f"心率: {self.latest['heart_rate']:.1f} BPM | 目标距离 {self.latest['target_distance']:.2f}米")
+        print("----------------")
+
+    def start(self):
+        """启动子进程并在主线程中监控（阻塞直到stop()或Ctrl+C）"""
+        self.running = True
+        self.start_time = time.time()
+        # 多接收天线时每行保存各天线交错的采样点
+        frame_size = default_frame_size(dict(self.rrp.radar_params, rx_antennas=self.rrp.NUM_RX))
+        self.ring = SharedFrameRing.create(self.ring_capacity, frame_size)
+
+        self._start_receiver()
+        for index in range(self.dsp_workers):
+            self._start_worker(index)
+        threading.Thread(target=self._collect_results, daemon=True).start()
+        if self.api_enabled and self.app:
+            threading.Thread(target=self._run_api_server, daemon=True).start()
+            print(f"API服务已启动在 http://0.0.0.0:{self.api_port}")
+
+        print("================================================================================")
+        print("多进程实时雷达数据处理器启动")
+        print("================================================================================")
+        print(f"雷达连接: {self.server_ip}:{self.server_port} | DSP进程: {self.dsp_workers} | "
+              f"共享环形缓冲区: {self.ring_capacity}帧 ({self.ring.name})")
+
+        last_report = time.time()
+        try:
+            while self.running:
+                time.sleep(SUPERVISE_INTERVAL)
+                self._supervise()
+                if time.time() - last_report >= STATUS_INTERVAL:
+                    last_report = time.time()
+                    self._report_status()
+        except KeyboardInterrupt:
+            print("用户中断，正在关闭...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """停止所有子进程并删除共享内存"""
+        if self.ring is None:
+            return
+        self.running = False
+        self.ring.request_stop()
+        for process in [self.receiver] + self.workers:
+            if process is None:
+                continue
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.ring.close()
+        self.ring = None
+        print("多进程实时雷达数据处理器已停止")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='多进程实时雷达数据处理')
+    parser.add_argument('--ip', type=str, default='192.168.10.169', help='雷达设备IP地址')
+    parser.add_argument('--port', type=int, default=57345, help='雷达设备端口号')
+    parser.add_argument('--dsp-workers', type=int, default=1, help='DSP进程数量')
+    parser.add_argument('--ring-margin', type=float, default=RING_MARGIN_SECONDS,
+                        help=f'共享环形缓冲区在处理窗口之外额外保存的秒数，默认：{RING_MARGIN_SECONDS}')
+    parser.add_argument('--decomp-type', type=str, choices=['cwt', 'eemd'], default=None, help='信号分解类型')
+    parser.add_argument('--no-presence', action='store_true', help='禁用存在检测功能')
+    parser.add_argument('--max-targets', type=int, default=None,
+                        help='每个窗口最多处理的目标数（大于1时启用CFAR多目标检测）')
+    parser.add_argument('--rx-antennas', type=int, default=None,
+                        help='接收天线数（大于1时帧数据为各天线交错的采样点，估计方位角）')
+    parser.add_argument('--rx-positions', type=str, default=None,
+                        help='各接收天线的水平位置（波长，逗号分隔），默认使用BGT60TR13C的布局')
+    parser.add_argument('--no-phase-filter', action='store_true',
+                        help='信号分解使用原始相位而不是心跳频带滤波后的相位（模型用原始相位训练时使用）')
+    parser.add_argument('--no-model', action='store_true', help='禁用模型推理')
+    parser.add_argument('--cwt-model', type=str, default=None, help='CWT模型路径')
+    parser.add_argument('--eemd-model', type=str, default=None, help='EEMD模型路径')
+    parser.add_argument('--no-api', action='store_true', help='禁用FastAPI接口')
+    parser.add_argument('--api-port', type=int, default=8000, help='API服务器端口')
+    args = parser.parse_args()
+
+    processor = SplitRadarProcessor(
+        server_ip=args.ip,
+        server_port=args.port,
+        dsp_workers=args.dsp_workers,
+        load_models=not args.no_model,
+        cwt_model_path=args.cwt_model,
+        eemd_model_path=args.eemd_model,
+        api_enabled=not args.no_api,
+        api_port=args.api_port,
+        ring_margin_seconds=args.ring_margin
+    )
+    # 处理参数在创建DSP进程时从realtime_radar_processing读取
+    if args.decomp_type:
+        processor.rrp.DECOMP_TYPE = args.decomp_type
+    if args.no_presence:
+        processor.rrp.ENABLE_PRESENCE_DETECTION = False
+    if args.no_phase_filter:
+        processor.rrp.PHASE_FILTER = False
+    if args.max_targets:
+        processor.rrp.MAX_TARGETS = max(1, args.max_targets)
+    if args.rx_antennas or args.rx_positions:
+        from radar_settings import default_rx_positions, parse_rx_positions
+        num_rx = max(1, args.rx_antennas or processor.rrp.NUM_RX)
+        try:
+            rx_positions = parse_rx_positions(args.rx_positions) if args.rx_positions else default_rx_positions(num_rx)
+        except ValueError as e:
+            parser.error(str(e))
+        if len(rx_positions) != num_rx:
+            parser.error(f"--rx-positions 的位置数 {len(rx_positions)} 与接收天线数 {num_rx} 不一致")
+        processor.rrp.NUM_RX = num_rx
+        processor.rrp.RX_POSITIONS = rx_positions
+    processor.start()
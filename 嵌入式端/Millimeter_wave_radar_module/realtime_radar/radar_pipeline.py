@@ -0,0 +1,533 @@
+"""
+雷达信号处理流水线
+将一个处理窗口的雷达帧依次经过 距离FFT -> MTI滤波 -> 相位提取 -> 相位调理 -> 存在检测 -> 呼吸估计 -> 信号分解 -> 模型推理，
+每个雷达（传感器）持有一个独立的流水线实例，保存自己的存在检测、目标跟踪、相位滤波器和热力图状态。
+多目标模式下每个窗口检测多个目标，所有目标的相位一次提取，信号分解和模型推理按批处理。
+多接收天线时在距离-角度图上检测目标（同一距离、不同方向的人也能分开），并按目标方向相干合并各天线后提取相位。
+各阶段的窗函数、距离bin范围、导向矢量、CWT滤波器组和工作数组来自DSP计划（dsp_plan.DspPlan），
+窗口形状或雷达配置变化时重新生成。
+相位调理（phase_conditioning）在步骤之间保存带通滤波器状态，每步只滤波新增的帧，心跳频带相位作为信号分解的输入
+"""
+
+import os
+import time
+import numpy as np
+
+from radar_func import (range_fft, mti_filter, extract_phase, detect_targets,
+                        deinterleave_rx, range_angle_map, detect_range_angle_targets,
+                        beamform_signals, estimate_respiration_rate)
+from dsp_plan import DspPlan, ANGLE_GRID
+from signal_decomposition import apply_eemd
+from presence_detection import RadarPresenceDetector
+from target_tracking import TargetTracker
+from phase_conditioning import PhaseConditioner
+
+# 导入TensorFlow/Keras模型处理
+try:
+    from tensorflow import keras
+except ImportError:
+    keras = None
+
+MAX_WINDOW_LOSS = 0.1           # 窗口内补齐帧占比超过该值时窗口无效，不输出心率
+
+# 处理阶段（result['stage_times']的键）
+STAGES = ('fft', 'mti', 'phase', 'conditioning', 'presence', 'respiration', 'decomposition', 'model')
+
+# 默认模型路径
+DEFAULT_CWT_MODEL_PATH = os.path.join('trained_models', 'DeepStateSpace_CWT_best.keras')
+DEFAULT_EEMD_MODEL_PATH = os.path.join('trained_models', 'DeepStateSpace_EEMD_best.keras')
+
+
+def load_models(decomp_type, cwt_model_path=None, eemd_model_path=None):
+    """
+    加载当前分解方法对应的预训练模型
+
+    参数:
+        decomp_type: 信号分解类型 "cwt" 或 "eemd"
+        cwt_model_path: CWT模型路径，None使用默认路径
+        eemd_model_path: EEMD模型路径，None使用默认路径
+
+    返回:
+        (cwt_model, eemd_model, enabled): 加载的模型（未加载为None）和是否可以进行模型推理
+    """
+    cwt_model = None
+    eemd_model = None
+
+    if keras is None:
+        print("警告：TensorFlow/Keras未导入，无法加载模型")
+        return None, None, False
+
+    # 模型中的自定义层需要先导入radar_dl_models
+    try:
+        import radar_dl_models  # noqa: F401
+    except ImportError:
+        print("警告：无法导入radar_dl_models模块，这可能导致模型加载或推理错误")
+
+    try:
+        if cwt_model_path is None:
+            cwt_model_path = DEFAULT_CWT_MODEL_PATH
+        if eemd_model_path is None:
+            eemd_model_path = DEFAULT_EEMD_MODEL_PATH
+
+        # 根据当前分解方法加载对应模型
+        if decomp_type == "cwt":
+            if os.path.exists(cwt_model_path):
+                print(f"加载CWT模型: {cwt_model_path}")
+                cwt_model = keras.models.load_model(cwt_model_path)
+                print(f"CWT模型加载成功: {cwt_model.name}")
+            else:
+                print(f"警告: CWT模型文件不存在 - {cwt_model_path}")
+        elif decomp_type == "eemd":
+            if os.path.exists(eemd_model_path):
+                print(f"加载EEMD模型: {eemd_model_path}")
+                eemd_model = keras.models.load_model(eemd_model_path)
+                print(f"EEMD模型加载成功: {eemd_model.name}")
+            else:
+                print(f"警告: EEMD模型文件不存在 - {eemd_model_path}")
+    except Exception as e:
+        print(f"加载模型时出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return None, None, False
+
+    return cwt_model, eemd_model, True
+
+
+def prepare_model_input(data, data_type, verbose=False):
+    """
+    准备模型输入数据
+
+    参数:
+        data: 输入数据 (CWT系数或EEMD IMFs)
+        data_type: 数据类型 'cwt' 或 'eemd'
+        verbose: 是否打印输入形状
+
+    返回:
+        适合模型输入的numpy数组
+    """
+    if data_type == "cwt":
+        # CWT系数通常形状为 (scales, signal_length) 即 (64, 300)
+        # 模型期望的输入形状为 (batch_size, signal_length, scales) 即 (None, 300, 64)
+        # 需要转置并添加batch维度
+        model_input = np.transpose(data)  # 转置后变为(300, 64)
+        model_input = np.expand_dims(model_input, axis=0)  # 添加batch维度，变为(1, 300, 64)
+        if verbose:
+            print(f"准备CWT模型输入: 形状={model_input.shape}")
+        return model_input
+
+    elif data_type == "eemd":
+        # EEMD IMFs通常形状为 (n_imfs, signal_length)
+        # 假设模型期望的输入形状为 (batch_size, signal_length, n_imfs)
+        model_input = np.transpose(data)  # 转置后变为(signal_length, n_imfs)
+        model_input = np.expand_dims(model_input, axis=0)  # 添加batch维度
+        if verbose:
+            print(f"准备EEMD模型输入: 形状={model_input.shape}")
+        return model_input
+
+    else:
+        raise ValueError(f"不支持的数据类型: {data_type}")
+
+
+class RadarPipeline:
+    """单个雷达的信号处理流水线"""
+
+    def __init__(self, frame_rate, range_resolution, wavelength, window_type='hann',
+                 decompose=True, decomp_type='cwt', cwt_scales=None, cwt_wavelet='morl',
+                 eemd_noise_width=0.05, eemd_ensemble_size=50, eemd_max_imf=5,
+                 presence_detection=True, presence_history=5, presence_threshold=2,
+                 cwt_model=None, eemd_model=None, heatmap=None, max_window_loss=MAX_WINDOW_LOSS,
+                 respiration=True, max_targets=1, num_rx=1, rx_positions=None, angle_grid=ANGLE_GRID,
+                 plan=None, phase_filter=True, verbose=True):
+        """
+        初始化处理流水线
+
+        参数:
+            frame_rate: 雷达帧率 (Hz)
+            range_resolution: 距离分辨率 (米/bin)
+            wavelength: 雷达波长 (米)
+            window_type: 距离FFT窗函数类型
+            decompose: 是否进行信号分解
+            decomp_type: 信号分解类型 "cwt" 或 "eemd"
+            cwt_scales: CWT尺度参数，None使用1-64
+            cwt_wavelet: CWT小波类型
+            eemd_noise_width: EEMD噪声幅度
+            eemd_ensemble_size: EEMD集合大小
+            eemd_max_imf: EEMD最大IMF数量
+            presence_detection: 是否启用存在检测
+            presence_history: 存在检测历史长度
+            presence_threshold: 存在检测计数阈值
+            cwt_model: CWT心率模型（可在多个流水线间共享）
+            eemd_model: EEMD心率模型（可在多个流水线间共享）
+            heatmap: 可选的RangeProfileRing，新增帧的距离剖面会写入其中
+            max_window_loss: 窗口内补齐帧的最大占比，超过时跳过信号分解和心率计算
+            respiration: 是否从同一相位窗口估计呼吸频率
+            max_targets: 每个窗口最多处理的目标数，1表示只处理功率最强的目标（单目标模式）
+            num_rx: 接收天线数，大于1时帧数据为各天线交错存放的采样点
+            rx_positions: 各接收天线的水平位置（单位：波长），None使用默认布局（radar_settings.default_rx_positions）
+            angle_grid: 距离-角度图的方位角网格（度）
+            plan: 预先生成的DspPlan（例如由get_radar_params()生成），None表示按第一个窗口的形状生成；
+                  窗口形状与计划不一致时按上面的参数重新生成
+            phase_filter: 是否用心跳频带滤波后的相位作为信号分解的输入（False时使用原始相位，
+                          例如模型是用原始相位训练的）；呼吸和心跳频带相位总是输出到结果中
+            verbose: 是否打印每一步的处理信息
+        """
+        self.frame_rate = frame_rate
+        self.range_resolution = range_resolution
+        self.wavelength = wavelength
+        self.window_type = window_type
+
+        # 信号分解参数
+        self.decompose = decompose
+        self.decomp_type = decomp_type
+        self.cwt_scales = cwt_scales if cwt_scales is not None else np.arange(1, 65)
+        self.cwt_wavelet = cwt_wavelet
+        self.eemd_noise_width = eemd_noise_width
+        self.eemd_ensemble_size = eemd_ensemble_size
+        self.eemd_max_imf = eemd_max_imf
+
+        # 存在检测
+        self.presence_detection = presence_detection
+        self.presence_detector = RadarPresenceDetector(
+            history_length=presence_history,
+            count_threshold=presence_threshold
+        )
+
+        # 模型
+        self.cwt_model = cwt_model
+        self.eemd_model = eemd_model
+        self.enable_model_inference = True
+
+        self.heatmap = heatmap
+        self.max_window_loss = max_window_loss
+        self.respiration = respiration
+        self.max_targets = max_targets
+        self.target_tracker = TargetTracker()
+
+        # 多接收天线
+        self.num_rx = num_rx
+        self.rx_positions = rx_positions
+        self.angle_grid = angle_grid
+
+        self.plan = plan
+        self.phase_filter = phase_filter
+        self.phase_conditioner = PhaseConditioner()
+        self.verbose = verbose
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def configure(self, params):
+        """
+        按新的雷达参数更新流水线（例如回放用不同配置录制的文件），DSP计划在下一个窗口重新生成
+
+        参数:
+            params: 雷达参数字典（get_radar_params()的格式）
+        """
+        self.frame_rate = params.get('frame_rate', self.frame_rate)
+        self.range_resolution = params.get('range_resolution', self.range_resolution)
+        self.wavelength = params.get('wavelength', self.wavelength)
+        self.num_rx = params.get('rx_antennas', self.num_rx)
+        self.rx_positions = params.get('rx_positions')
+        self.plan = None
+        self.target_tracker.reset()
+        self.phase_conditioner.reset()
+
+    def _plan_for(self, num_frames, frame_size):
+        """当前窗口使用的DSP计划（窗口形状与计划不一致时重新生成）"""
+        if self.plan is None or not self.plan.matches(num_frames, frame_size):
+            if frame_size % self.num_rx:
+                raise ValueError(f"帧长度 {frame_size} 不是接收天线数 {self.num_rx} 的整数倍")
+            self.plan = DspPlan(
+                num_samples=frame_size // self.num_rx, num_frames=num_frames, frame_rate=self.frame_rate,
+                range_resolution=self.range_resolution, wavelength=self.wavelength, num_rx=self.num_rx,
+                rx_positions=self.rx_positions, window_type=self.window_type, cwt_scales=self.cwt_scales,
+                cwt_wavelet=self.cwt_wavelet, max_targets=self.max_targets, angle_grid=self.angle_grid)
+            self.phase_conditioner.reset()
+            self._log(f">> 生成DSP计划: {self.plan.describe()}")
+        return self.plan
+
+    def process(self, frames, new_frame_count=None, window_loss=0.0, fidelity=1.0):
+        """
+        处理一个窗口的雷达帧
+
+        参数:
+            frames: 形状为(frames, samples)的实数雷达数据（多接收天线时每帧为各天线交错存放的采样点）
+            new_frame_count: 自上次处理以来新增的帧数（用于更新热力图和相位滤波器），None表示整个窗口都是新帧
+            window_loss: 窗口内因丢帧而插值补齐的帧所占比例
+            fidelity: 信号分解精度 (0-1]，小于1时减少EEMD集合次数（过载降级时使用；CWT使用计划中的滤波器组，不受影响）
+
+        返回:
+            结果字典，包含phase_values、target_bin、target_distance、presence_detected、
+            presence_stable、window_loss、window_valid、fidelity、cwt_results、eemd_results、
+            model_prediction、heart_rate、respiration_rate、respiration_quality、processing_time，
+            以及各阶段用时stage_times（秒）: fft、mti、phase、conditioning、presence、respiration、decomposition、model。
+            targets为各目标的 {id, bin, distance, angle, power, respiration_rate, respiration_quality, heart_rate}
+            列表（按功率从大到小，id跨步骤不变），target_phases为形状(目标数, 帧数)的相位，
+            breathing_phases和heart_phases为同样形状的呼吸和心跳频带相位（流式滤波，状态跨步骤保存）；
+            上面的单目标字段对应功率最强的目标。
+            多接收天线时还包含target_angle（度）、range_angle（形状(角度数, 距离bin数)的距离-角度功率图）
+            和angles（角度网格，度）；单天线时target_angle和各目标的angle为None
+        """
+        process_start_time = time.time()
+        stage_times = dict.fromkeys(STAGES, 0.0)
+        stage_start = time.perf_counter()
+        num_frames, samples_per_frame = frames.shape
+        plan = self._plan_for(num_frames, samples_per_frame)
+        self._log(f"步骤1: 数据整形 [{num_frames} 帧, {samples_per_frame} 样本/帧, {plan.num_rx} 天线]")
+
+        # 重塑数据格式为 [frames, antennas, 1, samples]（视图，不拷贝）
+        if plan.num_rx > 1:
+            radar_data_3d = deinterleave_rx(frames, plan.num_rx)
+        else:
+            radar_data_3d = frames[:, np.newaxis, np.newaxis, :]
+
+        # 步骤1: 距离FFT（加窗结果写入计划的复数工作数组后原地FFT）
+        self._log(">> 处理: FFT -> MTI滤波 -> 提取相位...")
+        range_profile = range_fft(radar_data_3d, window=plan.window, out=plan.range_cube)
+        stage_times['fft'] = time.perf_counter() - stage_start
+
+        # 将新增帧的距离剖面写入热力图缓冲区（复用本次FFT结果，不重复计算）
+        if new_frame_count is None:
+            new_frame_count = num_frames
+        new_frame_count = min(new_frame_count, num_frames)
+        if self.heatmap is not None:
+            if new_frame_count > 0:
+                self.heatmap.extend(range_profile[-new_frame_count:, 0, 0, :])
+
+        # 步骤2: MTI滤波
+        stage_start = time.perf_counter()
+        # 减去的窗口均值（静态杂波）交给相位调理作为相位参考点
+        mti_filtered, clutter = mti_filter(range_profile, out=range_profile, return_clutter=True)
+
+        # 步骤3: 提取2D数据 (只选择第一根天线和第一个chirp)
+        data_2d = mti_filtered[:, 0, 0, :]
+        stage_times['mti'] = time.perf_counter() - stage_start
+
+        # 步骤4: 提取相位和目标bin（多目标模式下检测多个目标，一次提取所有目标的相位）
+        stage_start = time.perf_counter()
+        target_angles = None
+        angle_indices = None
+        ra_power = None
+        if plan.num_rx > 1:
+            # 实数采样的距离谱共轭对称，只在正频率一半上计算距离-角度图
+            rx_data = mti_filtered[:, :, 0, :plan.angle_range_bins]
+            ra_power = range_angle_map(rx_data, plan.steering)
+            target_bins, angle_indices, target_powers = detect_range_angle_targets(
+                ra_power, plan.range_resolution, plan.angles, self.max_targets, bin_limits=plan.angle_bin_limits)
+            target_angles = plan.angles[angle_indices]
+            weights = plan.steering[angle_indices]
+            target_samples = beamform_signals(rx_data, target_bins, weights)
+            target_clutter = beamform_signals(clutter[:, :, 0, :plan.angle_range_bins], target_bins, weights)[:, 0]
+            target_phases = np.angle(target_samples)
+            phase_values, target_bin = target_phases[0], int(target_bins[0])
+        elif self.max_targets > 1:
+            target_bins, target_powers = detect_targets(data_2d, plan.range_resolution, self.max_targets,
+                                                        bin_limits=plan.bin_limits)
+            target_samples = np.ascontiguousarray(data_2d[:, target_bins].T)
+            target_clutter = clutter[0, 0, 0, target_bins]
+            target_phases = np.angle(target_samples)
+            phase_values, target_bin = target_phases[0], int(target_bins[0])
+        else:
+            phase_values, target_bin = extract_phase(data_2d, plan.range_resolution, plan.wavelength, False,
+                                                     bin_limits=plan.bin_limits)
+            target_bins = np.array([target_bin])
+            target_samples = data_2d[:, target_bins].T
+            target_clutter = clutter[0, 0, 0, target_bins]
+            target_powers = np.mean(np.abs(data_2d[:, target_bins])**2, axis=0)
+            target_phases = phase_values[np.newaxis, :]
+        stage_times['phase'] = time.perf_counter() - stage_start
+        target_distances = plan.bin_distances[target_bins]
+        target_ids = self.target_tracker.update(target_distances, target_angles)
+        angles_deg = ([None] * len(target_bins) if target_angles is None
+                      else [float(a) for a in np.rad2deg(target_angles)])
+        if len(target_bins) > 1:
+            self._log(f">> 检测到 {len(target_bins)} 个目标: " + ", ".join(
+                f"ID{i} {d:.2f}米" + (f" {a:+.0f}°" if a is not None else "")
+                for i, d, a in zip(target_ids, target_distances, angles_deg)))
+
+        # 步骤5: 相位调理（解缠绕、去趋势、呼吸和心跳频带带通滤波），每步都执行以保持滤波器状态连续
+        stage_start = time.perf_counter()
+        breathing_phases, heart_phases = self.phase_conditioner.update(
+            plan, target_ids, target_bins, target_samples, new_frame_count, angle_indices, target_clutter)
+        stage_times['conditioning'] = time.perf_counter() - stage_start
+
+        result = {
+            'phase_values': phase_values,
+            'target_bin': target_bin,
+            'target_distance': float(target_distances[0]),
+            'target_angle': angles_deg[0],
+            'presence_detected': True,
+            'presence_stable': True,
+            'window_loss': window_loss,
+            'window_valid': window_loss <= self.max_window_loss,
+            'fidelity': fidelity,
+            'cwt_results': None,
+            'eemd_results': None,
+            'model_prediction': None,
+            'heart_rate': None,
+            'respiration_rate': None,
+            'respiration_quality': None,
+            'targets': [{
+                'id': target_id,
+                'bin': int(b),
+                'distance': float(distance),
+                'angle': angle,
+                'power': float(power),
+                'respiration_rate': None,
+                'respiration_quality': None,
+                'heart_rate': None,
+            } for target_id, b, distance, angle, power in zip(target_ids, target_bins, target_distances, angles_deg,
+                                                                target_powers)],
+            'target_phases': target_phases,
+            'breathing_phases': breathing_phases,
+            'heart_phases': heart_phases,
+            'stage_times': stage_times,
+        }
+        if ra_power is not None:
+            result['range_angle'] = ra_power
+            result['angles'] = plan.angles_deg
+
+        # 步骤6: 执行存在检测
+        if self.presence_detection:
+            stage_start = time.perf_counter()
+            # 提取最新一帧的数据用于存在检测
+            latest_frame_data = data_2d[-1:, :]  # 取最后一帧
+            presence_detected, presence_stable = self.presence_detector.detect_presence(latest_frame_data)
+            result['presence_detected'] = presence_detected
+            result['presence_stable'] = presence_stable
+            stage_times['presence'] = time.perf_counter() - stage_start
+            self._log(f">> 存在检测: 原始={presence_detected}, 稳定={presence_stable}")
+
+        # 步骤7: 只有在检测到人存在且窗口丢帧不多时才执行呼吸估计、信号分解和心率计算
+        if not result['window_valid']:
+            self._log(f">> 窗口丢帧过多 ({window_loss*100:.1f}%)，跳过信号分解和心率计算")
+        elif not result['presence_stable']:
+            self._log(">> 未检测到人体存在，跳过信号分解和心率计算")
+        else:
+            # 呼吸估计使用原始相位窗口（频带能量占比需要频带外的能量）
+            if self.respiration:
+                self._estimate_respiration(target_phases, result)
+            if self.decompose:
+                self._log(f">> 检测到人体存在，执行信号分解: 类型={self.decomp_type}...")
+                decomp_input = heart_phases if self.phase_filter else target_phases
+                if self.decomp_type == "cwt":
+                    self._apply_cwt(decomp_input, result, plan)
+                elif self.decomp_type == "eemd":
+                    self._apply_eemd(decomp_input, result, fidelity)
+
+        result['processing_time'] = time.time() - process_start_time
+        return result
+
+    def _estimate_respiration(self, target_phases, result):
+        """从已提取的相位窗口估计各目标的呼吸频率（与心率共用同一次FFT/MTI/相位提取结果）"""
+        stage_start = time.perf_counter()
+        for target, phase in zip(result['targets'], target_phases):
+            target['respiration_rate'], target['respiration_quality'] = estimate_respiration_rate(
+                phase, self.frame_rate)
+        primary = result['targets'][0]
+        result['respiration_rate'] = primary['respiration_rate']
+        result['respiration_quality'] = primary['respiration_quality']
+        result['stage_times']['respiration'] = time.perf_counter() - stage_start
+        if primary['respiration_rate'] is not None:
+            self._log(f">> 呼吸频率: {primary['respiration_rate']:.1f} 次/分钟 "
+                      f"(频带能量占比 {primary['respiration_quality']:.2f})")
+        else:
+            self._log(f">> 未检测到可靠的呼吸信号 (频带能量占比 {primary['respiration_quality']:.2f})")
+
+    def _apply_cwt(self, target_phases, result, plan):
+        """对所有目标的相位一次应用CWT (连续小波变换) 并批量执行CWT模型推理"""
+        try:
+            cwt_start = time.time()
+            # 使用提取的相位信号进行CWT分析（计划中的滤波器组，结果与逐尺度卷积相同）
+            cwt_batch, cwt_freqs = plan.cwt_bank.transform(target_phases)
+            cwt_time = time.time() - cwt_start
+            result['stage_times']['decomposition'] = cwt_time
+            self._log(f">> CWT完成: 系数形状 {cwt_batch.shape}, 用时: {cwt_time*1000:.0f}ms")
+
+            # 存储最强目标的CWT结果（包含能量谱）
+            cwt_coeffs = cwt_batch[0]
+            result['cwt_results'] = {
+                'coeffs': cwt_coeffs,
+                'freqs': cwt_freqs,
+                'power': np.abs(cwt_coeffs)**2
+            }
+
+            # 如果启用了模型推理，使用CWT模型进行预测
+            if self.enable_model_inference and self.cwt_model is not None:
+                self._run_model(self.cwt_model, list(cwt_batch), "cwt", result)
+
+        except Exception as e:
+            print(f"CWT分析出错: {e}")
+            result['cwt_results'] = None
+
+    def _apply_eemd(self, target_phases, result, fidelity=1.0):
+        """对每个目标应用EEMD (集合经验模态分解) 并批量执行EEMD模型推理"""
+        try:
+            eemd_start = time.time()
+            # 使用提取的相位信号进行EEMD分析（降级时按精度减少集合次数）
+            # PyEMD不支持批量分解，逐个目标执行
+            imfs_list = [apply_eemd(
+                phase,
+                noise_width=self.eemd_noise_width,
+                ensemble_size=max(1, int(round(self.eemd_ensemble_size * fidelity))),
+                max_imf=self.eemd_max_imf
+            ) for phase in target_phases]
+            imfs = imfs_list[0]
+            eemd_time = time.time() - eemd_start
+            result['stage_times']['decomposition'] = eemd_time
+            self._log(f">> EEMD完成: IMF数量 {imfs.shape[0]}, 用时: {eemd_time*1000:.0f}ms")
+
+            # 存储最强目标的EEMD结果
+            result['eemd_results'] = {
+                'imfs': imfs
+            }
+
+            # 如果启用了模型推理，使用EEMD模型进行预测
+            if self.enable_model_inference and self.eemd_model is not None:
+                self._run_model(self.eemd_model, imfs_list, "eemd", result)
+
+        except Exception as e:
+            print(f"EEMD分析出错: {e}")
+            result['eemd_results'] = None
+
+    def _run_model(self, model, data_list, data_type, result):
+        """对所有目标批量执行模型推理并将心率写入结果（输入形状相同的目标合并为一次predict调用）"""
+        try:
+            # 准备模型输入数据，按输入形状分组（EEMD各目标的IMF数量可能不同）
+            model_inputs = [prepare_model_input(data, data_type, self.verbose) for data in data_list]
+            groups = {}
+            for index, model_input in enumerate(model_inputs):
+                groups.setdefault(model_input.shape, []).append(index)
+
+            # 执行模型推理
+            predict_start = time.time()
+            predictions = [None] * len(model_inputs)
+            for indices in groups.values():
+                batch = np.concatenate([model_inputs[i] for i in indices], axis=0)
+                batch_prediction = model.predict(batch, verbose=0)
+                for row, i in enumerate(indices):
+                    predictions[i] = batch_prediction[row:row + 1]
+            predict_time = time.time() - predict_start
+            result['stage_times']['model'] = predict_time
+            prediction = np.concatenate(predictions, axis=0)
+
+            # 提取心率预测值 (假设模型输出的第一个值是心率)
+            for target, target_prediction in zip(result['targets'], prediction):
+                # 简单假设：预测值直接是心率
+                target['heart_rate'] = float(target_prediction[0])
+            result['heart_rate'] = result['targets'][0]['heart_rate']
+
+            # 保存预测结果（每行对应一个目标）
+            result['model_prediction'] = {
+                'type': data_type,
+                'result': prediction,
+                'time': predict_time,
+                'heart_rate': result['heart_rate']
+            }
+
+            self._log(f">> 模型推理完成: 形状={prediction.shape}, 批次={len(groups)}, 用时={predict_time*1000:.0f}ms")
+            if result['heart_rate'] is not None:
+                self._log(f">> 预测心率: {result['heart_rate']:.1f} BPM")
+        except Exception as e:
+            print(f"模型推理错误: {e}")
@@ -0,0 +1,231 @@
+"""
+雷达UDP数据接收模块
+基于asyncio事件循环的非阻塞接收器：套接字可读时一次性读空内核队列中的所有数据报，
+读入预分配的缓冲区，并统计内核丢包数和接收循环延迟
+"""
+
+import asyncio
+import os
+import socket
+import time
+
+BUFFER_SIZE = 65539                 # 单个UDP包最大长度
+RCVBUF_SIZE = 4 * 1024 * 1024       # 请求的内核接收缓冲区大小 (4 MB)
+BATCH_SLOTS = 256                   # 每次唤醒最多读取的数据报数量（预分配缓冲区个数）
+LOOP_LAG_INTERVAL = 0.5             # 事件循环延迟探测间隔（秒），同时决定空闲时的唤醒频率
+
+
+def read_kernel_drops(sock):
+    """
+    从/proc/net/udp读取指定套接字的内核丢包计数（仅Linux）
+
+    参数:
+        sock: 已绑定的UDP套接字
+
+    返回:
+        丢包数，无法读取时返回None
+    """
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+    except (OSError, ValueError):
+        return None
+
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path, 'r') as f:
+                next(f)  # 跳过表头
+                for line in f:
+                    fields = line.split()
+                    # 第10列为inode，最后一列为drops
+                    if len(fields) >= 13 and fields[9] == inode:
+                        return int(fields[-1])
+        except OSError:
+            continue
+    return None
+
+
+class ReceiverStats:
+    """接收器统计数据"""
+
+    def __init__(self):
+        self.datagrams = 0          # 接收的数据报总数
+        self.bytes = 0              # 接收的字节总数
+        self.wakeups = 0            # 套接字可读唤醒次数
+        self.max_batch = 0          # 单次唤醒读取的最大数据报数
+        self.truncated = 0          # 超过缓冲区长度被截断的数据报数
+        self.handler_errors = 0     # 帧处理回调出错次数
+        self.last_batch_ms = 0.0    # 最近一次读空队列并分发所用时间
+        self.max_batch_ms = 0.0     # 单次读空队列并分发的最大用时
+        self.total_batch_ms = 0.0   # 累计读空队列并分发用时
+        self.loop_lag_ms = 0.0      # 最近一次事件循环调度延迟
+        self.max_loop_lag_ms = 0.0  # 最大事件循环调度延迟
+
+    def as_dict(self):
+        """转换为字典（用于API输出）"""
+        return {
+            'datagrams': self.datagrams,
+            'bytes': self.bytes,
+            'wakeups': self.wakeups,
+            'avg_batch': self.datagrams / self.wakeups if self.wakeups else 0.0,
+            'max_batch': self.max_batch,
+            'truncated': self.truncated,
+            'handler_errors': self.handler_errors,
+            'last_batch_ms': self.last_batch_ms,
+            'avg_batch_ms': self.total_batch_ms / self.wakeups if self.wakeups else 0.0,
+            'max_batch_ms': self.max_batch_ms,
+            'loop_lag_ms': self.loop_lag_ms,
+            'max_loop_lag_ms': self.max_loop_lag_ms,
+        }
+
+
+class RadarUdpReceiver:
+    """
+    非阻塞雷达UDP接收器
+
+    通过loop.add_reader监听套接字，可读时用recvfrom_into循环读空内核队列，
+    数据写入预分配的缓冲区后依次交给frame_handler处理。
+    frame_handler(payload, addr, arrival_ns) 中的payload是指向内部缓冲区的memoryview，
+    只在回调期间有效，需要保留的数据必须在回调内拷贝。
+    """
+
+    def __init__(self, port, frame_handler, host='0.0.0.0', rcvbuf_size=RCVBUF_SIZE,
+                 batch_slots=BATCH_SLOTS, buffer_size=BUFFER_SIZE):
+        """
+        初始化接收器
+
+        参数:
+            port: 本地监听端口
+            frame_handler: 帧处理回调 (payload, addr, arrival_ns)
+            host: 本地监听地址
+            rcvbuf_size: 请求的SO_RCVBUF大小（字节）
+            batch_slots: 每次唤醒最多读取的数据报数量
+            buffer_size: 每个预分配缓冲区的大小
+        """
+        self.host = host
+        self.port = port
+        self.frame_handler = frame_handler
+        self.rcvbuf_size = rcvbuf_size
+        self.buffer_size = buffer_size
+        self.sock = None
+        self.actual_rcvbuf = None
+        self.stats = ReceiverStats()
+
+        # 预分配接收缓冲区
+        self._slots = [bytearray(buffer_size) for _ in range(batch_slots)]
+        self._views = [memoryview(buf) for buf in self._slots]
+        self._batch = [None] * batch_slots  # 每个缓冲区对应的 (长度, 地址, 到达时间)
+
+        self._loop = None
+        self._stopped = None
+        self._lag_task = None
+
+    def open(self):
+        """创建并绑定非阻塞UDP套接字，返回套接字对象"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf_size)
+        except OSError as e:
+            print(f"设置SO_RCVBUF失败: {e}")
+        self.actual_rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        sock.setblocking(False)
+        sock.bind((self.host, self.port))
+        self.sock = sock
+        print(f"UDP接收器已绑定 {self.host}:{self.port} | 接收缓冲区: {self.actual_rcvbuf // 1024}KB")
+        return sock
+
+    async def serve(self):
+        """在当前事件循环中运行接收器，直到调用stop()"""
+        if self.sock is None:
+            self.open()
+        fd = self.sock.fileno()
+        self._loop = asyncio.get_running_loop()
+        self._stopped = self._loop.create_future()
+        self._loop.add_reader(fd, self._on_readable)
+        self._lag_task = self._loop.create_task(self._measure_loop_lag())
+        try:
+            await self._stopped
+        finally:
+            self._loop.remove_reader(fd)
+            self._lag_task.cancel()
+
+    def stop(self):
+        """停止接收（可从其他线程调用）"""
+        if self._loop is None or self._stopped is None:
+            return
+
+        def _finish():
+            if not self._stopped.done():
+                self._stopped.set_result(None)
+
+        try:
+            self._loop.call_soon_threadsafe(_finish)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def close(self):
+        """关闭套接字"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _on_readable(self):
+        """套接字可读回调：读空内核队列，再逐个分发"""
+        wakeup_ns = time.perf_counter_ns()
+        sock = self.sock
+        count = 0
+
+        # 先读空队列（或读满预分配的缓冲区），减少内核丢包的窗口
+        while count < len(self._slots):
+            try:
+                nbytes, addr = sock.recvfrom_into(self._slots[count])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                print(f"UDP接收出错: {e}")
+                break
+            self._batch[count] = (nbytes, addr, time.time_ns())
+            count += 1
+
+        # 再依次交给处理回调
+        stats = self.stats
+        for i in range(count):
+            nbytes, addr, arrival_ns = self._batch[i]
+            if nbytes >= self.buffer_size:
+                stats.truncated += 1
+            stats.bytes += nbytes
+            try:
+                self.frame_handler(self._views[i][:nbytes], addr, arrival_ns)
+            except Exception as e:
+                stats.handler_errors += 1
+                print(f"帧处理出错: {e}")
+
+        elapsed_ms = (time.perf_counter_ns() - wakeup_ns) / 1e6
+        stats.wakeups += 1
+        stats.datagrams += count
+        stats.max_batch = max(stats.max_batch, count)
+        stats.last_batch_ms = elapsed_ms
+        stats.total_batch_ms += elapsed_ms
+        stats.max_batch_ms = max(stats.max_batch_ms, elapsed_ms)
+
+    async def _measure_loop_lag(self):
+        """周期性测量事件循环的调度延迟"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag_ms = max(0.0, (time.perf_counter() - start - LOOP_LAG_INTERVAL) * 1000)
+            self.stats.loop_lag_ms = lag_ms
+            self.stats.max_loop_lag_ms = max(self.stats.max_loop_lag_ms, lag_ms)
+
+    def kernel_drops(self):
+        """内核因接收缓冲区满而丢弃的数据报数，无法获取时返回None"""
+        if self.sock is None:
+            return None
+        return read_kernel_drops(self.sock)
+
+    def get_stats(self):
+        """获取接收统计（包含内核丢包数）"""
+        stats = self.stats.as_dict()
+        stats['kernel_drops'] = self.kernel_drops()
+        stats['rcvbuf_bytes'] = self.actual_rcvbuf
+        return stats
@@ -0,0 +1,841 @@
+"""
+雷达录制文件格式
+文件头保存radar_settings中的雷达参数，之后是定长记录（帧号、纳秒到达时间、float16样本），
+写入时批量缓冲，并生成稀疏索引文件（.idx），读取时可以直接内存映射为(frames, samples)数组。
+压缩模式下记录按块保存（帧间差分 + zlib/lzma），每块可独立解码，读取时按块随机访问。
+同时提供旧格式（15字节文本时间戳 + 原始数据报）.bin文件的转换工具
+"""
+
+import json
+import lzma
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from radar_settings import get_radar_params
+
+RECORDING_MAGIC = b'RADARREC'
+RECORDING_VERSION = 1
+COMPRESSED_VERSION = 2          # 压缩块格式
+RECORDING_EXTENSION = '.rrec'
+INDEX_EXTENSION = '.idx'
+
+# 文件头: 魔数(8) | 版本(2) | 保留(2) | JSON长度(4) | 数据区偏移(8)，之后是JSON元数据
+HEADER_STRUCT = struct.Struct('<8sHHIQ')
+DATA_ALIGN = 4096               # 数据区按页对齐，便于内存映射
+
+FRAME_HEADER_SIZE = 6           # UDP数据报: 2字节头 + 4字节帧号，之后是float16样本
+BUFFER_FRAMES = 256             # 写入缓冲的记录数（约8.5秒@30Hz）
+INDEX_INTERVAL = 30             # 每隔多少条记录写一条索引（约1秒@30Hz）
+
+# 压缩块: 魔数(4) | 记录数(4) | 元数据段长度(4) | 样本段长度(4)，之后是两段压缩数据
+BLOCK_STRUCT = struct.Struct('<4sIII')
+BLOCK_MAGIC = b'RBLK'
+CODECS = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompress, 6),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 1),
+}
+BLOCK_CACHE_SIZE = 4            # 读取时缓存的已解码块数
+
+# 记录标志位（低16位保存数据报的2字节头）
+FLAG_COARSE_TIME = 1 << 16      # 到达时间是从秒级时间戳估计的（旧格式转换）
+
+# 索引记录：记录序号、帧号、到达时间
+INDEX_DTYPE = np.dtype([('record', '<i8'), ('frame_number', '<u4'), ('reserved', '<u4'),
+                        ('arrival_ns', '<i8')])
+
+# 压缩块中的元数据段（记录中除样本外的字段）
+META_DTYPE = np.dtype([('frame_number', '<u4'), ('flags', '<u4'), ('arrival_ns', '<i8')])
+
+# 旧格式: 时间戳 strftime("%Y%m%d_%H%M%S")，15字节
+LEGACY_TIMESTAMP_SIZE = 15
+LEGACY_TIMESTAMP_PATTERN = re.compile(rb'\d{8}_\d{6}')
+
+
+def record_dtype(frame_size):
+    """
+    定长记录的数据类型
+
+    参数:
+        frame_size: 每帧样本数
+
+    返回:
+        numpy结构化dtype: frame_number(u4)、flags(u4)、arrival_ns(i8)、samples(f2, frame_size)
+    """
+    return np.dtype([('frame_number', '<u4'), ('flags', '<u4'), ('arrival_ns', '<i8'),
+                     ('samples', '<f2', (frame_size,))])
+
+
+def default_frame_size(params=None):
+    """根据雷达参数计算每帧样本数"""
+    params = params or get_radar_params()
+    return int(params['num_samples'] * params.get('num_chirps', 1) * params.get('rx_antennas', 1))
+
+
+def index_path(path):
+    """录制文件对应的索引文件路径"""
+    return path + INDEX_EXTENSION
+
+
+def encode_block(records, codec, level=None, delta=True):
+    """
+    把一组记录编码为一个可独立解码的压缩块
+
+    元数据（帧号、标志、到达时间）和样本分两段压缩。样本按float16的位模式做帧间差分
+    （块内第一帧与0差分，因此不依赖其他块），再把高低字节分开排列，之后用codec压缩，整个过程无损。
+    噪声占主导的数据帧间差分收益有限，可用benchmark_compression对比delta=False
+
+    参数:
+        records: record_dtype结构化数组
+        codec: 'zlib'或'lzma'
+        level: 压缩级别，默认使用CODECS中的级别
+        delta: 是否做帧间差分
+
+    返回:
+        块数据（bytes，含块头）
+    """
+    compress, _, default_level = CODECS[codec]
+    level = default_level if level is None else level
+    meta = np.empty(len(records), dtype=META_DTYPE)
+    for name in META_DTYPE.names:
+        meta[name] = records[name]
+    bits = records['samples'].view('<u2')
+    if delta:
+        bits = bits.copy()
+        bits[1:] -= records['samples'].view('<u2')[:-1]
+    planes = bits.view(np.uint8).reshape(len(records), -1, 2).transpose(2, 0, 1)
+    meta_data = compress(meta.tobytes(), level)
+    samples_data = compress(np.ascontiguousarray(planes).tobytes(), level)
+    return BLOCK_STRUCT.pack(BLOCK_MAGIC, len(records), len(meta_data), len(samples_data)) + meta_data + samples_data
+
+
+def decode_block_samples(data, count, frame_size, codec, delta=True):
+    """
+    解码压缩块的样本段
+
+    参数:
+        data: 样本段压缩数据
+        count: 块内记录数
+        frame_size: 每帧样本数
+        codec: 压缩方式
+        delta: 编码时是否做了帧间差分
+
+    返回:
+        形状为(count, frame_size)的float16数组
+    """
+    planes = np.frombuffer(CODECS[codec][1](data), dtype=np.uint8).reshape(2, count, frame_size)
+    bits = np.ascontiguousarray(planes.transpose(1, 2, 0)).view('<u2').reshape(count, frame_size)
+    if delta:
+        bits = np.cumsum(bits, axis=0, dtype=np.uint16)
+    return bits.view('<f2')
+
+
+class RecordingWriter:
+    """
+    录制文件写入器
+
+    记录先写入预分配的缓冲区，满BUFFER_FRAMES条后一次性写入文件；
+    进程异常退出时最多丢失一个缓冲区的数据，已写入的完整记录仍可读取。
+    指定compression时每次写入缓冲区生成一个压缩块（不生成.idx，块头本身即可定位）
+    """
+
+    def __init__(self, path, params=None, frame_size=None, buffer_frames=BUFFER_FRAMES,
+                 index_interval=INDEX_INTERVAL, metadata=None, compression=None, compression_level=None,
+                 delta=True):
+        """
+        创建录制文件并写入文件头
+
+        参数:
+            path: 输出文件路径
+            params: 雷达参数字典，默认使用radar_settings中的参数
+            frame_size: 每帧样本数，默认由雷达参数计算
+            buffer_frames: 写入缓冲的记录数（压缩模式下即每块的记录数）
+            index_interval: 每隔多少条记录写一条索引
+            metadata: 附加的元数据字典（例如数据来源）
+            compression: 压缩方式，None（不压缩）、'zlib'或'lzma'
+            compression_level: 压缩级别，默认使用CODECS中的级别
+            delta: 压缩模式下是否做帧间差分
+        """
+        if compression is not None and compression not in CODECS:
+            raise ValueError(f"不支持的压缩方式: {compression}，可选: {', '.join(CODECS)}")
+        self.path = path
+        self.params = dict(params or get_radar_params())
+        self.frame_size = frame_size or default_frame_size(self.params)
+        self.dtype = record_dtype(self.frame_size)
+        self.index_interval = index_interval
+        self.compression = compression
+        self.compression_level = CODECS[compression][2] if compression and compression_level is None else compression_level
+        self.delta = delta
+        self.frames_written = 0
+        self.bytes_written = 0
+        self._buffer = np.zeros(buffer_frames, dtype=self.dtype)
+        self._buffered = 0
+        self._index = []
+
+        header = {
+            'params': self.params,
+            'frame_size': self.frame_size,
+            'sample_dtype': '<f2',
+            'record_size': self.dtype.itemsize,
+            'index_interval': index_interval,
+            'created': time.time(),
+            'metadata': metadata or {},
+        }
+        if compression:
+            header['compression'] = {'codec': compression, 'level': self.compression_level,
+                                     'delta': delta, 'block_frames': buffer_frames}
+        header_json = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        data_offset = -(-(HEADER_STRUCT.size + len(header_json)) // DATA_ALIGN) * DATA_ALIGN
+        self.data_offset = data_offset
+
+        self._file = open(path, 'wb')
+        self._index_file = None if compression else open(index_path(path), 'wb')
+        version = COMPRESSED_VERSION if compression else RECORDING_VERSION
+        self._file.write(HEADER_STRUCT.pack(RECORDING_MAGIC, version, 0, len(header_json), data_offset))
+        self._file.write(header_json)
+        self._file.write(b'\x00' * (data_offset - HEADER_STRUCT.size - len(header_json)))
+
+    def write(self, frame_number, samples, arrival_ns, flags=0):
+        """
+        写入一帧
+
+        参数:
+            frame_number: 帧号
+            samples: 一维样本数组（任意浮点类型，保存为float16）
+            arrival_ns: 到达时间（纳秒时间戳）
+            flags: 记录标志
+        """
+        if len(samples) != self.frame_size:
+            raise ValueError(f"帧长度 {len(samples)} 与录制文件帧长度 {self.frame_size} 不一致")
+        record = self._buffer[self._buffered]
+        record['frame_number'] = frame_number
+        record['flags'] = flags
+        record['arrival_ns'] = arrival_ns
+        record['samples'] = samples
+
+        if self._index_file and (self.frames_written + self._buffered) % self.index_interval == 0:
+            self._index.append((self.frames_written + self._buffered, frame_number, 0, arrival_ns))
+
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def write_records(self, records):
+        """
+        批量写入record_dtype结构化数组（转换、压缩已有录制文件时使用）
+
+        参数:
+            records: record_dtype结构化数组，帧长度需与本文件一致
+        """
+        if records.dtype != self.dtype:
+            raise ValueError(f"记录类型 {records.dtype} 与录制文件记录类型 {self.dtype} 不一致")
+        position = 0
+        while position < len(records):
+            count = min(len(records) - position, len(self._buffer) - self._buffered)
+            chunk = records[position:position + count]
+            first = self.frames_written + self._buffered
+            self._buffer[self._buffered:self._buffered + count] = chunk
+            if self._index_file:
+                for row in range(-first % self.index_interval, count, self.index_interval):
+                    self._index.append((first + row, chunk[row]['frame_number'], 0, chunk[row]['arrival_ns']))
+            self._buffered += count
+            position += count
+            if self._buffered == len(self._buffer):
+                self.flush()
+
+    def write_datagram(self, data, arrival_ns=None, flags=0):
+        """
+        写入一个原始UDP数据报（2字节头 + 4字节帧号 + float16样本）
+
+        参数:
+            data: 数据报内容（bytes或memoryview）
+            arrival_ns: 到达时间，默认当前时间
+            flags: 附加的记录标志
+        """
+        if arrival_ns is None:
+            arrival_ns = time.time_ns()
+        frame_number = int.from_bytes(data[2:6], 'little')
+        head = int.from_bytes(data[0:2], 'little')
+        samples = np.frombuffer(data, dtype='<f2', offset=FRAME_HEADER_SIZE)
+        self.write(frame_number, samples, arrival_ns, flags | head)
+
+    def flush(self):
+        """把缓冲的记录和索引写入文件"""
+        if self._buffered:
+            records = self._buffer[:self._buffered]
+            if self.compression:
+                block = encode_block(records, self.compression, self.compression_level, self.delta)
+                self._file.write(block)
+                self.bytes_written += len(block)
+            else:
+                self._file.write(records)
+                self.bytes_written += records.nbytes
+            self.frames_written += self._buffered
+            self._buffered = 0
+        if self._index:
+            self._index_file.write(np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+            self._index.clear()
+        self._file.flush()
+        if self._index_file:
+            self._index_file.flush()
+
+    def close(self):
+        """写入剩余数据并关闭文件"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if self._index_file:
+            self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_header(path):
+    """
+    读取录制文件头
+
+    返回:
+        (版本, JSON头字典, 数据区偏移)
+    """
+    with open(path, 'rb') as f:
+        magic, version, _, header_len, data_offset = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+        if magic != RECORDING_MAGIC:
+            raise ValueError(f"{path} 不是雷达录制文件")
+        if version not in (RECORDING_VERSION, COMPRESSED_VERSION):
+            raise ValueError(f"不支持的录制文件版本: {version}")
+        return version, json.loads(f.read(header_len).decode('utf-8')), data_offset
+
+
+class Recording:
+    """
+    只读打开的录制文件
+
+    records为内存映射的结构化数组，samples为其中(frames, samples)的float16视图，
+    frame_numbers、arrival_ns同理；文件末尾不完整的记录（写入中断）会被忽略
+    """
+
+    def __init__(self, path):
+        """
+        打开录制文件
+
+        参数:
+            path: 录制文件路径
+        """
+        self.path = path
+        version, self.header, data_offset = read_header(path)
+        if version != RECORDING_VERSION:
+            raise ValueError(f"{path} 是压缩录制文件，请使用open_recording()打开")
+
+        self.params = self.header['params']
+        self.frame_size = self.header['frame_size']
+        self.metadata = self.header.get('metadata', {})
+        self.dtype = record_dtype(self.frame_size)
+        self.data_offset = data_offset
+
+        num_frames = max(0, (os.path.getsize(path) - data_offset) // self.dtype.itemsize)
+        if num_frames:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=data_offset, shape=(num_frames,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+        self.index = self._load_index(num_frames)
+
+    def _load_index(self, num_frames):
+        """读取索引文件，缺失时从记录中重建"""
+        interval = self.header.get('index_interval', INDEX_INTERVAL)
+        path = index_path(self.path)
+        if os.path.exists(path):
+            index = np.fromfile(path, dtype=INDEX_DTYPE, count=os.path.getsize(path) // INDEX_DTYPE.itemsize)
+            return index[index['record'] < num_frames]
+
+        rows = np.arange(0, num_frames, interval)
+        index = np.zeros(len(rows), dtype=INDEX_DTYPE)
+        index['record'] = rows
+        index['frame_number'] = self.records['frame_number'][rows]
+        index['arrival_ns'] = self.records['arrival_ns'][rows]
+        return index
+
+    def __len__(self):
+        return len(self.records)
+
+    def read(self, start, stop):
+        """读取[start, stop)范围的记录（内存映射视图）"""
+        return self.records[start:stop]
+
+    @property
+    def samples(self):
+        """(frames, samples) float16视图"""
+        return self.records['samples']
+
+    @property
+    def frame_numbers(self):
+        return self.records['frame_number']
+
+    @property
+    def arrival_ns(self):
+        return self.records['arrival_ns']
+
+    @property
+    def frame_rate(self):
+        return self.params.get('frame_rate')
+
+    def duration(self):
+        """录制时长（秒，按到达时间计算）"""
+        if len(self) < 2:
+            return 0.0
+        return (int(self.records[-1]['arrival_ns']) - int(self.records[0]['arrival_ns'])) / 1e9
+
+    def find_time(self, arrival_ns):
+        """
+        查找第一条到达时间不早于arrival_ns的记录序号
+
+        先在稀疏索引中二分定位，再只在一个索引间隔内查找，不需要读取整个文件
+        """
+        if len(self.index) == 0:
+            return 0
+        block = max(0, int(np.searchsorted(self.index['arrival_ns'], arrival_ns, side='right')) - 1)
+        start = int(self.index['record'][block])
+        stop = int(self.index['record'][block + 1]) + 1 if block + 1 < len(self.index) else len(self)
+        return start + int(np.searchsorted(self.records['arrival_ns'][start:stop], arrival_ns))
+
+    def find_frame(self, frame_number):
+        """
+        查找指定帧号的记录序号，不存在时返回None
+
+        帧号在录制中可能回绕或跳变，因此逐个检查帧号范围包含目标的索引间隔
+        """
+        bounds = list(self.index['record']) + [len(self)]
+        for block in range(len(self.index)):
+            start, stop = int(bounds[block]), int(bounds[block + 1])
+            numbers = self.records['frame_number'][start:stop]
+            if len(numbers) and numbers.min() <= frame_number <= numbers.max():
+                hits = np.flatnonzero(numbers == frame_number)
+                if len(hits):
+                    return start + int(hits[0])
+        return None
+
+    def close(self):
+        """释放内存映射"""
+        self.records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _BlockRecords:
+    """
+    压缩录制文件的记录访问接口，支持与内存映射数组相同的下标方式：
+    records[i]、records[a:b]（按需解码涉及的块）和records['字段']
+    """
+
+    def __init__(self, recording):
+        self._recording = recording
+
+    def __len__(self):
+        return len(self._recording)
+
+    def __getitem__(self, key):
+        recording = self._recording
+        if isinstance(key, str):
+            if key in META_DTYPE.names:
+                return recording.meta[key]
+            return recording.read(0, len(recording))[key]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(recording))
+            records = recording.read(start, max(start, stop))
+            return records if step == 1 else records[::step]
+        index = int(key)
+        if index < 0:
+            index += len(recording)
+        if not 0 <= index < len(recording):
+            raise IndexError(f"记录序号 {key} 超出范围")
+        return recording.read(index, index + 1)[0]
+
+
+class CompressedRecording(Recording):
+    """
+    只读打开的压缩录制文件
+
+    打开时扫描块头并解码所有块的元数据段（帧号、到达时间，约为样本数据的1.5%），
+    样本按块随机访问、按需解码，最近使用的BLOCK_CACHE_SIZE个块保留在内存中。
+    records提供与Recording相同的下标接口，回放和批处理代码不需要区分文件格式；
+    文件末尾不完整的块（写入中断）会被忽略
+    """
+
+    def __init__(self, path):
+        """
+        打开压缩录制文件
+
+        参数:
+            path: 录制文件路径
+        """
+        self.path = path
+        version, self.header, data_offset = read_header(path)
+        if version != COMPRESSED_VERSION:
+            raise ValueError(f"{path} 不是压缩录制文件")
+        self.params = self.header['params']
+        self.frame_size = self.header['frame_size']
+        self.metadata = self.header.get('metadata', {})
+        self.compression = self.header['compression']
+        self.codec = self.compression['codec']
+        self.delta = self.compression.get('delta', True)
+        self.dtype = record_dtype(self.frame_size)
+        self.data_offset = data_offset
+
+        self._file = open(path, 'rb')
+        self._cache = {}
+        self.blocks, self.meta = self._scan_blocks()
+        self.records = _BlockRecords(self)
+        self.index = self._load_index(len(self.meta))
+
+    def _scan_blocks(self):
+        """
+        扫描所有块头，解码元数据段
+
+        返回:
+            (块表: 每块的首记录序号、记录数、样本段偏移和长度, 所有记录的元数据数组)
+        """
+        file_size = os.fstat(self._file.fileno()).st_size
+        decompress = CODECS[self.codec][1]
+        blocks = []
+        metas = []
+        offset = self.data_offset
+        record = 0
+        while offset + BLOCK_STRUCT.size <= file_size:
+            self._file.seek(offset)
+            magic, count, meta_len, samples_len = BLOCK_STRUCT.unpack(self._file.read(BLOCK_STRUCT.size))
+            end = offset + BLOCK_STRUCT.size + meta_len + samples_len
+            if magic != BLOCK_MAGIC or end > file_size:
+                break
+            metas.append(np.frombuffer(decompress(self._file.read(meta_len)), dtype=META_DTYPE))
+            blocks.append((record, count, offset + BLOCK_STRUCT.size + meta_len, samples_len))
+            record += count
+            offset = end
+        table = np.array(blocks, dtype=np.int64).reshape(-1, 4)
+        meta = np.concatenate(metas) if metas else np.zeros(0, dtype=META_DTYPE)
+        return table, meta
+
+    def _load_index(self, num_frames):
+        """由元数据构建稀疏索引（压缩文件不使用.idx）"""
+        rows = np.arange(0, num_frames, self.header.get('index_interval', INDEX_INTERVAL))
+        index = np.zeros(len(rows), dtype=INDEX_DTYPE)
+        index['record'] = rows
+        index['frame_number'] = self.meta['frame_number'][rows]
+        index['arrival_ns'] = self.meta['arrival_ns'][rows]
+        return index
+
+    def __len__(self):
+        return len(self.meta)
+
+    def _block_samples(self, block):
+        """解码第block块的样本（带缓存）"""
+        samples = self._cache.pop(block, None)
+        if samples is None:
+            _, count, offset, length = (int(v) for v in self.blocks[block])
+            self._file.seek(offset)
+            samples = decode_block_samples(self._file.read(length), count, self.frame_size, self.codec, self.delta)
+            if len(self._cache) >= BLOCK_CACHE_SIZE:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[block] = samples
+        return samples
+
+    def read(self, start, stop):
+        """
+        读取[start, stop)范围的记录，只解码涉及的块
+
+        返回:
+            record_dtype结构化数组（新分配的内存）
+        """
+        start = max(0, start)
+        stop = min(stop, len(self))
+        records = np.empty(max(0, stop - start), dtype=self.dtype)
+        if stop <= start:
+            return records
+        for name in META_DTYPE.names:
+            records[name] = self.meta[name][start:stop]
+        first_records = self.blocks[:, 0]
+        block = int(np.searchsorted(first_records, start, side='right')) - 1
+        position = start
+        while position < stop:
+            block_start, count = int(self.blocks[block, 0]), int(self.blocks[block, 1])
+            end = min(stop, block_start + count)
+            records['samples'][position - start:end - start] = \
+                self._block_samples(block)[position - block_start:end - block_start]
+            position = end
+            block += 1
+        return records
+
+    @property
+    def samples(self):
+        """(frames, samples) float16数组（解码整个文件，大文件请用read()分段读取）"""
+        return self.read(0, len(self))['samples']
+
+    @property
+    def frame_numbers(self):
+        return self.meta['frame_number']
+
+    @property
+    def arrival_ns(self):
+        return self.meta['arrival_ns']
+
+    def duration(self):
+        """录制时长（秒，按到达时间计算）"""
+        if len(self) < 2:
+            return 0.0
+        return (int(self.meta['arrival_ns'][-1]) - int(self.meta['arrival_ns'][0])) / 1e9
+
+    def close(self):
+        """关闭文件并释放缓存"""
+        self._cache.clear()
+        if not self._file.closed:
+            self._file.close()
+
+
+def open_recording(path):
+    """以只读方式打开录制文件（自动识别是否压缩）"""
+    version, _, _ = read_header(path)
+    if version == COMPRESSED_VERSION:
+        return CompressedRecording(path)
+    return Recording(path)
+
+
+def compress_recording(src, dst, compression='zlib', compression_level=None, block_frames=BUFFER_FRAMES,
+                       max_frames=None, delta=True):
+    """
+    把录制文件转换为压缩格式（或用compression=None解压为原始格式）
+
+    参数:
+        src: 源录制文件
+        dst: 输出路径
+        compression: 压缩方式
+        compression_level: 压缩级别
+        block_frames: 每块的记录数
+        max_frames: 只转换前max_frames帧，None表示全部
+        delta: 是否做帧间差分
+
+    返回:
+        转换的帧数
+    """
+    with open_recording(src) as rec:
+        count = len(rec) if max_frames is None else min(len(rec), max_frames)
+        with RecordingWriter(dst, params=rec.params, frame_size=rec.frame_size, buffer_frames=block_frames,
+                             index_interval=rec.header.get('index_interval', INDEX_INTERVAL),
+                             metadata=rec.metadata, compression=compression,
+                             compression_level=compression_level, delta=delta) as writer:
+            for start in range(0, count, block_frames):
+                writer.write_records(rec.read(start, min(count, start + block_frames)))
+        return count
+
+
+def benchmark_compression(path, codecs=('zlib', 'lzma'), max_frames=None, block_frames=BUFFER_FRAMES):
+    """
+    对比原始格式和各压缩方式（有/无帧间差分）的压缩率、写入速度和解码吞吐量
+
+    参数:
+        path: 作为样本数据的录制文件
+        codecs: 要测试的压缩方式
+        max_frames: 只使用前max_frames帧，None表示全部
+        block_frames: 每块的记录数
+
+    返回:
+        结果列表，每项包含format、bytes、ratio、write_mb_s、read_mb_s、random_block_ms
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # 先复制为原始格式，压缩文件作为输入时也以原始格式为基准
+        source = os.path.join(tmpdir, 'source' + RECORDING_EXTENSION)
+        count = compress_recording(path, source, None, max_frames=max_frames)
+        raw_bytes = os.path.getsize(source) - read_header(source)[2]
+
+        variants = [(None, False)] + [(codec, delta) for codec in codecs for delta in (True, False)]
+        for codec, delta in variants:
+            name = 'raw' if codec is None else codec + ('' if delta else '-nodelta')
+            target = source if codec is None else os.path.join(tmpdir, name + RECORDING_EXTENSION)
+            write_time = 0.0
+            if codec is not None:
+                started = time.perf_counter()
+                compress_recording(source, target, codec, block_frames=block_frames, delta=delta)
+                write_time = time.perf_counter() - started
+            size = os.path.getsize(target) - read_header(target)[2]
+
+            with open_recording(target) as rec:
+                started = time.perf_counter()
+                checksum = 0.0
+                for start in range(0, len(rec), block_frames):
+                    # 读取并访问样本，使内存映射的原始格式也真正从文件读取
+                    checksum += float(rec.read(start, start + block_frames)['samples'][:, 0].astype(np.float64).sum())
+                read_time = time.perf_counter() - started
+
+                rng = np.random.default_rng(0)
+                positions = rng.integers(0, max(1, len(rec) - 1), 20)
+                started = time.perf_counter()
+                for position in positions:
+                    if isinstance(rec, CompressedRecording):
+                        rec._cache.clear()
+                    np.array(rec.read(int(position), int(position) + 1)['samples'])
+                random_time = (time.perf_counter() - started) / len(positions)
+
+            results.append({
+                'format': name,
+                'frames': count,
+                'bytes': size,
+                'ratio': raw_bytes / size if size else 0.0,
+                'write_mb_s': raw_bytes / 1e6 / write_time if write_time else None,
+                'read_mb_s': raw_bytes / 1e6 / read_time if read_time else None,
+                'random_block_ms': random_time * 1000,
+            })
+    return results
+
+
+def detect_legacy_layout(data, frame_size=None):
+    """
+    检测旧格式.bin文件中每条记录的长度
+
+    旧格式没有长度字段：每帧是15字节时间戳加一个完整数据报。优先根据前两个时间戳的间隔判断，
+    无法判断时（例如只有一帧）按雷达参数的帧长度计算
+
+    参数:
+        data: 文件内容（bytes或mmap）
+        frame_size: 每帧样本数，默认由雷达参数计算
+
+    返回:
+        每条记录的字节数（时间戳 + 数据报）
+    """
+    if not LEGACY_TIMESTAMP_PATTERN.match(data, 0):
+        raise ValueError("文件开头不是旧格式时间戳")
+    second = LEGACY_TIMESTAMP_PATTERN.search(data, LEGACY_TIMESTAMP_SIZE + FRAME_HEADER_SIZE)
+    if second is not None:
+        # 确认按该长度第三条记录也以时间戳开头，避免样本数据恰好匹配
+        size = second.start()
+        if len(data) < 3 * size or LEGACY_TIMESTAMP_PATTERN.match(data, 2 * size):
+            return size
+    return LEGACY_TIMESTAMP_SIZE + FRAME_HEADER_SIZE + 2 * (frame_size or default_frame_size())
+
+
+def _legacy_arrival_ns(timestamps):
+    """
+    根据秒级时间戳估计每帧的到达时间
+
+    同一秒内的帧在该秒内均匀分布
+    """
+    seconds = np.array([time.mktime(time.strptime(t.decode('ascii'), "%Y%m%d_%H%M%S")) for t in timestamps])
+    arrival = seconds * 1e9
+    start = 0
+    for i in range(1, len(seconds) + 1):
+        if i == len(seconds) or seconds[i] != seconds[start]:
+            count = i - start
+            arrival[start:i] += np.arange(count) * (1e9 / count)
+            start = i
+    return arrival.astype(np.int64)
+
+
+def convert_legacy_bin(src, dst=None, params=None, compression=None):
+    """
+    把旧格式.bin录制文件转换为新格式
+
+    参数:
+        src: 旧格式文件路径
+        dst: 输出路径，默认与src同名、扩展名为.rrec
+        params: 雷达参数字典，默认使用radar_settings中的参数
+        compression: 压缩方式，None表示不压缩
+
+    返回:
+        (输出路径, 转换的帧数)
+    """
+    if dst is None:
+        dst = os.path.splitext(src)[0] + RECORDING_EXTENSION
+
+    data = np.fromfile(src, dtype=np.uint8)
+    raw = data.tobytes()
+    record_size = detect_legacy_layout(raw, default_frame_size(params) if params else None)
+    frame_size = (record_size - LEGACY_TIMESTAMP_SIZE - FRAME_HEADER_SIZE) // 2
+    num_frames = len(data) // record_size
+    if len(data) % record_size:
+        print(f"警告: 文件末尾有 {len(data) % record_size} 字节不完整的记录被忽略")
+
+    legacy = data[:num_frames * record_size].reshape(num_frames, record_size)
+    timestamps = [bytes(row[:LEGACY_TIMESTAMP_SIZE]) for row in legacy]
+    arrival = _legacy_arrival_ns(timestamps)
+    datagrams = legacy[:, LEGACY_TIMESTAMP_SIZE:]
+    frame_numbers = datagrams[:, 2:6].copy().view('<u4').ravel()
+    heads = datagrams[:, 0:2].copy().view('<u2').ravel()
+    samples = datagrams[:, FRAME_HEADER_SIZE:].copy().view('<f2')
+
+    with RecordingWriter(dst, params=params, frame_size=frame_size,
+                         metadata={'converted_from': os.path.basename(src)}, compression=compression) as writer:
+        for i in range(num_frames):
+            writer.write(int(frame_numbers[i]), samples[i], int(arrival[i]), FLAG_COARSE_TIME | int(heads[i]))
+
+    return dst, num_frames
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='雷达录制文件工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help='把旧格式.bin文件转换为新格式')
+    convert_parser.add_argument('src', nargs='+', help='旧格式.bin文件')
+    convert_parser.add_argument('-o', '--output', type=str, default=None, help='输出路径（仅转换单个文件时有效）')
+    convert_parser.add_argument('--compression', choices=list(CODECS), default=None, help='压缩方式')
+    compress_parser = subparsers.add_parser('compress', help='把录制文件转换为压缩格式（或解压）')
+    compress_parser.add_argument('src', help='源录制文件')
+    compress_parser.add_argument('dst', help='输出路径')
+    compress_parser.add_argument('--compression', choices=list(CODECS) + ['none'], default='zlib',
+                                 help='压缩方式，none表示解压为原始格式')
+    compress_parser.add_argument('--level', type=int, default=None, help='压缩级别')
+    compress_parser.add_argument('--block-frames', type=int, default=BUFFER_FRAMES, help='每块的记录数')
+    compress_parser.add_argument('--no-delta', action='store_true', help='不做帧间差分')
+    benchmark_parser = subparsers.add_parser('benchmark', help='测试各压缩方式的压缩率和解码吞吐量')
+    benchmark_parser.add_argument('path', help='作为样本数据的录制文件')
+    benchmark_parser.add_argument('--codecs', nargs='+', choices=list(CODECS), default=list(CODECS), help='压缩方式')
+    benchmark_parser.add_argument('--max-frames', type=int, default=None, help='只使用前N帧')
+    benchmark_parser.add_argument('--block-frames', type=int, default=BUFFER_FRAMES, help='每块的记录数')
+    info_parser = subparsers.add_parser('info', help='显示录制文件信息')
+    info_parser.add_argument('path', help='录制文件')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        for src in args.src:
+            dst, count = convert_legacy_bin(src, args.output if len(args.src) == 1 else None,
+                                            compression=args.compression)
+            print(f"{src} -> {dst}: {count}帧")
+    elif args.command == 'compress':
+        compression = None if args.compression == 'none' else args.compression
+        count = compress_recording(args.src, args.dst, compression, args.level, args.block_frames,
+                                   delta=not args.no_delta)
+        ratio = os.path.getsize(args.src) / os.path.getsize(args.dst)
+        print(f"{args.src} -> {args.dst}: {count}帧 | 文件大小比 {ratio:.2f}")
+    elif args.command == 'benchmark':
+        results = benchmark_compression(args.path, args.codecs, args.max_frames, args.block_frames)
+        print(f"{'格式':<14}{'大小(MB)':>10}{'压缩率':>8}{'写入MB/s':>10}{'顺序读MB/s':>12}{'随机读(ms)':>12}")
+        for r in results:
+            write = f"{r['write_mb_s']:.1f}" if r['write_mb_s'] else '-'
+            print(f"{r['format']:<14}{r['bytes'] / 1e6:>10.2f}{r['ratio']:>8.2f}{write:>10}"
+                  f"{r['read_mb_s']:>12.1f}{r['random_block_ms']:>12.2f}")
+    else:
+        with open_recording(args.path) as rec:
+            frame_numbers = rec.frame_numbers
+            print(f"文件: {args.path}")
+            print(f"帧数: {len(rec)} | 每帧样本数: {rec.frame_size} | 时长: {rec.duration():.1f}秒")
+            if isinstance(rec, CompressedRecording):
+                print(f"压缩: {rec.codec} (级别 {rec.compression.get('level')}, 帧间差分: {rec.delta}) | "
+                      f"块数: {len(rec.blocks)}")
+            if len(rec):
+                lost = int(np.sum((np.diff(frame_numbers.astype(np.int64)) - 1).clip(0)))
+                print(f"帧号: {frame_numbers[0]} - {frame_numbers[-1]} | 缺失: {lost}帧 | 索引: {len(rec.index)}条")
+            if rec.metadata:
+                print(f"元数据: {rec.metadata}")
@@ -0,0 +1,321 @@
+"""
+雷达录制回放
+内存映射一个radar_recording录制文件，把每帧重新组装成UDP数据报交给RealtimeRadarProcessor的
+接收回调，经过与实时接收完全相同的帧序号跟踪、缓冲和调度后执行处理流水线。
+支持实时、N倍速和尽可能快三种速度；处理步骤在回放线程中同步执行，使用录制的到达时间，
+因此同一录制文件的输出与回放速度和机器负载无关，可用于回归比较和性能测试
+"""
+
+import json
+import struct
+import time
+
+import numpy as np
+
+import realtime_radar_processing as rrp
+from radar_pipeline import STAGES
+from radar_recording import open_recording, FRAME_HEADER_SIZE
+from step_scheduler import StepScheduler, POLICY_SKIP
+
+REPLAY_ADDR = ('replay', 0)     # 回放帧的源地址
+READ_CHUNK = 1024               # 每次读取的记录数（压缩录制文件按块解码）
+PROGRESS_INTERVAL = 10          # 尽可能快回放时的进度报告间隔（秒）
+HEART_RATE_TOLERANCE = 0.5      # 回归比较时允许的心率差异（BPM）
+
+
+def step_output(step_index, processor, step, result):
+    """一个处理步骤的输出记录（用于回归比较，只包含标量结果）"""
+    return {
+        'step': step_index,
+        'frame_number': processor.snapshot.frame_number,
+        'data_time': step['data_time'],
+        'target_bin': int(result['target_bin']),
+        'target_distance': float(result['target_distance']),
+        'presence_detected': bool(result['presence_detected']),
+        'presence_stable': bool(result['presence_stable']),
+        'window_loss': float(result['window_loss']),
+        'window_valid': bool(result['window_valid']),
+        'heart_rate': float(result['heart_rate']) if result['heart_rate'] is not None else None,
+        'respiration_rate': (float(result['respiration_rate'])
+                             if result['respiration_rate'] is not None else None),
+    }
+
+
+class RecordingReplay:
+    """录制文件回放器"""
+
+    def __init__(self, processor, recording, speed=1.0, start_frame=0, end_frame=None):
+        """
+        初始化回放器
+
+        参数:
+            processor: RealtimeRadarProcessor实例（不需要调用start()）
+            recording: radar_recording.Recording实例
+            speed: 回放速度倍数，1为实时，0或负数为尽可能快
+            start_frame: 起始记录序号
+            end_frame: 结束记录序号（不包含），None表示到文件末尾
+        """
+        self.processor = processor
+        self.recording = recording
+        self.speed = speed
+        self.start_frame = start_frame
+        self.end_frame = len(recording) if end_frame is None else min(end_frame, len(recording))
+
+        # 同步处理时每一步都在到期时立即执行，不会出现积压；固定使用skip策略，
+        # 避免降级/限速策略根据处理耗时改变输出
+        processor.scheduler = StepScheduler(rrp.WINDOW_SIZE, rrp.STEP_SIZE, rrp.FRAME_RATE, policy=POLICY_SKIP)
+        # 按录制时的雷达参数重新生成DSP计划
+        processor.pipeline.configure(recording.params)
+
+        self.outputs = []
+        self.stage_totals = dict.fromkeys(('ingest',) + STAGES + ('total',), 0.0)
+        self.frames = 0
+        self.errors = 0
+        self.wall_time = 0.0
+
+    def run(self):
+        """
+        执行回放（阻塞直到回放结束）
+
+        返回:
+            回放报告字典（见report()）
+        """
+        processor = self.processor
+        records = self.recording.records
+        datagram = bytearray(FRAME_HEADER_SIZE + 2 * self.recording.frame_size)
+        payload = memoryview(datagram)
+        samples_view = np.frombuffer(datagram, dtype='<f2', offset=FRAME_HEADER_SIZE)
+
+        first_arrival = int(records[self.start_frame]['arrival_ns']) if self.end_frame > self.start_frame else 0
+        wall_start = time.perf_counter()
+        last_progress = wall_start
+
+        for chunk_start in range(self.start_frame, self.end_frame, READ_CHUNK):
+            chunk = records[chunk_start:min(chunk_start + READ_CHUNK, self.end_frame)]
+            frame_numbers = chunk['frame_number']
+            heads = chunk['flags'] & 0xFFFF
+            arrivals = chunk['arrival_ns']
+            samples = chunk['samples']
+
+            for i in range(len(chunk)):
+                arrival_ns = int(arrivals[i])
+                if self.speed > 0:
+                    # 按录制的到达间隔控制回放节奏
+                    delay = wall_start + (arrival_ns - first_arrival) / 1e9 / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                ingest_start = time.perf_counter()
+                struct.pack_into('<HI', datagram, 0, int(heads[i]), int(frame_numbers[i]))
+                samples_view[:] = samples[i]
+                processor._handle_frame(payload, REPLAY_ADDR, arrival_ns)
+                self.stage_totals['ingest'] += time.perf_counter() - ingest_start
+                self.frames += 1
+
+                step = processor.scheduler.poll_step()
+                if step is not None:
+                    self._run_step(step)
+
+            if self.speed <= 0 and time.perf_counter() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.perf_counter()
+                done = chunk_start + len(chunk) - self.start_frame
+                total = self.end_frame - self.start_frame
+                print(f"回放进度: {done}/{total}帧 ({done / total * 100:.1f}%) | 步骤: {len(self.outputs)}")
+
+        # 数据结束：补齐等待重排的帧，处理最后一个可能到期的步骤
+        processor.sequencer.flush()
+        step = processor.scheduler.poll_step()
+        if step is not None:
+            self._run_step(step)
+
+        self.wall_time = time.perf_counter() - wall_start
+        return self.report()
+
+    def _run_step(self, step):
+        """同步执行一个处理步骤并记录输出和各阶段用时"""
+        result = self.processor.process_step(step)
+        if result is None:
+            self.errors += 1
+            return
+        for stage, seconds in result['stage_times'].items():
+            self.stage_totals[stage] += seconds
+        self.stage_totals['total'] += result['processing_time']
+        self.outputs.append(step_output(len(self.outputs), self.processor, step, result))
+
+    def report(self):
+        """
+        回放报告
+
+        返回:
+            字典: frames、steps、errors、wall_time、recording_duration、realtime_factor、
+            frames_per_second、stages（各阶段总用时和每步平均毫秒数）、heart_rate（心率输出统计）、
+            sequence（帧序号统计）
+        """
+        arrival = self.recording.arrival_ns
+        duration = (int(arrival[self.end_frame - 1]) - int(arrival[self.start_frame])) / 1e9 \
+            if self.end_frame - self.start_frame > 1 else 0.0
+        steps = len(self.outputs)
+        heart_rates = [o['heart_rate'] for o in self.outputs if o['heart_rate'] is not None]
+
+        return {
+            'recording': self.recording.path,
+            'frames': self.frames,
+            'steps': steps,
+            'errors': self.errors,
+            'speed': self.speed,
+            'wall_time': self.wall_time,
+            'recording_duration': duration,
+            'realtime_factor': duration / self.wall_time if self.wall_time > 0 else 0.0,
+            'frames_per_second': self.frames / self.wall_time if self.wall_time > 0 else 0.0,
+            'stages': {
+                stage: {
+                    'total_s': seconds,
+                    'per_step_ms': seconds / steps * 1000 if steps else 0.0,
+                } for stage, seconds in self.stage_totals.items()
+            },
+            'heart_rate': {
+                'outputs': len(heart_rates),
+                'mean': float(np.mean(heart_rates)) if heart_rates else None,
+                'min': float(np.min(heart_rates)) if heart_rates else None,
+                'max': float(np.max(heart_rates)) if heart_rates else None,
+            },
+            'sequence': self.processor.sequencer.get_stats(),
+        }
+
+
+def write_outputs(path, outputs):
+    """把逐步输出写入JSON Lines文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for output in outputs:
+            f.write(json.dumps(output, ensure_ascii=False) + '\n')
+
+
+def load_outputs(path):
+    """读取write_outputs()写入的输出文件"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_outputs(baseline, current, heart_rate_tolerance=HEART_RATE_TOLERANCE):
+    """
+    逐步比较两次回放的输出
+
+    参数:
+        baseline: 基准输出列表
+        current: 本次输出列表
+        heart_rate_tolerance: 允许的心率差异（BPM）
+
+    返回:
+        比较结果字典，passed表示步骤数一致且所有差异都在容差内
+    """
+    steps = min(len(baseline), len(current))
+    target_mismatches = presence_mismatches = heart_rate_mismatches = 0
+    max_heart_rate_diff = 0.0
+    for old, new in zip(baseline[:steps], current[:steps]):
+        target_mismatches += old['target_bin'] != new['target_bin']
+        presence_mismatches += old['presence_stable'] != new['presence_stable']
+        if (old['heart_rate'] is None) != (new['heart_rate'] is None):
+            heart_rate_mismatches += 1
+        elif old['heart_rate'] is not None:
+            diff = abs(old['heart_rate'] - new['heart_rate'])
+            max_heart_rate_diff = max(max_heart_rate_diff, diff)
+            heart_rate_mismatches += diff > heart_rate_tolerance
+
+    return {
+        'baseline_steps': len(baseline),
+        'current_steps': len(current),
+        'target_bin_mismatches': target_mismatches,
+        'presence_mismatches': presence_mismatches,
+        'heart_rate_mismatches': heart_rate_mismatches,
+        'max_heart_rate_diff': max_heart_rate_diff,
+        'passed': (len(baseline) == len(current) and target_mismatches == 0
+                   and presence_mismatches == 0 and heart_rate_mismatches == 0),
+    }
+
+
+def print_report(report):
+    """打印回放报告摘要"""
+    print("================================================================================")
+    print(f"回放完成: {report['recording']}")
+    print("================================================================================")
+    print(f"帧数: {report['frames']} | 步骤: {report['steps']} | 出错: {report['errors']}")
+    print(f"录制时长: {report['recording_duration']:.1f}秒 | 用时: {report['wall_time']:.1f}秒 | "
+          f"{report['realtime_factor']:.1f}倍实时 | {report['frames_per_second']:.0f}帧/秒")
+    print("各阶段用时（每步平均）:")
+    for stage, stats in report['stages'].items():
+        print(f"  {stage:<14} {stats['per_step_ms']:>8.2f}ms  (合计 {stats['total_s']:.2f}秒)")
+    hr = report['heart_rate']
+    if hr['outputs']:
+        print(f"心率输出: {hr['outputs']}次 | 平均 {hr['mean']:.1f} | 范围 {hr['min']:.1f}-{hr['max']:.1f} BPM")
+    else:
+        print("心率输出: 无")
+    seq = report['sequence']
+    print(f"帧序号: 丢帧率 {seq['loss_rate']*100:.2f}% | 乱序 {seq['reordered']} | 重新同步 {seq['resyncs']}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import threading
+
+    parser = argparse.ArgumentParser(description='雷达录制文件回放')
+    parser.add_argument('recording', help='录制文件（.rrec，旧格式.bin请先用radar_recording.py convert转换）')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='回放速度倍数，1为实时，0为尽可能快（默认）')
+    parser.add_argument('--start', type=float, default=0, help='从录制开始后第几秒开始回放')
+    parser.add_argument('--duration', type=float, default=None, help='回放时长（秒），默认到文件末尾')
+    parser.add_argument('--output', type=str, default=None, help='逐步输出写入的JSON Lines文件')
+    parser.add_argument('--report', type=str, default=None, help='回放报告写入的JSON文件')
+    parser.add_argument('--compare', type=str, default=None, help='与基准输出文件比较，不一致时返回非零退出码')
+    parser.add_argument('--decomp-type', type=str, choices=['cwt', 'eemd'], default=rrp.DECOMP_TYPE, help='信号分解类型')
+    parser.add_argument('--no-presence', action='store_true', help='禁用存在检测功能')
+    parser.add_argument('--no-model', action='store_true', help='禁用模型推理')
+    parser.add_argument('--cwt-model', type=str, default=None, help='CWT模型路径')
+    parser.add_argument('--eemd-model', type=str, default=None, help='EEMD模型路径')
+    parser.add_argument('--api', action='store_true', help='回放时启动FastAPI接口')
+    parser.add_argument('--api-port', type=int, default=8000, help='API服务器端口')
+    parser.add_argument('--verbose', action='store_true', help='打印每个处理步骤的详细信息')
+    args = parser.parse_args()
+
+    rrp.DECOMP_TYPE = args.decomp_type
+    rrp.ENABLE_PRESENCE_DETECTION = not args.no_presence
+
+    recording = open_recording(args.recording)
+    start_frame = recording.find_time(int(recording.arrival_ns[0]) + int(args.start * 1e9)) if len(recording) else 0
+    end_frame = None
+    if args.duration is not None and len(recording):
+        end_frame = recording.find_time(int(recording.arrival_ns[start_frame]) + int(args.duration * 1e9))
+
+    processor = rrp.RealtimeRadarProcessor(
+        load_models=not args.no_model,
+        cwt_model_path=args.cwt_model,
+        eemd_model_path=args.eemd_model,
+        api_enabled=args.api,
+        api_port=args.api_port,
+        verbose=args.verbose
+    )
+    if args.api:
+        processor.running = True
+        threading.Thread(target=processor._run_api_server, daemon=True).start()
+
+    replay = RecordingReplay(processor, recording, speed=args.speed, start_frame=start_frame, end_frame=end_frame)
+    print(f"回放 {args.recording}: 帧 {start_frame}-{replay.end_frame} | 速度: "
+          f"{'尽可能快' if args.speed <= 0 else f'{args.speed}倍'}")
+    report = replay.run()
+    print_report(report)
+
+    if args.output:
+        write_outputs(args.output, replay.outputs)
+        print(f"逐步输出已保存到 {args.output}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"回放报告已保存到 {args.report}")
+    if args.compare:
+        comparison = compare_outputs(load_outputs(args.compare), replay.outputs)
+        print(f"回归比较: {'通过' if comparison['passed'] else '不一致'} | "
+              f"步骤 {comparison['current_steps']}/{comparison['baseline_steps']} | "
+              f"目标bin不一致 {comparison['target_bin_mismatches']} | "
+              f"存在检测不一致 {comparison['presence_mismatches']} | "
+              f"心率不一致 {comparison['heart_rate_mismatches']} (最大差 {comparison['max_heart_rate_diff']:.2f})")
+        if not comparison['passed']:
+            raise SystemExit(1)
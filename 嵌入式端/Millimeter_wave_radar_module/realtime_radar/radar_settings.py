@@ -10,6 +10,28 @@ import os
 
 # 基础常数
 SPEED_OF_LIGHT = 3e8  # 光速 (m/s)
+RX_SPACING = 0.5      # 接收天线间距（波长）
+
+# BGT60TR13C三根接收天线（RX1、RX2、RX3）的水平坐标（波长）：
+# 天线为L形排列，RX1/RX3水平相距半波长，RX2在RX3正上方（水平坐标与RX3相同）
+BGT60TR13C_RX_POSITIONS = [0.0, RX_SPACING, RX_SPACING]
+
+def default_rx_positions(num_rx):
+    """
+    各接收天线的默认水平位置（单位：波长，按数据中的天线顺序）
+    
+    只有单天线和BGT60TR13C的三天线布局有默认值；其他天线数的布局无法推断，
+    错误的位置会使方位角估计和相干合并的权重出错，必须在参数中明确指定rx_positions
+    """
+    if num_rx == 1:
+        return [0.0]
+    if num_rx == len(BGT60TR13C_RX_POSITIONS):
+        return list(BGT60TR13C_RX_POSITIONS)
+    raise ValueError(f"没有 {num_rx} 根接收天线的默认布局，请明确指定各天线的水平位置（rx_positions）")
+
+def parse_rx_positions(text):
+    """解析命令行中逗号分隔的天线水平位置（波长），例如 0,0.5,0.5"""
+    return [float(x) for x in text.split(',')]
 
 # 基本雷达参数
 RADAR_PARAMS = {
@@ -24,6 +46,7 @@ RADAR_PARAMS = {
     'num_chirps': 1,             # 每帧chirp数
     'rx_antennas': 1,             # 接收天线数量
     'tx_antennas': 1,             # 发射天线数量
+    'rx_positions': default_rx_positions(1),    # 接收天线水平位置（波长），用于角度估计
     'hp_cutoff': 20e3,            # 高通滤波器截止频率 20 kHz
     'aaf_cutoff': 500e3,          # 抗混叠滤波器截止频率 500 kHz
     
@@ -73,6 +96,9 @@ def load_params_from_json(config_file='radar_settings/BGT60TR13C_settings_202504
             params['num_chirps'] = device_config['num_chirps_per_frame']
             params['rx_antennas'] = len(device_config.get('rx_antennas', [1, 2, 3]))
             params['tx_antennas'] = len(device_config.get('tx_antennas', [1]))
+            # 没有默认布局的天线数不设置位置（None），使用角度估计前必须明确指定
+            params['rx_positions'] = (default_rx_positions(params['rx_antennas'])
+                                      if params['rx_antennas'] in (1, len(BGT60TR13C_RX_POSITIONS)) else None)
             params['hp_cutoff'] = device_config.get('hp_cutoff_Hz', 20000)
             params['aaf_cutoff'] = device_config.get('aaf_cutoff_Hz', 500000)
             
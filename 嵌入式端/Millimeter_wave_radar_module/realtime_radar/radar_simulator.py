@@ -0,0 +1,345 @@
+"""
+雷达帧仿真和UDP负载生成
+按配置的目标（距离、方位角、呼吸频率、心率）生成设备UDP格式的float16雷达帧
+（2字节头 + 4字节帧号 + 样本，多接收天线时各天线的样本按采样点交织），可叠加静态杂波和噪声，作为精度测试的真值输入；
+负载生成器以雷达帧率向本地端口发送N个模拟传感器的数据，用于吞吐量测试
+"""
+
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from radar_settings import get_radar_params, default_rx_positions, parse_rx_positions
+
+FRAME_HEAD = 0                  # 数据报的2字节头
+LOOP_SECONDS = 20               # 负载生成器预先生成并循环发送的时长（秒）
+
+# 默认目标参数
+DEFAULT_RANGE = 1.0             # 目标距离（米）
+DEFAULT_BREATHING_RATE = 15     # 呼吸频率（次/分钟）
+DEFAULT_HEART_RATE = 72         # 心率（次/分钟）
+BREATHING_AMPLITUDE = 4e-3      # 呼吸引起的胸壁位移幅度（米）
+HEART_AMPLITUDE = 2e-4          # 心跳引起的胸壁位移幅度（米）
+
+
+def make_datagram(frame_number, samples, head=FRAME_HEAD):
+    """
+    按设备格式组装一个UDP数据报
+
+    参数:
+        frame_number: 帧号（32位无符号，自动回绕）
+        samples: 一维样本数组，保存为小端float16
+        head: 2字节头
+
+    返回:
+        bytes
+    """
+    return struct.pack('<HI', head, frame_number % (1 << 32)) + np.asarray(samples, dtype='<f2').tobytes()
+
+
+class SimTarget:
+    """一个模拟的人体目标（胸壁位移由呼吸和心跳两个正弦分量组成）"""
+
+    def __init__(self, range_m=DEFAULT_RANGE, breathing_rate=DEFAULT_BREATHING_RATE,
+                 heart_rate=DEFAULT_HEART_RATE, amplitude=1.0,
+                 breathing_amplitude=BREATHING_AMPLITUDE, heart_amplitude=HEART_AMPLITUDE, angle_deg=0.0):
+        """
+        参数:
+            range_m: 目标距离（米）
+            breathing_rate: 呼吸频率（次/分钟）
+            heart_rate: 心率（次/分钟）
+            amplitude: 回波幅度
+            breathing_amplitude: 呼吸位移幅度（米）
+            heart_amplitude: 心跳位移幅度（米）
+            angle_deg: 目标方位角（度，0为正前方，只在多接收天线时有影响）
+        """
+        self.range_m = range_m
+        self.breathing_rate = breathing_rate
+        self.heart_rate = heart_rate
+        self.amplitude = amplitude
+        self.breathing_amplitude = breathing_amplitude
+        self.heart_amplitude = heart_amplitude
+        self.angle_deg = angle_deg
+
+    def displacement(self, t):
+        """时刻t（秒，数组）的距离（米）"""
+        return (self.range_m
+                + self.breathing_amplitude * np.sin(2 * np.pi * self.breathing_rate / 60 * t)
+                + self.heart_amplitude * np.sin(2 * np.pi * self.heart_rate / 60 * t))
+
+    def as_dict(self):
+        """真值字典（写入录制文件元数据和测试报告）"""
+        return {
+            'range_m': self.range_m,
+            'breathing_rate': self.breathing_rate,
+            'heart_rate': self.heart_rate,
+            'amplitude': self.amplitude,
+            'breathing_amplitude': self.breathing_amplitude,
+            'heart_amplitude': self.heart_amplitude,
+            'angle_deg': self.angle_deg,
+        }
+
+
+class RadarFrameSimulator:
+    """
+    FMCW雷达帧仿真器
+
+    每个反射体在一帧内产生一个拍频正弦，拍频按处理流水线的距离标定
+    （距离 = FFT bin × range_resolution）确定；帧间相位为 4πR(t)/λ，随胸壁位移变化。
+    多接收天线时第k根天线的回波附加 2π·x_k·sin(方位角) 的相位（x_k为天线水平位置，单位波长），
+    杂波位于正前方。同一seed生成的帧完全相同
+    """
+
+    def __init__(self, targets=None, clutter=None, noise_std=0.05, params=None, seed=0, rx_antennas=None,
+                 rx_positions=None):
+        """
+        参数:
+            targets: SimTarget列表，默认一个1米处的目标
+            clutter: 静态杂波列表 [(距离米, 幅度), ...]
+            noise_std: 加性高斯噪声标准差
+            params: 雷达参数字典，默认使用radar_settings中的参数
+            seed: 随机种子（噪声和杂波相位）
+            rx_antennas: 接收天线数，None使用雷达参数中的rx_antennas
+            rx_positions: 各接收天线的水平位置（波长），None使用雷达参数或默认布局
+        """
+        params = params or get_radar_params()
+        self.params = params
+        self.targets = targets if targets is not None else [SimTarget()]
+        self.clutter = clutter or []
+        self.noise_std = noise_std
+        self.num_samples = int(params['num_samples'])
+        self.frame_rate = params['frame_rate']
+        self.range_resolution = params['range_resolution']
+        self.wavelength = params['wavelength']
+        self.seed = seed
+        self.num_rx = int(rx_antennas or params.get('rx_antennas', 1))
+        if rx_positions is not None:
+            self.rx_positions = np.asarray(rx_positions, dtype=float)
+        elif self.num_rx == params.get('rx_antennas', 1) and 'rx_positions' in params:
+            self.rx_positions = np.asarray(params['rx_positions'], dtype=float)
+        else:
+            self.rx_positions = np.asarray(default_rx_positions(self.num_rx), dtype=float)
+        if len(self.rx_positions) != self.num_rx:
+            raise ValueError(f"天线位置数 {len(self.rx_positions)} 与接收天线数 {self.num_rx} 不一致")
+        self.frame_size = self.num_samples * self.num_rx
+        # 录制文件头中的参数与生成的帧一致（回放时按其生成DSP计划）
+        self.params = dict(params, rx_antennas=self.num_rx, rx_positions=[float(x) for x in self.rx_positions])
+
+        rng = np.random.default_rng(seed)
+        self._clutter_phase = rng.uniform(0, 2 * np.pi, len(self.clutter))
+        n = np.arange(self.num_samples)
+        # 每个反射体的拍频载波（一帧内的样本序列）
+        self._target_carriers = [2 * np.pi * (t.range_m / self.range_resolution) * n / self.num_samples
+                                 for t in self.targets]
+        self._static = np.zeros(self.num_samples)
+        for (range_m, amplitude), phase in zip(self.clutter, self._clutter_phase):
+            self._static += amplitude * np.cos(2 * np.pi * (range_m / self.range_resolution) * n / self.num_samples + phase)
+
+    def frames(self, start, count):
+        """
+        生成连续的若干帧
+
+        参数:
+            start: 第一帧的序号（决定时刻 start / frame_rate）
+            count: 帧数
+
+        返回:
+            形状为(count, frame_size)的float16数组（frame_size = num_samples × 接收天线数，
+            多天线时每个采样点的各天线样本相邻存放，与设备FIFO输出的顺序相同）
+        """
+        t = (start + np.arange(count)) / self.frame_rate
+        if self.num_rx == 1:
+            frames = np.tile(self._static, (count, 1))
+            for target, carrier in zip(self.targets, self._target_carriers):
+                phase = 4 * np.pi * target.displacement(t) / self.wavelength
+                frames += target.amplitude * np.cos(carrier[np.newaxis, :] + phase[:, np.newaxis])
+        else:
+            # (帧, 采样点, 天线)，展平后即为交织的样本顺序
+            frames = np.tile(self._static[:, np.newaxis], (count, 1, self.num_rx))
+            for target, carrier in zip(self.targets, self._target_carriers):
+                phase = 4 * np.pi * target.displacement(t) / self.wavelength
+                rx_phase = 2 * np.pi * self.rx_positions * np.sin(np.deg2rad(target.angle_deg))
+                frames += target.amplitude * np.cos(carrier[np.newaxis, :, np.newaxis]
+                                                    + phase[:, np.newaxis, np.newaxis]
+                                                    + rx_phase[np.newaxis, np.newaxis, :])
+            frames = frames.reshape(count, self.frame_size)
+        if self.noise_std > 0:
+            # 噪声按帧序号确定，任意起点生成的同一帧相同
+            for i in range(count):
+                rng = np.random.default_rng([self.seed, start + i])
+                frames[i] += self.noise_std * rng.standard_normal(self.frame_size)
+        return frames.astype(np.float16)
+
+    def datagrams(self, start, count, head=FRAME_HEAD):
+        """生成连续若干帧的UDP数据报列表（帧号从start开始）"""
+        return [make_datagram(start + i, samples, head) for i, samples in enumerate(self.frames(start, count))]
+
+    def ground_truth(self):
+        """仿真参数真值"""
+        return {
+            'targets': [t.as_dict() for t in self.targets],
+            'clutter': [list(c) for c in self.clutter],
+            'noise_std': self.noise_std,
+            'seed': self.seed,
+            'rx_antennas': self.num_rx,
+        }
+
+
+def sensor_simulator(index, noise_std=0.05):
+    """
+    第index个模拟传感器：目标距离、呼吸频率和心率各不相同，结果可重复
+
+    返回:
+        RadarFrameSimulator
+    """
+    rng = np.random.default_rng(1000 + index)
+    target = SimTarget(range_m=float(rng.uniform(0.5, 1.8)),
+                       breathing_rate=float(rng.uniform(10, 20)),
+                       heart_rate=float(rng.uniform(55, 95)))
+    clutter = [(float(rng.uniform(0.3, 2.5)), float(rng.uniform(0.2, 1.0))) for _ in range(2)]
+    return RadarFrameSimulator([target], clutter=clutter, noise_std=noise_std, seed=index)
+
+
+class UdpLoadGenerator:
+    """
+    UDP负载生成器：N个模拟传感器（各自独立的源端口）以帧率向目标端口发送数据
+
+    每个传感器预先生成LOOP_SECONDS秒的数据报循环发送（帧号持续递增），发送时不做计算
+    """
+
+    def __init__(self, port, num_sensors=1, host='127.0.0.1', frame_rate=None,
+                 simulators=None, loop_seconds=LOOP_SECONDS):
+        """
+        参数:
+            port: 目标UDP端口
+            num_sensors: 模拟传感器数量
+            host: 目标地址
+            frame_rate: 发送帧率，默认使用雷达参数中的帧率
+            simulators: RadarFrameSimulator列表，默认使用sensor_simulator(i)
+            loop_seconds: 预先生成的数据时长
+        """
+        self.target = (host, port)
+        self.simulators = simulators or [sensor_simulator(i) for i in range(num_sensors)]
+        self.num_sensors = len(self.simulators)
+        self.frame_rate = frame_rate or self.simulators[0].frame_rate
+        loop_frames = max(1, int(loop_seconds * self.frame_rate))
+        self._payloads = [sim.frames(0, loop_frames) for sim in self.simulators]
+        self._stop = threading.Event()
+
+        self.frames_sent = 0
+        self.late_ticks = 0         # 发送落后于帧率节拍的次数
+        self.max_lateness = 0.0     # 最大落后时间（秒）
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, duration=None):
+        """
+        按帧率发送（阻塞直到duration秒后或stop()被调用）
+
+        参数:
+            duration: 发送时长（秒），None表示一直发送
+        """
+        sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(self.num_sensors)]
+        header = bytearray(6)
+        interval = 1.0 / self.frame_rate
+        frame_number = 0
+        next_time = time.perf_counter()
+        end_time = next_time + duration if duration is not None else None
+
+        try:
+            while not self._stop.is_set() and (end_time is None or time.perf_counter() < end_time):
+                for sock, payload in zip(sockets, self._payloads):
+                    struct.pack_into('<HI', header, 0, FRAME_HEAD, frame_number % (1 << 32))
+                    sock.sendto(bytes(header) + payload[frame_number % len(payload)].tobytes(), self.target)
+                self.frames_sent += self.num_sensors
+                frame_number += 1
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.late_ticks += 1
+                    self.max_lateness = max(self.max_lateness, -delay)
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    def start(self, duration=None):
+        """在后台线程中发送，返回线程对象"""
+        thread = threading.Thread(target=self.run, args=(duration,), daemon=True)
+        thread.start()
+        return thread
+
+
+def write_synthetic_recording(path, simulator, duration, start_ns=None):
+    """
+    生成一个合成录制文件（真值写入元数据），可直接用于回放和批处理
+
+    参数:
+        path: 输出路径（.rrec）
+        simulator: RadarFrameSimulator
+        duration: 时长（秒）
+        start_ns: 第一帧的到达时间，默认当前时间
+
+    返回:
+        写入的帧数
+    """
+    from radar_recording import RecordingWriter
+
+    start_ns = time.time_ns() if start_ns is None else start_ns
+    num_frames = int(duration * simulator.frame_rate)
+    chunk = int(simulator.frame_rate * 60)
+    with RecordingWriter(path, params=simulator.params, frame_size=simulator.frame_size,
+                         metadata={'synthetic': simulator.ground_truth()}) as writer:
+        for start in range(0, num_frames, chunk):
+            frames = simulator.frames(start, min(chunk, num_frames - start))
+            for i, samples in enumerate(frames):
+                writer.write(start + i, samples, start_ns + int((start + i) * 1e9 / simulator.frame_rate))
+    return num_frames
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='雷达帧仿真和UDP负载生成')
+    parser.add_argument('--port', type=int, default=57345, help='目标UDP端口')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='目标地址')
+    parser.add_argument('--sensors', type=int, default=1, help='模拟传感器数量（多于1个时各传感器参数随机）')
+    parser.add_argument('--duration', type=float, default=None, help='发送/录制时长（秒），默认一直发送')
+    parser.add_argument('--range', type=float, default=DEFAULT_RANGE, help='目标距离（米，单传感器时有效）')
+    parser.add_argument('--breathing-rate', type=float, default=DEFAULT_BREATHING_RATE, help='呼吸频率（次/分钟）')
+    parser.add_argument('--heart-rate', type=float, default=DEFAULT_HEART_RATE, help='心率（次/分钟）')
+    parser.add_argument('--angle', type=float, default=0.0, help='目标方位角（度，单传感器时有效）')
+    parser.add_argument('--rx-antennas', type=int, default=None, help='接收天线数，默认使用雷达参数')
+    parser.add_argument('--rx-positions', type=parse_rx_positions, default=None,
+                        help='各接收天线的水平位置（波长，逗号分隔），默认使用BGT60TR13C的布局')
+    parser.add_argument('--noise', type=float, default=0.05, help='噪声标准差')
+    parser.add_argument('--record', type=str, default=None, help='不发送，生成合成录制文件到指定路径')
+    args = parser.parse_args()
+
+    if args.sensors == 1:
+        simulators = [RadarFrameSimulator([SimTarget(args.range, args.breathing_rate, args.heart_rate,
+                                                     angle_deg=args.angle)],
+                                          clutter=[(0.4, 0.5)], noise_std=args.noise, rx_antennas=args.rx_antennas,
+                                          rx_positions=args.rx_positions)]
+    else:
+        simulators = [sensor_simulator(i, args.noise) for i in range(args.sensors)]
+
+    if args.record:
+        count = write_synthetic_recording(args.record, simulators[0], args.duration or 60)
+        print(f"已生成合成录制文件 {args.record}: {count}帧 | 真值: {simulators[0].ground_truth()['targets']}")
+    else:
+        generator = UdpLoadGenerator(args.port, host=args.host, simulators=simulators)
+        for i, sim in enumerate(simulators):
+            t = sim.targets[0]
+            print(f"传感器 {i}: 距离 {t.range_m:.2f}米 | 呼吸 {t.breathing_rate:.1f}次/分 | 心率 {t.heart_rate:.1f}次/分")
+        print(f"向 {args.host}:{args.port} 发送 {generator.num_sensors}个传感器 @ {generator.frame_rate:.0f}Hz")
+        try:
+            generator.run(args.duration)
+        except KeyboardInterrupt:
+            pass
+        print(f"已发送 {generator.frames_sent}帧 | 节拍落后 {generator.late_ticks}次 (最大 {generator.max_lateness*1000:.1f}ms)")
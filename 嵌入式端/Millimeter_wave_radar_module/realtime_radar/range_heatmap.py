@@ -0,0 +1,78 @@
+"""
+距离-时间热力图模块
+保存处理流程中已经计算好的逐帧距离剖面，按需下采样到请求的时间/距离分辨率，
+用于前端绘制流式距离-时间热力图
+"""
+
+import numpy as np
+
+from frame_buffer import FrameRingBuffer
+
+
+class RangeProfileRing(FrameRingBuffer):
+    """
+    逐帧距离剖面环形缓冲区
+    每一行是一帧的距离剖面幅度，写满后覆盖最旧的数据
+    """
+
+    def __init__(self, capacity, num_range_bins):
+        """
+        初始化环形缓冲区
+
+        参数:
+            capacity: 最多保存的帧数
+            num_range_bins: 每帧保存的距离bin数量
+        """
+        super().__init__(capacity, num_range_bins, dtype=np.float32)
+        self.num_range_bins = num_range_bins
+
+    def extend(self, profiles):
+        """
+        追加若干帧距离剖面
+
+        参数:
+            profiles: 形状为(frames, range_bins)的复数或实数距离谱，
+                      超过num_range_bins的部分会被截断
+        """
+        super().extend(np.abs(profiles[:, :self.num_range_bins]))
+
+
+def _block_mean(data, num_blocks, axis):
+    """沿指定维度将数据分成num_blocks段并求每段均值（不要求整除）"""
+    length = data.shape[axis]
+    num_blocks = max(1, min(num_blocks, length))
+    edges = np.linspace(0, length, num_blocks + 1).astype(int)[:-1]
+    sums = np.add.reduceat(data, edges, axis=axis)
+    counts = np.diff(np.append(edges, length))
+    shape = [1] * data.ndim
+    shape[axis] = num_blocks
+    return sums / counts.reshape(shape)
+
+
+def downsample_heatmap(profiles, time_bins, range_bins, scale='db'):
+    """
+    将距离剖面矩阵下采样到请求的分辨率
+
+    参数:
+        profiles: 形状为(frames, range_bins)的幅度矩阵
+        time_bins: 输出的时间维度大小（不超过输入帧数）
+        range_bins: 输出的距离维度大小（不超过输入bin数）
+        scale: 'db' 输出20*log10幅度，'linear' 输出线性幅度
+
+    返回:
+        形状为(time_bins, range_bins)的float32数组
+    """
+    if profiles.shape[0] == 0:
+        return np.zeros((0, min(range_bins, profiles.shape[1])), dtype=np.float32)
+
+    # 在线性功率域做块平均，再转换到输出刻度
+    power = profiles.astype(np.float32) ** 2
+    power = _block_mean(power, time_bins, axis=0)
+    power = _block_mean(power, range_bins, axis=1)
+
+    if scale == 'db':
+        return (10 * np.log10(power + 1e-12)).astype(np.float32)
+    elif scale == 'linear':
+        return np.sqrt(power).astype(np.float32)
+    else:
+        raise ValueError(f"不支持的刻度类型: {scale}")
@@ -5,25 +5,35 @@
 import os
 import sys
 import numpy as np
-import struct
 import time
-import socket
-import threading
-from scipy import signal
-from radar_func import range_fft, mti_filter, extract_phase
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-# 导入信号分解模块
-from signal_decomposition import apply_cwt, apply_eemd
+# 导入信号处理流水线
+from radar_pipeline import RadarPipeline, prepare_model_input, STAGES
+from radar_pipeline import load_models as load_vital_models
+from dsp_plan import DspPlan
 
-# 导入存在检测模块
-from presence_detection import RadarPresenceDetector
+# 导入距离-时间热力图模块
+from range_heatmap import RangeProfileRing, downsample_heatmap
+from array_export import array_response
+
+# 导入UDP接收器和帧缓冲区
+from radar_receiver import RadarUdpReceiver
+from frame_buffer import FrameRingBuffer
+from frame_sequence import FrameSequencer
+from step_scheduler import StepScheduler, OVERLOAD_POLICIES
+from recording_tee import RecordingTee, MAX_FILE_MB, MAX_FILE_MINUTES
+from result_stream import ResultBroadcaster
+from vital_history import VitalHistory, RESOLUTIONS, MAX_POINTS
+from result_snapshot import ResultSnapshot, not_modified, snapshot_response
+from radar_metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE, DECODE_BUCKETS, LATENCY_BUCKETS
 
 # 导入FastAPI相关模块
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from typing import Dict, Any, Optional
-import json
+from typing import Optional
 
 # 确保当前目录在Python路径中，便于导入自定义模块
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -55,17 +65,9 @@ except ImportError:
             except ImportError:
                 print(f"尝试从{loc}导入失败")
 
-# 导入TensorFlow/Keras模型处理
-try:
-    import tensorflow as tf
-    from tensorflow import keras
-    print("成功导入TensorFlow/Keras")
-except ImportError:
-    print("警告：无法导入TensorFlow/Keras，模型推理功能将被禁用")
-
 # 导入雷达设置
 try:
-    from radar_settings import get_radar_params, get_param
+    from radar_settings import get_radar_params, get_param, default_rx_positions, parse_rx_positions
     radar_params = get_radar_params()
     print("成功导入雷达参数配置")
 except ImportError:
@@ -94,6 +96,7 @@ WINDOW_SIZE_SECONDS = 10   # 处理窗口为10秒
 WINDOW_SIZE = int(WINDOW_SIZE_SECONDS * FRAME_RATE)  # 窗口大小（采样点数）
 STEP_SIZE_SECONDS = 1      # 滑动步长为1秒
 STEP_SIZE = int(STEP_SIZE_SECONDS * FRAME_RATE)  # 步长（采样点数）
+OVERLOAD_POLICY = 'skip'   # 处理跟不上数据速率时的策略: 'skip'、'degrade' 或 'throttle'
 
 # 信号分解参数
 DECOMPOSE_SIGNAL = True    # 是否进行信号分解
@@ -103,18 +106,89 @@ CWT_WAVELET = 'morl'       # CWT小波类型
 EEMD_NOISE_WIDTH = 0.05    # EEMD噪声幅度
 EEMD_ENSEMBLE_SIZE = 50    # EEMD集合大小
 EEMD_MAX_IMF = 5          # EEMD最大IMF数量
+PHASE_FILTER = True       # 信号分解是否使用心跳频带滤波后的相位（模型用原始相位训练时关闭）
 
 # 存在检测参数
 ENABLE_PRESENCE_DETECTION = True              # 是否启用存在检测
 PRESENCE_HISTORY_LENGTH = 5                   # 存在检测历史长度
 PRESENCE_COUNT_THRESHOLD = 2                  # 存在检测计数阈值
 
+# 多目标参数
+MAX_TARGETS = 1                               # 每个窗口最多处理的目标数（1表示单目标模式）
+
+# 多接收天线参数
+NUM_RX = get_param('rx_antennas')             # 接收天线数（大于1时估计方位角并相干合并各天线）
+RX_POSITIONS = get_param('rx_positions')      # 接收天线水平位置（波长）
+
+# 距离-时间热力图参数
+HEATMAP_HISTORY_SECONDS = 60                  # 热力图保存的历史时长（秒）
+HEATMAP_RANGE_BINS = FFT_SIZE // 2            # 保存的距离bin数量（实信号FFT只取正频率一半）
+
+
+def create_dsp_plan():
+    """
+    由雷达参数（get_radar_params()）和当前模块的处理参数生成DSP计划
+    （每个流水线一个，计划中的工作数组不能在流水线之间共享）
+    """
+    return DspPlan.from_params(
+        radar_params, WINDOW_SIZE,
+        num_rx=NUM_RX,
+        rx_positions=RX_POSITIONS,
+        window_type=WINDOW_TYPE,
+        cwt_scales=CWT_SCALES,
+        cwt_wavelet=CWT_WAVELET,
+        max_targets=MAX_TARGETS,
+    )
+
+
+def create_pipeline(cwt_model=None, eemd_model=None, heatmap=None, verbose=True):
+    """
+    按当前模块参数创建一个信号处理流水线（DSP计划由雷达参数预先生成）
+    
+    参数:
+        cwt_model: CWT心率模型
+        eemd_model: EEMD心率模型
+        heatmap: 可选的距离剖面环形缓冲区
+        verbose: 是否打印每一步的处理信息
+    
+    返回:
+        RadarPipeline实例
+    """
+    return RadarPipeline(
+        frame_rate=FRAME_RATE,
+        range_resolution=RANGE_RESOLUTION,
+        wavelength=WAVELENGTH,
+        window_type=WINDOW_TYPE,
+        decompose=DECOMPOSE_SIGNAL,
+        decomp_type=DECOMP_TYPE,
+        cwt_scales=CWT_SCALES,
+        cwt_wavelet=CWT_WAVELET,
+        eemd_noise_width=EEMD_NOISE_WIDTH,
+        eemd_ensemble_size=EEMD_ENSEMBLE_SIZE,
+        eemd_max_imf=EEMD_MAX_IMF,
+        presence_detection=ENABLE_PRESENCE_DETECTION,
+        presence_history=PRESENCE_HISTORY_LENGTH,
+        presence_threshold=PRESENCE_COUNT_THRESHOLD,
+        cwt_model=cwt_model,
+        eemd_model=eemd_model,
+        heatmap=heatmap,
+        max_targets=MAX_TARGETS,
+        num_rx=NUM_RX,
+        rx_positions=RX_POSITIONS,
+        plan=create_dsp_plan(),
+        phase_filter=PHASE_FILTER,
+        verbose=verbose
+    )
+
+
 class RealtimeRadarProcessor:
     """实时雷达数据处理器"""
     
     def __init__(self, server_ip='192.168.10.184', server_port=57345, 
                  load_models=True, cwt_model_path=None, eemd_model_path=None,
-                 api_enabled=True, api_port=8000):
+                 api_enabled=True, api_port=8000, verbose=True, record_dir=None,
+                 record_max_mb=MAX_FILE_MB, record_max_minutes=MAX_FILE_MINUTES, record_compression=None,
+                 history_db=None):
         """
         初始化实时处理器
         
@@ -126,26 +200,49 @@ class RealtimeRadarProcessor:
         eemd_model_path: EEMD预训练模型路径，默认为'trained_models/DeepStateSpace_EEMD_best.keras'
         api_enabled: 是否启用FastAPI接口
         api_port: FastAPI服务器端口
+        verbose: 是否打印每个处理步骤的详细信息
+        record_dir: 录制目录，指定时把接收的每一帧同时写入录制文件（后台线程写入）
+        record_max_mb: 单个录制文件的最大大小（MB），超过后轮换
+        record_max_minutes: 单个录制文件的最长时长（分钟），超过后轮换
+        record_compression: 录制文件压缩方式（zlib/lzma），None表示不压缩
+        history_db: 历史数据SQLite文件路径，None表示只在内存中保存历史
         """
         self.server_ip = server_ip
         self.server_port = server_port
+        self.verbose = verbose
         self.socket = None
+        self.receiver = None
         self.running = False
-        self.data_buffer = []  # 用于保存最近的原始数据
-        self.processing_thread = None
+        self.stopped = False
+        self.data_buffer = FrameRingBuffer(WINDOW_SIZE)  # 最近WINDOW_SIZE帧的解码数据（预分配环形缓冲区）
+        self.window_frames = None           # 每步取出窗口数据的工作数组（帧长度确定后分配，各步骤复用）
+        self.window_total_frames = None     # 上一步取出窗口时缓冲区的累计帧数（用于计算新增帧数）
+        self.frame_filled = FrameRingBuffer(WINDOW_SIZE, 1)  # 与data_buffer对应的补齐标记（1表示插值补齐的帧）
+        self.sequencer = FrameSequencer(self._append_frame, on_resync=self._on_resync)
+        self.scheduler = StepScheduler(WINDOW_SIZE, STEP_SIZE, FRAME_RATE, policy=OVERLOAD_POLICY,
+                                       degradable=DECOMPOSE_SIGNAL and DECOMP_TYPE == 'eemd')
+        self._arrival_time = None           # 当前正在处理的数据报的到达时间（秒）
+        self.recorder = None
+        if record_dir:
+            self.recorder = RecordingTee(record_dir, max_file_mb=record_max_mb,
+                                         max_file_minutes=record_max_minutes, compression=record_compression,
+                                         metadata={'source': f"{server_ip}:{server_port}"})
+        self._loop = None                   # 接收、API、状态报告和推送共用的事件循环
+        self._step_event = None             # 调度器认为可以处理下一步时置位
+        self._executor = None               # 执行处理步骤的单线程执行器（CPU密集部分不占用事件循环）
+        self._api_server = None
+        self.history = VitalHistory(history_db, step_seconds=STEP_SIZE_SECONDS)  # 心率/呼吸/距离/存在状态历史（/history 查询）
         
-        # 初始化存在检测器
-        self.presence_detector = RadarPresenceDetector(
-            history_length=PRESENCE_HISTORY_LENGTH, 
-            count_threshold=PRESENCE_COUNT_THRESHOLD
+        # 距离-时间热力图缓冲区（保存处理流程中已计算的逐帧距离剖面）
+        self.range_heatmap = RangeProfileRing(
+            capacity=int(HEATMAP_HISTORY_SECONDS * FRAME_RATE),
+            num_range_bins=HEATMAP_RANGE_BINS
         )
-        self.presence_detected = False
-        self.presence_stable = False
         
         # API服务器设置
+        self.broadcaster = ResultBroadcaster()  # /ws 推送（没有订阅者时不做任何工作）
         self.api_enabled = api_enabled
         self.api_port = api_port
-        self.api_thread = None
         self.app = None
         
         # 统计数据
@@ -157,15 +254,9 @@ class RealtimeRadarProcessor:
         self.processing_count = 0
         self.start_time = time.time()       # 程序启动时间
         self.last_status_time = time.time() # 上次状态报告时间
-        self.frames_since_last_process = 0  # 自上次处理后累积的帧数 - 添加为类属性
         
-        # 结果存储
-        self.phase_values = None            # 最近一次处理的相位值
-        self.target_bin = None              # 最近一次处理的目标bin
-        self.cwt_results = None             # 最近一次CWT分析结果
-        self.eemd_results = None            # 最近一次EEMD分析结果
-        self.model_prediction = None        # 最近一次模型预测结果
-        self.heart_rate = None              # 最近一次心率预测值
+        # 结果存储：最近一次结果的不可变快照，每步整体替换（API读取时不加锁）
+        self.snapshot = ResultSnapshot()
         
         # 模型加载
         self.cwt_model = None
@@ -174,42 +265,59 @@ class RealtimeRadarProcessor:
         
         # 如果启用模型推理，尝试加载当前分解方法对应的模型
         if load_models:
-            try:
-                if 'keras' in globals():
-                    # 设置默认模型路径
-                    if cwt_model_path is None:
-                        cwt_model_path = os.path.join('trained_models', 'DeepStateSpace_CWT_best.keras')
-                    if eemd_model_path is None:
-                        eemd_model_path = os.path.join('trained_models', 'DeepStateSpace_EEMD_best.keras')
-                    
-                    # 根据当前分解方法加载对应模型
-                    if DECOMP_TYPE == "cwt":
-                        if os.path.exists(cwt_model_path):
-                            print(f"加载CWT模型: {cwt_model_path}")
-                            self.cwt_model = keras.models.load_model(cwt_model_path)
-                            print(f"CWT模型加载成功: {self.cwt_model.name}")
-                        else:
-                            print(f"警告: CWT模型文件不存在 - {cwt_model_path}")
-                    elif DECOMP_TYPE == "eemd":
-                        if os.path.exists(eemd_model_path):
-                            print(f"加载EEMD模型: {eemd_model_path}")
-                            self.eemd_model = keras.models.load_model(eemd_model_path)
-                            print(f"EEMD模型加载成功: {self.eemd_model.name}")
-                        else:
-                            print(f"警告: EEMD模型文件不存在 - {eemd_model_path}")
-                else:
-                    print("警告：TensorFlow/Keras未导入，无法加载模型")
-                    self.enable_model_inference = False
-            except Exception as e:
-                print(f"加载模型时出错: {e}")
-                self.enable_model_inference = False
-                import traceback
-                traceback.print_exc()
+            self.cwt_model, self.eemd_model, self.enable_model_inference = load_vital_models(
+                DECOMP_TYPE, cwt_model_path, eemd_model_path)
+        
+        # 创建信号处理流水线（持有存在检测器状态，新增帧的距离剖面写入热力图）
+        self.pipeline = create_pipeline(self.cwt_model, self.eemd_model, heatmap=self.range_heatmap, verbose=verbose)
+        self.pipeline.enable_model_inference = self.enable_model_inference
+        self.presence_detector = self.pipeline.presence_detector
+        
+        # 延迟直方图和计数器（/metrics）
+        self._init_metrics()
         
         # 如果启用API，初始化FastAPI应用
         if self.api_enabled:
             self._init_api()
     
+    def _init_metrics(self):
+        """注册处理延迟直方图和计数器；已有统计对象中的计数在输出时读取"""
+        metrics = self.metrics = MetricsRegistry(prefix='radar_')
+        self.decode_histogram = metrics.histogram(
+            'frame_decode_seconds', '单帧解码、排序并写入缓冲区的用时', DECODE_BUCKETS)
+        self.stage_histograms = {stage: metrics.histogram(
+            'stage_seconds', '处理步骤各阶段用时', labels={'stage': stage}) for stage in STAGES}
+        self.step_histogram = metrics.histogram('step_seconds', '处理步骤总用时')
+        self.latency_histogram = metrics.histogram(
+            'result_latency_seconds', '窗口最新帧到达到结果发布的延迟', LATENCY_BUCKETS)
+        self.step_counter = metrics.counter('steps_total', '已完成的处理步骤数')
+        self.error_counter = metrics.counter('step_errors_total', '出错的处理步骤数')
+        
+        def receiver_stat(key):
+            return lambda: self.receiver.get_stats()[key] if self.receiver else None
+        
+        metrics.counter_func('frames_received_total', '接收的帧数', lambda: self.total_frames_received)
+        metrics.counter_func('frames_lost_total', '按帧号检测到的丢帧数', lambda: self.sequencer.lost)
+        metrics.counter_func('frames_interpolated_total', '插值补齐的帧数', lambda: self.sequencer.interpolated)
+        metrics.counter_func('frames_late_total', '迟到或重复而丢弃的帧数',
+                             lambda: self.sequencer.late + self.sequencer.duplicates)
+        metrics.counter_func('kernel_drops_total', '内核接收缓冲区满时丢弃的数据报数', receiver_stat('kernel_drops'))
+        metrics.counter_func('frame_handler_errors_total', '帧处理回调出错次数', receiver_stat('handler_errors'))
+        metrics.counter_func('skipped_steps_total', '因处理积压被跳过的步骤数', lambda: self.scheduler.skipped_steps)
+        metrics.counter_func('overload_events_total', '处理过载次数', lambda: self.scheduler.overload_events)
+        metrics.counter_func('recording_dropped_total', '录制队列满或写入失败时丢弃的帧数',
+                             lambda: self.recorder.dropped if self.recorder else None)
+        metrics.counter_func('websocket_coalesced_total', '被更新结果覆盖、未推送的结果消息数',
+                             lambda: self.broadcaster.coalesced)
+        metrics.gauge_func('websocket_subscribers', '当前WebSocket订阅者数', lambda: self.broadcaster.subscriber_count)
+        metrics.gauge_func('presence', '是否稳定检测到人体', lambda: self.snapshot.presence_stable)
+        metrics.gauge_func('heart_rate_bpm', '最近一次心率', lambda: self.snapshot.heart_rate)
+        metrics.gauge_func('targets', '最近一次结果中的目标数', lambda: len(self.snapshot.targets))
+        metrics.gauge_func('respiration_rate_bpm', '最近一次呼吸频率（次/分钟）',
+                           lambda: self.snapshot.respiration_rate)
+        metrics.gauge_func('result_age_seconds', '距离最近一次结果的时间',
+                           lambda: self.scheduler.staleness()['result_age'])
+    
     def _init_api(self):
         """初始化FastAPI应用"""
         self.app = FastAPI(title="雷达心率监测API", 
@@ -231,28 +339,33 @@ class RealtimeRadarProcessor:
             return {"message": "雷达心率监测API服务正在运行"}
         
         @self.app.get("/heartrate")
-        async def get_heart_rate():
+        async def get_heart_rate(request: Request):
             """获取最新的心率值"""
-            if self.heart_rate is not None:
-                return {"heart_rate": float(self.heart_rate), 
-                        "timestamp": time.time(),
-                        "status": "ok"}
-            else:
-                return {"heart_rate": None, 
-                        "timestamp": time.time(),
-                        "status": "no_data"}
+            snapshot = self.snapshot
+            return not_modified(request, snapshot) or snapshot_response({
+                "heart_rate": snapshot.heart_rate,
+                "seq": snapshot.seq,
+                "timestamp": time.time(),
+                **self.scheduler.staleness(),
+                "status": "ok" if snapshot.heart_rate is not None else "no_data"
+            }, snapshot)
         
         @self.app.get("/target")
-        async def get_target_data():
-            """同时获取目标距离和心率数据"""
-            target_distance = self.target_bin * RANGE_RESOLUTION if self.target_bin is not None else None
-            return {
-                "heart_rate": float(self.heart_rate) if self.heart_rate is not None else None,
-                "target_distance": float(target_distance) if target_distance is not None else None,
-                "target_bin": int(self.target_bin) if self.target_bin is not None else None,
+        async def get_target_data(request: Request):
+            """同时获取目标距离、方位角、心率和呼吸频率数据（targets为各目标的结果，id跨步骤不变）"""
+            snapshot = self.snapshot
+            return not_modified(request, snapshot) or snapshot_response({
+                "heart_rate": snapshot.heart_rate,
+                "respiration_rate": snapshot.respiration_rate,
+                "target_distance": snapshot.target_distance,
+                "target_bin": snapshot.target_bin,
+                "target_angle": snapshot.target_angle,
+                "targets": snapshot.target_list(),
+                "seq": snapshot.seq,
                 "timestamp": time.time(),
-                "status": "ok" if (self.heart_rate is not None or target_distance is not None) else "no_data"
-            }
+                **self.scheduler.staleness(),
+                "status": "ok" if snapshot.has_data else "no_data"
+            }, snapshot)
         
         @self.app.get("/status")
         async def get_status():
@@ -263,22 +376,103 @@ class RealtimeRadarProcessor:
                 "processed_frames": self.processing_count,
                 "uptime": time.time() - self.start_time,
                 "last_frame": self.last_frame_number,
+                "receiver": self.receiver.get_stats() if self.receiver else None,
+                "sequence": self.sequencer.get_stats(),
+                "scheduler": self.scheduler.get_stats(),
+                "recording": self.recorder.get_stats() if self.recorder else None,
+                "websocket": self.broadcaster.get_stats(),
+                "history": self.history.get_stats(),
+                **self.scheduler.staleness(),
                 "timestamp": time.time()
             }
         
+        @self.app.get("/metrics")
+        async def get_metrics():
+            """Prometheus文本格式的延迟直方图和计数器"""
+            return Response(content=self.metrics.render(), media_type=METRICS_CONTENT_TYPE)
+        
+        @self.app.websocket("/ws")
+        async def websocket_stream(websocket: WebSocket):
+            """推送每一步的处理结果和存在状态变化（慢的客户端只收到最新结果）"""
+            await self.broadcaster.serve(websocket, initial=self._result_message())
+        
+        # 普通函数：FastAPI在线程池中执行，SQLite写入和查询不会阻塞接收数据的事件循环
+        @self.app.get("/history")
+        def get_history(start: Optional[float] = None, end: Optional[float] = None,
+                        resolution: str = "auto", limit: int = MAX_POINTS):
+            """查询历史（时间为Unix秒，默认最近一小时；长时间范围从分钟/小时聚合中读取）"""
+            end = time.time() if end is None else end
+            start = end - 3600 if start is None else start
+            if end <= start or limit <= 0:
+                raise HTTPException(status_code=400, detail="需要 start < end 且 limit > 0")
+            try:
+                resolution, points = self.history.query(start, end, resolution, min(limit, MAX_POINTS))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return {"start": start, "end": end, "resolution": resolution,
+                    "period": RESOLUTIONS[resolution], "count": len(points), "points": points}
+        
         @self.app.get("/detailed")
-        async def get_detailed_data():
+        async def get_detailed_data(request: Request):
             """获取详细的处理结果数据"""
-            results = self.get_latest_results()
+            snapshot = self.snapshot
+            response = not_modified(request, snapshot)
+            if response is not None:
+                return response
+            results = self.get_latest_results(snapshot)
             # 移除大型数据结构以减少响应大小
-            if "cwt_results" in results and results["cwt_results"]:
+            if results["cwt_results"]:
                 results["cwt_results"] = {"available": True}
-            if "eemd_results" in results and results["eemd_results"]:
+            if results["eemd_results"]:
                 results["eemd_results"] = {"available": True}
-            if "phase_values" in results and results["phase_values"] is not None:
+            if results["phase_values"] is not None:
                 # 将numpy数组转换为列表
-                results["phase_values"] = results["phase_values"].tolist() if hasattr(results["phase_values"], "tolist") else results["phase_values"]
-            return results
+                results["phase_values"] = results["phase_values"].tolist()
+            if results["model_prediction"]:
+                # 预测结果数组（每行对应一个目标）转换为列表
+                results["model_prediction"] = {**results["model_prediction"],
+                                               "result": np.asarray(results["model_prediction"]["result"]).tolist()}
+            return snapshot_response(results, snapshot)
+        
+        @self.app.get("/arrays/{name}")
+        async def get_array(name: str, request: Request, dtype: Optional[str] = None, format: str = "raw"):
+            """获取最近一次结果的数组（phase、breathing_phase、heart_phase、cwt_power、cwt_freqs、imfs，多接收天线时还有range_angle、angles），二进制小端数组或.npy"""
+            snapshot = self.snapshot
+            if name not in snapshot.arrays:
+                raise HTTPException(status_code=404, detail=f"没有可用的数组: {name}")
+            response = not_modified(request, snapshot)
+            if response is not None:
+                return response
+            try:
+                return array_response(snapshot.arrays[name], dtype=dtype, fmt=format, headers={
+                    'ETag': snapshot.etag,
+                    'X-Result-Seq': snapshot.seq,
+                    'X-Data-Time': snapshot.data_time,
+                    'X-Frame-Rate': FRAME_RATE,
+                })
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        @self.app.get("/heatmap")
+        async def get_heatmap(seconds: float = HEATMAP_HISTORY_SECONDS, time_bins: int = 100,
+                              range_bins: int = 64, max_range: float = 2.0,
+                              scale: str = "db", dtype: str = "float16"):
+            """获取距离-时间热力图（二进制小端数组，形状(time_bins, range_bins)，时间从旧到新）"""
+            if time_bins <= 0 or range_bins <= 0 or seconds <= 0 or max_range <= 0:
+                raise HTTPException(status_code=400, detail="参数必须为正数")
+            num_frames = int(seconds * FRAME_RATE)
+            num_bins = max(1, min(HEATMAP_RANGE_BINS, int(max_range / RANGE_RESOLUTION) + 1))
+            profiles = self.range_heatmap.latest(num_frames)[:, :num_bins]
+            try:
+                heatmap = downsample_heatmap(profiles, time_bins, range_bins, scale=scale)
+                return array_response(heatmap, dtype=dtype, headers={
+                    'X-Frame-Count': profiles.shape[0],
+                    'X-Frame-Rate': FRAME_RATE,
+                    'X-Range-Max': num_bins * RANGE_RESOLUTION,
+                    'X-Scale': scale,
+                })
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
         print(f"API服务初始化完成，等待启动在端口 {self.api_port}")
 
@@ -321,6 +515,15 @@ class RealtimeRadarProcessor:
         if eemd_max_imf is not None:
             EEMD_MAX_IMF = eemd_max_imf
         
+        # 同步到处理流水线
+        self.pipeline.decompose = DECOMPOSE_SIGNAL
+        self.pipeline.decomp_type = DECOMP_TYPE
+        self.pipeline.cwt_scales = CWT_SCALES
+        self.pipeline.cwt_wavelet = CWT_WAVELET
+        self.pipeline.eemd_noise_width = EEMD_NOISE_WIDTH
+        self.pipeline.eemd_ensemble_size = EEMD_ENSEMBLE_SIZE
+        self.pipeline.eemd_max_imf = EEMD_MAX_IMF
+        
         print(f"信号分解参数更新: 启用={DECOMPOSE_SIGNAL}, 类型={DECOMP_TYPE}")
         if DECOMP_TYPE == "cwt":
             print(f"CWT参数: 波形={CWT_WAVELET}, 尺度={CWT_SCALES[-1]}")
@@ -332,353 +535,337 @@ class RealtimeRadarProcessor:
         self.running = True
         self.start_time = time.time()  # 重置启动时间
         self.last_status_time = time.time()
-        self.frames_since_last_process = 0  # 重置帧计数器
         
-        # 创建UDP套接字
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        
-        # 绑定套接字到本地端口
-        self.socket.bind(("0.0.0.0", self.server_port))
-        
-        # 启动处理线程
-        self.processing_thread = threading.Thread(target=self._process_data)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
-        
-        # 启动状态报告线程
-        self.status_thread = threading.Thread(target=self._report_status)
-        self.status_thread.daemon = True
-        self.status_thread.start()
-        
-        # 如果启用API，启动API服务器
-        if self.api_enabled and self.app:
-            self.api_thread = threading.Thread(target=self._run_api_server)
-            self.api_thread.daemon = True
-            self.api_thread.start()
-            print(f"API服务已启动在 http://0.0.0.0:{self.api_port}")
+        # 创建UDP接收器（非阻塞套接字，读入预分配缓冲区）
+        self.receiver = RadarUdpReceiver(self.server_port, self._handle_frame, buffer_size=BUFFER_SIZE)
+        self.socket = self.receiver.open()
+        if self.recorder:
+            self.recorder.start()
+        self.history.start()
         
         print("================================================================================")
         print("实时雷达数据处理器启动")
         print("================================================================================")
         print(f"雷达连接: {self.server_ip}:{self.server_port} | 帧率: {FRAME_RATE}Hz | 样本数: {get_param('num_samples')}")
-        print(f"窗口: {WINDOW_SIZE}帧/{WINDOW_SIZE_SECONDS}秒 | 步长: {STEP_SIZE}帧/{STEP_SIZE_SECONDS}秒")
+        print(f"窗口: {WINDOW_SIZE}帧/{WINDOW_SIZE_SECONDS}秒 | 步长: {STEP_SIZE}帧/{STEP_SIZE_SECONDS}秒 | 过载策略: {self.scheduler.policy}")
         print(f"波长: {WAVELENGTH*1000:.2f}mm | 分辨率: {RANGE_RESOLUTION*100:.1f}cm")
         
         # 启动雷达数据传输
         print("启动雷达数据传输...")
         # self.socket.sendto('{"radar_transmission":"enable"}'.encode(), (self.server_ip, self.server_port))
         
-        # 开始接收数据
+        # 接收、API、状态报告和结果推送都在主线程的事件循环中运行，直到stop()被调用
         try:
-                while self.running:
-                    # 接收一帧数据
-                    data, adr = self.socket.recvfrom(BUFFER_SIZE)
-                    
-                    # 获取帧号
-                    frame_number = int.from_bytes(data[2:6], 'little')
-                    
-                    # 打印帧号（每30帧打印一次，即约每秒打印一次）
-                    if self.total_frames_received % 30 == 0:
-                    # 简化帧信息输出
-                        print(f"帧接收: #{frame_number} | 总帧数: {self.total_frames_received+1} | 样本数: {len(data[6:]) // 2}")
-                    
-                    # 更新统计信息
-                    self.total_frames_received += 1
-                    self.period_frames_received += 1
-                    self.last_frame_number = frame_number
-                    self.frames_since_last_process += 1  # 使用类属性记录新帧
-                    
-                    # 将数据添加到缓冲区
-                    self.data_buffer.append(data)
-                    
-                    # 限制缓冲区大小
-                    if len(self.data_buffer) > WINDOW_SIZE:
-                        self.data_buffer.pop(0)
-                    
+            asyncio.run(self._serve())
         except KeyboardInterrupt:
             print("用户中断，正在关闭...")
         finally:
             self.stop()
     
+    async def _serve(self):
+        """事件循环主协程：任一主要任务（接收器、API服务器）结束时停止其余任务"""
+        self._loop = asyncio.get_running_loop()
+        self._step_event = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="radar-step")
+        # 接收器回调在事件循环中调用frame_arrived，步长帧数到齐时直接置位事件
+        self.scheduler.on_due = self._step_event.set
+        
+        tasks = [asyncio.ensure_future(self.receiver.serve())]
+        if self.api_enabled and self.app:
+            config = uvicorn.Config(self.app, host="0.0.0.0", port=self.api_port, log_level="info")
+            self._api_server = uvicorn.Server(config)
+            tasks.append(asyncio.ensure_future(self._api_server.serve()))
+            print(f"API服务已启动在 http://0.0.0.0:{self.api_port}")
+        workers = [asyncio.ensure_future(self._process_steps()),
+                   asyncio.ensure_future(self._poll_sequencer()),
+                   asyncio.ensure_future(self._report_status())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    print(f"服务任务异常退出: {task.exception()}")
+        finally:
+            self.running = False
+            self.scheduler.on_due = None
+            self.receiver.stop()
+            if self._api_server is not None:
+                self._api_server.should_exit = True
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*tasks, *workers, return_exceptions=True)
+            # 等待正在执行的处理步骤完成
+            self._executor.shutdown(wait=True)
+            self._loop = None
+    
+    def _handle_frame(self, payload, addr, arrival_ns):
+        """
+        处理一帧UDP数据（由接收器在事件循环中调用）
+        
+        参数:
+            payload: 数据报内容的memoryview（仅在回调期间有效）
+            addr: 发送方地址
+            arrival_ns: 到达时间（纳秒时间戳）
+        """
+        decode_start = time.perf_counter_ns()
+        # 获取帧号
+        frame_number = int.from_bytes(payload[2:6], 'little')
+        
+        # 更新统计信息
+        self.total_frames_received += 1
+        self.period_frames_received += 1
+        
+        # 录制分流：拷贝进记录环后立即返回，由后台线程写入文件
+        if self.recorder:
+            self.recorder.submit(payload, arrival_ns)
+        
+        # 按帧号排序、补齐缺口后写入缓冲区
+        samples = np.frombuffer(payload, dtype='<f2', offset=6)
+        self._arrival_time = arrival_ns / 1e9
+        self.sequencer.push(frame_number, samples, self._arrival_time)
+        self.decode_histogram.observe((time.perf_counter_ns() - decode_start) * 1e-9)
+    
+    def _append_frame(self, frame_number, samples, filled):
+        """帧序号跟踪器按序输出的帧：解码后拷贝到环形缓冲区"""
+        self.data_buffer.append(samples, frame_number)
+        self.frame_filled.append((1.0 if filled else 0.0,))
+        self.last_frame_number = frame_number
+        # 通知调度器，累积满步长时唤醒处理线程
+        self.scheduler.frame_arrived(len(self.data_buffer), self._arrival_time)
+    
+    def _on_resync(self):
+        """帧号大幅跳变时清空缓冲区，重新累积完整窗口"""
+        print("帧号跳变，重新同步并清空缓冲区")
+        self.data_buffer.clear()
+        self.frame_filled.clear()
+        self.scheduler.reset()
+    
     def _run_api_server(self):
-        """在单独的线程中运行FastAPI服务器"""
+        """在单独的线程中运行FastAPI服务器（回放时使用，实时处理时API服务器运行在主事件循环中）"""
         try:
             uvicorn.run(self.app, host="0.0.0.0", port=self.api_port, log_level="info")
         except Exception as e:
             print(f"API服务器启动失败: {e}")
     
-    def _report_status(self):
-        """状态报告线程"""
+    async def _poll_sequencer(self):
+        """乱序超时检查协程：数据流中断时按超时输出重排缓存中的帧（到达时间为time.time()时钟）"""
         while self.running:
-            # 每5秒打印一次详细状态信息
-            time.sleep(5)
-            
-            # 计算数据率
-            current_time = time.time()
-            period_elapsed = current_time - self.last_status_time
-            total_elapsed = current_time - self.start_time
-            
-            # 计算周期内的帧率
-            period_frames_per_second = self.period_frames_received / period_elapsed if period_elapsed > 0 else 0
-            
-            # 计算总体平均帧率
-            total_frames_per_second = self.total_frames_received / total_elapsed if total_elapsed > 0 else 0
-            
-            # 计算处理率
-            period_processing_per_second = self.period_frames_processed / period_elapsed if period_elapsed > 0 else 0
-            total_processing_per_second = self.processing_count / total_elapsed if total_elapsed > 0 else 0
-            
-            # 打印状态 - 精简版
-            print("\n--- 状态报告 ---")
-            print(f"运行: {total_elapsed:.1f}秒 | 帧率: {period_frames_per_second:.1f}/s (累计: {total_frames_per_second:.1f}/s)")
-            print(f"处理: {self.processing_count}次 | 最近帧: #{self.last_frame_number} | 进度: {self.frames_since_last_process}/{STEP_SIZE}")
-            print(f"缓冲区: {len(self.data_buffer)}/{WINDOW_SIZE}")
-            if hasattr(self, 'target_bin') and self.target_bin is not None:
-                target_distance = self.target_bin * RANGE_RESOLUTION
-                print(f"目标: 距离 {target_distance:.2f}米 (bin{self.target_bin})")
-            print("----------------")
-            
-            # 只重置周期计数器，保留总计数器
-            self.period_frames_received = 0
-            self.period_frames_processed = 0
-            self.last_status_time = current_time
+            await asyncio.sleep(self.sequencer.reorder_timeout)
+            self.sequencer.poll(time.time())
+
+    async def _report_status(self):
+        """状态报告协程：每5秒打印一次详细状态信息"""
+        while self.running:
+            await asyncio.sleep(5)
+            self._print_status()
+    
+    def _print_status(self):
+        """打印状态报告"""
+        # 计算数据率
+        current_time = time.time()
+        period_elapsed = current_time - self.last_status_time
+        total_elapsed = current_time - self.start_time
+        
+        # 计算周期内的帧率
+        period_frames_per_second = self.period_frames_received / period_elapsed if period_elapsed > 0 else 0
+        
+        # 计算总体平均帧率
+        total_frames_per_second = self.total_frames_received / total_elapsed if total_elapsed > 0 else 0
+        
+        # 计算处理率
+        period_processing_per_second = self.period_frames_processed / period_elapsed if period_elapsed > 0 else 0
+        total_processing_per_second = self.processing_count / total_elapsed if total_elapsed > 0 else 0
+        
+        # 打印状态 - 精简版
+        print("\n--- 状态报告 ---")
+        print(f"运行: {total_elapsed:.1f}秒 | 帧率: {period_frames_per_second:.1f}/s (累计: {total_frames_per_second:.1f}/s)")
+        print(f"处理: {self.processing_count}次 | 最近帧: #{self.last_frame_number} | 进度: {self.scheduler.pending_frames}/{STEP_SIZE * self.scheduler.step_multiplier}")
+        print(f"缓冲区: {len(self.data_buffer)}/{WINDOW_SIZE}")
+        seq = self.sequencer.get_stats()
+        print(f"序号: 丢帧率 {seq['loss_rate']*100:.2f}% (丢失 {seq['lost']}, 缺口 {seq['gaps']}) | "
+              f"乱序 {seq['reordered']} | 迟到/重复 {seq['late'] + seq['duplicates']} | 重新同步 {seq['resyncs']}")
+        if self.receiver is not None:
+            rx = self.receiver.get_stats()
+            print(f"接收: 平均批量 {rx['avg_batch']:.1f} (最大 {rx['max_batch']}) | "
+                  f"批处理 {rx['avg_batch_ms']:.2f}ms (最大 {rx['max_batch_ms']:.2f}ms) | "
+                  f"循环延迟 {rx['loop_lag_ms']:.1f}ms | 内核丢包: {rx['kernel_drops']}")
+        sched = self.scheduler.get_stats()
+        print(f"调度: 过载 {sched['overload_events']}次 | 跳过 {sched['skipped_steps']}步 | "
+              f"精度 {sched['fidelity']:.2f} | 步长 x{sched['step_multiplier']} | "
+              f"延迟 {sched['last_lag_ms']:.0f}ms (平均 {sched['avg_lag_ms']:.0f}ms, 最大 {sched['max_lag_ms']:.0f}ms)")
+        if self.recorder is not None:
+            rec = self.recorder.get_stats()
+            print(f"录制: {os.path.basename(rec['current_file'] or '-')} | 已写入 {rec['frames_written']}帧 | "
+                  f"队列 {rec['queue_depth']}/{rec['queue_capacity']} (最大 {rec['max_queue_depth']}) | "
+                  f"丢弃 {rec['dropped']} | 写入错误 {rec['write_errors']}")
+        snapshot = self.snapshot
+        if snapshot.target_bin is not None:
+            print(f"目标: 距离 {snapshot.target_distance:.2f}米 (bin{snapshot.target_bin})")
+        print("----------------")
+        
+        # 只重置周期计数器，保留总计数器
+        self.period_frames_received = 0
+        self.period_frames_processed = 0
+        self.last_status_time = current_time
     
     def stop(self):
-        """停止数据接收和处理"""
+        """停止数据接收和处理（可从其他线程调用，重复调用无效果）"""
+        if self.stopped:
+            return
+        self.stopped = True
         self.running = False
+        self.scheduler.close()
+        
+        if self.receiver:
+            self.receiver.stop()
+        if self._api_server is not None:
+            self._api_server.should_exit = True
         
         if self.socket:
             # 停止雷达数据传输
-            self.socket.sendto('{"radar_transmission":"disable"}'.encode(), (self.server_ip, self.server_port))
-            self.socket.close()
+            try:
+                self.socket.sendto('{"radar_transmission":"disable"}'.encode(), (self.server_ip, self.server_port))
+            except OSError as e:
+                print(f"发送停止命令失败: {e}")
+            self.receiver.close()
             self.socket = None
         
+        if self.recorder and not self.recorder.closed:
+            self.recorder.close()
+            rec = self.recorder.get_stats()
+            print(f"录制已停止: {rec['files']}个文件 | {rec['frames_written']}帧 | 丢弃 {rec['dropped']}")
+        
+        if not self.history.closed:
+            self.history.close()
+        
         print("实时雷达数据处理器已停止")
     
-    def _process_data(self):
-        """数据处理线程"""
+    async def _process_steps(self):
+        """等待调度器唤醒（缓冲区满且累积了足够步长的新帧），在执行器中执行处理步骤"""
         while self.running:
-            # 只有当缓冲区满且累积了足够步长的新帧时才处理
-            if len(self.data_buffer) < WINDOW_SIZE:
-                time.sleep(0.1)
-                continue
+            await self._step_event.wait()
+            self._step_event.clear()
+            # 处理期间到达的帧会再次置位事件，处理完成后立即进入下一步
+            step = self.scheduler.poll_step()
+            if step is not None:
+                await self._loop.run_in_executor(self._executor, self.process_step, step)
+    
+    def process_step(self, step):
+        """
+        执行一个处理步骤并保存结果（在处理执行器中调用，回放时在回放线程中同步调用）
+        
+        参数:
+            step: 调度器返回的步骤信息
+        
+        返回:
+            流水线结果字典，出错时返回None
+        """
+        result = None
+        try:
+            if step['backlogged'] and self.verbose:
+                # 上一步处理太慢，积压的中间窗口直接跳过，只处理最新窗口
+                print(f">> 处理积压 {step['backlog']:.1f}个步长，跳到最新窗口")
             
-            # 检查是否累积了足够的新帧作为滑动步长
-            if self.frames_since_last_process < STEP_SIZE and self.processing_count > 0:
-                time.sleep(0.1)
-                continue
-                
-            try:
-                print(f"\n>> 开始处理: {len(self.data_buffer)}帧 | 累积帧数: {self.frames_since_last_process}")
-                process_start_time = time.time()
-                
-                # 重置计数器
-                self.frames_since_last_process = 0
-                
-                # 解析数据帧
-                frames = []
-                for frame_data in self.data_buffer:
-                    # 跳过前6个字节（包含帧号信息）
-                    radar_data = frame_data[6:]
-                    
-                    # 解析雷达数据为float16实数
-                    # 每个样本是2字节的float16实数
-                    num_samples = len(radar_data) // 2  # 2字节/样本
-                    samples = np.zeros(num_samples, dtype=np.float32)  # 转换为float32处理
-                    
-                    for i in range(num_samples):
-                        # 从字节数据读取float16值并转换为float32
-                        # 注意：np.frombuffer和struct.unpack都可以用，这里用struct以保持代码一致性
-                        sample_bytes = radar_data[i*2:(i+1)*2]
-                        # 使用numpy的方法处理float16数据
-                        samples[i] = np.frombuffer(sample_bytes, dtype=np.float16)[0]
-                    
-                    frames.append(samples)
-                
-                # 将帧数据转换为numpy数组
-                # 假设格式为 [frames, antennas, chirps, samples]
-                # 这里我们假设只有一个天线和一个chirp，具体需要根据实际雷达配置调整
-                num_frames = len(frames)
-                samples_per_frame = len(frames[0])
-                
-                print(f"步骤1: 数据整形 [{num_frames} 帧, {samples_per_frame} 样本/帧]")
-                
-                # 重塑数据格式为 [frames, 1, 1, samples]
-                radar_data_3d = np.zeros((num_frames, 1, 1, samples_per_frame), dtype=complex)
-                for i, frame in enumerate(frames):
-                    # 将实数数据转换为复数格式（实部为数据，虚部为0）
-                    radar_data_3d[i, 0, 0, :] = frame + 0j
-                
-                # 步骤1: 距离FFT
-                print(f">> 处理: FFT -> MTI滤波 -> 提取相位...")
-                range_profile = range_fft(radar_data_3d, window=WINDOW_TYPE)
-                
-                # 步骤2: MTI滤波
-                mti_filtered = mti_filter(range_profile)
-                
-                # 步骤3: 提取2D数据 (只选择第一根天线和第一个chirp)
-                data_2d = mti_filtered[:, 0, 0, :]
-                
-                # 步骤4: 提取相位和目标bin
-                phase_values, target_bin = extract_phase(data_2d, RANGE_RESOLUTION, WAVELENGTH, False)
-                
-                # 保存处理结果到实例变量
-                self.phase_values = phase_values
-                self.target_bin = target_bin
-                
-                # 步骤5: 执行存在检测
-                if ENABLE_PRESENCE_DETECTION:
-                    # 提取最新一帧的数据用于存在检测
-                    latest_frame_data = data_2d[-1:, :]  # 取最后一帧
-                    self.presence_detected, self.presence_stable = self.presence_detector.detect_presence(latest_frame_data)
-                    print(f">> 存在检测: 原始={self.presence_detected}, 稳定={self.presence_stable}")
-                else:
-                    # 如果未启用存在检测，则默认认为有人存在
-                    self.presence_detected = True
-                    self.presence_stable = True
-                
-                # 步骤6: 只有在检测到人存在时才执行信号分解和心率计算
-                if self.presence_stable and DECOMPOSE_SIGNAL:
-                    print(f">> 检测到人体存在，执行信号分解: 类型={DECOMP_TYPE}...")
-                    
-                    # 清空之前的结果
-                    self.cwt_results = None
-                    self.eemd_results = None
-                    self.model_prediction = None  # 清空模型预测结果
-                    self.heart_rate = None  # 清空心率预测
-                    
-                    # 应用CWT (连续小波变换)
-                    if DECOMP_TYPE == "cwt":
-                        try:
-                            cwt_start = time.time()
-                            # 使用提取的相位信号进行CWT分析
-                            cwt_coeffs, cwt_freqs = apply_cwt(
-                                phase_values, 
-                                scales=CWT_SCALES, 
-                                wavelet=CWT_WAVELET, 
-                                sampling_period=1.0/FRAME_RATE
-                            )
-                            cwt_time = time.time() - cwt_start
-                            print(f">> CWT完成: 系数形状 {cwt_coeffs.shape}, 用时: {cwt_time*1000:.0f}ms")
-                            
-                            # 计算CWT能量谱
-                            cwt_power = np.abs(cwt_coeffs)**2
-                            
-                            # 存储CWT结果
-                            self.cwt_results = {
-                                'coeffs': cwt_coeffs,
-                                'freqs': cwt_freqs,
-                                'power': cwt_power
-                            }
-                            
-                            # 如果启用了模型推理，使用CWT模型进行预测
-                            if self.enable_model_inference and self.cwt_model is not None:
-                                try:
-                                    # 准备模型输入数据
-                                    model_input = self.prepare_model_input(cwt_coeffs, "cwt")
-                                    
-                                    # 执行模型推理
-                                    predict_start = time.time()
-                                    prediction = self.cwt_model.predict(model_input, verbose=0)
-                                    predict_time = time.time() - predict_start
-                                    
-                                    # 提取心率预测值 (假设模型输出的第一个值是心率)
-                                    if prediction is not None and len(prediction) > 0:
-                                        # 简单假设：预测值直接是心率
-                                        self.heart_rate = float(prediction[0][0])
-                                    
-                                    # 保存预测结果
-                                    self.model_prediction = {
-                                        'type': 'cwt',
-                                        'result': prediction,
-                                        'time': predict_time,
-                                        'heart_rate': self.heart_rate
-                                    }
-                                    
-                                    print(f">> 模型推理完成: 形状={prediction.shape}, 用时={predict_time*1000:.0f}ms")
-                                    print(f">> 预测心率: {self.heart_rate:.1f} BPM")
-                                except Exception as e:
-                                    print(f"模型推理错误: {e}")
-                            
-                        except Exception as e:
-                            print(f"CWT分析出错: {e}")
-                            self.cwt_results = None
-                    
-                    # 应用EEMD (集合经验模态分解)
-                    elif DECOMP_TYPE == "eemd":
-                        try:
-                            eemd_start = time.time()
-                            # 使用提取的相位信号进行EEMD分析
-                            imfs = apply_eemd(
-                                phase_values, 
-                                noise_width=EEMD_NOISE_WIDTH, 
-                                ensemble_size=EEMD_ENSEMBLE_SIZE, 
-                                max_imf=EEMD_MAX_IMF
-                            )
-                            eemd_time = time.time() - eemd_start
-                            print(f">> EEMD完成: IMF数量 {imfs.shape[0]}, 用时: {eemd_time*1000:.0f}ms")
-                            
-                            # 存储EEMD结果
-                            self.eemd_results = {
-                                'imfs': imfs
-                            }
-                            
-                            # 如果启用了模型推理，使用EEMD模型进行预测
-                            if self.enable_model_inference and self.eemd_model is not None:
-                                try:
-                                    # 准备模型输入数据
-                                    model_input = self.prepare_model_input(imfs, "eemd")
-                                    
-                                    # 执行模型推理
-                                    predict_start = time.time()
-                                    prediction = self.eemd_model.predict(model_input, verbose=0)
-                                    predict_time = time.time() - predict_start
-                                    
-                                    # 提取心率预测值 (假设模型输出的第一个值是心率)
-                                    if prediction is not None and len(prediction) > 0:
-                                        # 简单假设：预测值直接是心率
-                                        self.heart_rate = float(prediction[0][0])
-                                    
-                                    # 保存预测结果
-                                    self.model_prediction = {
-                                        'type': 'eemd',
-                                        'result': prediction,
-                                        'time': predict_time,
-                                        'heart_rate': self.heart_rate
-                                    }
-                                    
-                                    print(f">> 模型推理完成: 形状={prediction.shape}, 用时={predict_time*1000:.0f}ms")
-                                    print(f">> 预测心率: {self.heart_rate:.1f} BPM")
-                                except Exception as e:
-                                    print(f"模型推理错误: {e}")
-                            
-                        except Exception as e:
-                            print(f"EEMD分析出错: {e}")
-                            self.eemd_results = None
-                else:
-                    if not self.presence_stable:
-                        print(">> 未检测到人体存在，跳过信号分解和心率计算")
-                    # 如果未检测到人，清空心率结果
-                    if not self.presence_stable:
-                        self.heart_rate = None
-                        self.model_prediction = None
-                
-                # 更新显示数据
-                target_distance = target_bin * RANGE_RESOLUTION
-                process_end_time = time.time()
-                
-                print(f">> 结果: 目标距离 {target_distance:.2f}米 (bin{target_bin}) | 用时: {(process_end_time - process_start_time)*1000:.0f}ms")
-                if self.presence_stable and self.heart_rate is not None:
-                    print(f">> 心率预测: {self.heart_rate:.1f} BPM")
-                
-                # 更新统计
-                self.processing_count += 1
-                self.period_frames_processed += 1
-                
-            except Exception as e:
-                print(f"处理数据时出错: {e}")
-                import traceback
-                traceback.print_exc()
+            # 取出最近的窗口数据（接收时已解码为float32），拷贝到复用的工作数组中
+            # 多接收天线时每帧为各天线交错的采样点，由流水线按DSP计划拆分
+            frame_size = self.data_buffer.frame_size
+            if self.window_frames is None or self.window_frames.shape[1] != frame_size:
+                self.window_frames = np.empty((WINDOW_SIZE, frame_size), dtype=self.data_buffer.dtype)
+            # 帧号与窗口在同一把锁内读取：处理期间事件循环继续写入新帧，快照的帧号仍对应本窗口
+            frames, total_frames, frame_number = self.data_buffer.latest_window(WINDOW_SIZE, out=self.window_frames)
+            window_loss = float(self.frame_filled.latest(WINDOW_SIZE).mean())
+            # 新增帧数按相邻两次取出窗口时的累计帧数计算（调度器计数时到拷贝窗口之间到达的帧属于本窗口）；
+            # 流水线的相位滤波器按它衔接上一步的状态，第一步为None（整个窗口都是新帧）
+            new_frame_count = (None if self.window_total_frames is None
+                               else total_frames - self.window_total_frames)
+            self.window_total_frames = total_frames
+            if self.verbose:
+                print(f"\n>> 开始处理: {len(frames)}帧 | 新增帧数: {new_frame_count}")
+            
+            # 执行信号处理流水线
+            result = self.pipeline.process(frames, new_frame_count, window_loss, step['fidelity'])
+            
+            # 发布新的结果快照（一次引用赋值，API读取到的要么是旧快照要么是新快照）
+            previous = self.snapshot
+            snapshot = self._make_snapshot(result, step, frame_number)
+            self.snapshot = snapshot
+            self.history.add(snapshot.data_time or snapshot.created,
+                             snapshot.heart_rate if snapshot.presence_stable else None,
+                             snapshot.target_distance, snapshot.presence_stable, snapshot.window_valid,
+                             snapshot.respiration_rate if snapshot.presence_stable else None)
+            
+            if self.verbose:
+                print(f">> 结果: 目标距离 {snapshot.target_distance:.2f}米 (bin{snapshot.target_bin}) | 用时: {result['processing_time']*1000:.0f}ms")
+                if snapshot.presence_stable and snapshot.heart_rate is not None:
+                    print(f">> 心率预测: {snapshot.heart_rate:.1f} BPM")
+                if snapshot.presence_stable and snapshot.respiration_rate is not None:
+                    print(f">> 呼吸频率: {snapshot.respiration_rate:.1f} 次/分钟")
+            
+            # 更新统计
+            self.processing_count += 1
+            self.period_frames_processed += 1
+            stage_histograms = self.stage_histograms
+            for stage, seconds in result['stage_times'].items():
+                if seconds:     # 未执行的阶段（例如未检测到人体时的信号分解）不计入
+                    stage_histograms[stage].observe(seconds)
+            self.step_histogram.observe(result['processing_time'])
+            self.step_counter.inc()
+            
+            # 推送给WebSocket订阅者（存在状态变化作为不合并的事件单独发送）
+            if snapshot.presence_stable != previous.presence_stable:
+                self.broadcaster.publish({
+                    'type': 'presence',
+                    'seq': snapshot.seq,
+                    'presence_stable': snapshot.presence_stable,
+                    'previous': previous.presence_stable,
+                    'data_time': snapshot.data_time,
+                    'timestamp': time.time(),
+                }, event=True)
+            self.broadcaster.publish(self._result_message(snapshot))
+            
+        except Exception as e:
+            self.error_counter.inc()
+            print(f"处理数据时出错: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            self.scheduler.step_finished(step)
+            if result is not None and step.get('data_time') is not None:
+                self.latency_histogram.observe(self.scheduler.last_lag)
+        return result
+    
+    def _make_snapshot(self, result, step, frame_number):
+        """由流水线结果创建新的结果快照（序号为本步骤完成后的处理次数，frame_number为窗口中最新帧的帧号）"""
+        data_time = step.get('data_time')
+        return ResultSnapshot(
+            seq=self.processing_count + 1,
+            frame_number=int(frame_number) if frame_number is not None else None,
+            window_start=data_time - (WINDOW_SIZE - 1) / FRAME_RATE if data_time is not None else None,
+            window_end=data_time,
+            data_time=data_time,
+            heart_rate=result['heart_rate'],
+            respiration_rate=result['respiration_rate'],
+            target_bin=result['target_bin'],
+            target_distance=result['target_distance'],
+            target_angle=result['target_angle'],
+            presence_detected=result['presence_detected'],
+            presence_stable=result['presence_stable'],
+            window_loss=result['window_loss'],
+            window_valid=result['window_valid'],
+            targets=result['targets'],
+            phase_values=result['phase_values'],
+            cwt_results=result['cwt_results'],
+            eemd_results=result['eemd_results'],
+            model_prediction=result['model_prediction'],
+            range_angle=result.get('range_angle'),
+            angles=result.get('angles'),
+            breathing_phase=result['breathing_phases'][0],
+            heart_phase=result['heart_phases'][0],
+        )
+    
+    def _result_message(self, snapshot=None):
+        """/ws 推送的结果消息"""
+        snapshot = snapshot or self.snapshot
+        return {'type': 'result', **snapshot.scalars(), 'targets': snapshot.target_list(), 'timestamp': time.time()}
     
     def prepare_model_input(self, data, data_type):
         """
@@ -691,41 +878,58 @@ class RealtimeRadarProcessor:
         返回:
             适合模型输入的numpy数组
         """
-        if data_type == "cwt":
-            # CWT系数通常形状为 (scales, signal_length) 即 (64, 300)
-            # 模型期望的输入形状为 (batch_size, signal_length, scales) 即 (None, 300, 64)
-            # 需要转置并添加batch维度
-            model_input = np.transpose(data)  # 转置后变为(300, 64)
-            model_input = np.expand_dims(model_input, axis=0)  # 添加batch维度，变为(1, 300, 64)
-            print(f"准备CWT模型输入: 形状={model_input.shape}")
-            return model_input
-        
-        elif data_type == "eemd":
-            # EEMD IMFs通常形状为 (n_imfs, signal_length)
-            # 假设模型期望的输入形状为 (batch_size, signal_length, n_imfs)
-            model_input = np.transpose(data)  # 转置后变为(signal_length, n_imfs)
-            model_input = np.expand_dims(model_input, axis=0)  # 添加batch维度
-            print(f"准备EEMD模型输入: 形状={model_input.shape}")
-            return model_input
-        
-        else:
-            raise ValueError(f"不支持的数据类型: {data_type}")
+        return prepare_model_input(data, data_type, verbose=True)
 
     # 获取处理结果的方法
-    def get_latest_results(self):
-        """获取最新的处理结果"""
+    def get_latest_results(self, snapshot=None):
+        """
+        获取最新的处理结果
+        
+        参数:
+            snapshot: 要读取的结果快照，默认为当前快照
+        """
+        snapshot = snapshot or self.snapshot
         results = {
-            'phase_values': self.phase_values,
-            'target_bin': self.target_bin,
-            'target_distance': self.target_bin * RANGE_RESOLUTION if self.target_bin is not None else None,
-            'cwt_results': self.cwt_results,
-            'eemd_results': self.eemd_results,
-            'model_prediction': self.model_prediction,
-            'heart_rate': self.heart_rate,
-            'processing_count': self.processing_count,
-            'timestamp': time.time()
+            **snapshot.scalars(),
+            'targets': snapshot.target_list(),
+            'phase_values': snapshot.phase_values,
+            'cwt_results': snapshot.cwt_results,
+            'eemd_results': snapshot.eemd_results,
+            'model_prediction': snapshot.model_prediction,
+            'processing_count': snapshot.seq,
+            'timestamp': time.time(),
+            **self.scheduler.staleness()
         }
         return results
+    
+    # 兼容旧代码的只读属性（都读取当前快照）
+    @property
+    def heart_rate(self):
+        return self.snapshot.heart_rate
+    
+    @property
+    def respiration_rate(self):
+        return self.snapshot.respiration_rate
+    
+    @property
+    def target_bin(self):
+        return self.snapshot.target_bin
+    
+    @property
+    def phase_values(self):
+        return self.snapshot.phase_values
+    
+    @property
+    def presence_detected(self):
+        return self.snapshot.presence_detected
+    
+    @property
+    def presence_stable(self):
+        return self.snapshot.presence_stable
+    
+    @property
+    def window_valid(self):
+        return self.snapshot.window_valid
 
 if __name__ == '__main__':
     # 命令行参数处理
@@ -753,6 +957,26 @@ if __name__ == '__main__':
     parser.add_argument('--no-presence', action='store_true', help='禁用存在检测功能')
     parser.add_argument('--presence-history', type=int, default=PRESENCE_HISTORY_LENGTH, help=f'存在检测历史长度，默认：{PRESENCE_HISTORY_LENGTH}')
     parser.add_argument('--presence-threshold', type=int, default=PRESENCE_COUNT_THRESHOLD, help=f'存在检测计数阈值，默认：{PRESENCE_COUNT_THRESHOLD}')
+    # 过载策略参数
+    parser.add_argument('--overload-policy', type=str, choices=OVERLOAD_POLICIES, default=OVERLOAD_POLICY,
+                        help=f'处理跟不上数据速率时的策略，默认：{OVERLOAD_POLICY}')
+    # 录制参数
+    parser.add_argument('--record-dir', type=str, default=None, help='同时录制接收的帧到指定目录')
+    parser.add_argument('--record-max-mb', type=float, default=MAX_FILE_MB, help=f'单个录制文件最大大小（MB），默认：{MAX_FILE_MB}')
+    parser.add_argument('--record-max-minutes', type=float, default=MAX_FILE_MINUTES, help=f'单个录制文件最长时长（分钟），默认：{MAX_FILE_MINUTES}')
+    parser.add_argument('--record-compression', type=str, choices=['zlib', 'lzma'], default=None, help='录制文件压缩方式')
+    parser.add_argument('--no-phase-filter', action='store_true',
+                        help='信号分解使用原始相位而不是心跳频带滤波后的相位（模型用原始相位训练时使用）')
+    # 多目标参数
+    parser.add_argument('--max-targets', type=int, default=MAX_TARGETS,
+                        help=f'每个窗口最多处理的目标数（大于1时启用CFAR多目标检测），默认：{MAX_TARGETS}')
+    # 多接收天线参数
+    parser.add_argument('--rx-antennas', type=int, default=NUM_RX,
+                        help=f'接收天线数（大于1时帧数据为各天线交错的采样点，估计方位角），默认：{NUM_RX}')
+    parser.add_argument('--rx-positions', type=parse_rx_positions, default=None,
+                        help='各接收天线的水平位置（波长，逗号分隔），默认使用BGT60TR13C的布局')
+    # 历史参数
+    parser.add_argument('--history-db', type=str, default=None, help='历史数据SQLite文件路径（默认只保存在内存中）')
     
     args = parser.parse_args()
     
@@ -763,11 +987,22 @@ if __name__ == '__main__':
     EEMD_NOISE_WIDTH = args.eemd_noise
     EEMD_ENSEMBLE_SIZE = args.eemd_ensemble
     EEMD_MAX_IMF = args.eemd_imf
+    PHASE_FILTER = not args.no_phase_filter
     
     # 更新存在检测参数
     ENABLE_PRESENCE_DETECTION = not args.no_presence
     PRESENCE_HISTORY_LENGTH = args.presence_history
     PRESENCE_COUNT_THRESHOLD = args.presence_threshold
+    OVERLOAD_POLICY = args.overload_policy
+    MAX_TARGETS = max(1, args.max_targets)
+    if args.rx_antennas != NUM_RX or args.rx_positions:
+        NUM_RX = max(1, args.rx_antennas)
+        try:
+            RX_POSITIONS = args.rx_positions or default_rx_positions(NUM_RX)
+        except ValueError as e:
+            parser.error(str(e))
+        if len(RX_POSITIONS) != NUM_RX:
+            parser.error(f"--rx-positions 的位置数 {len(RX_POSITIONS)} 与接收天线数 {NUM_RX} 不一致")
     
     # 创建并启动实时处理器
     processor = RealtimeRadarProcessor(
@@ -777,7 +1012,12 @@ if __name__ == '__main__':
         cwt_model_path=args.cwt_model,
         eemd_model_path=args.eemd_model,
         api_enabled=not args.no_api,
-        api_port=args.api_port
+        api_port=args.api_port,
+        record_dir=args.record_dir,
+        record_max_mb=args.record_max_mb,
+        record_max_minutes=args.record_max_minutes,
+        record_compression=args.record_compression,
+        history_db=args.history_db
     )
     
     print(f"信号分解功能: 已启用 (类型: {DECOMP_TYPE})")
@@ -794,6 +1034,11 @@ if __name__ == '__main__':
     else:
         print("存在检测: 未启用")
     
+    if MAX_TARGETS > 1:
+        print(f"多目标模式: 最多 {MAX_TARGETS} 个目标")
+    if NUM_RX > 1:
+        print(f"多接收天线: {NUM_RX} 根天线，估计方位角并相干合并")
+    
     # 打印模型状态
     if processor.enable_model_inference:
         print("模型推理: 已启用")
@@ -816,6 +1061,9 @@ if __name__ == '__main__':
         print(f"  - 心率API: http://localhost:{processor.api_port}/heartrate")
         print(f"  - 目标数据API: http://localhost:{processor.api_port}/target")
         print(f"  - 状态API: http://localhost:{processor.api_port}/status")
+        print(f"  - 热力图API: http://localhost:{processor.api_port}/heatmap")
+        print(f"  - 指标API: http://localhost:{processor.api_port}/metrics")
+        print(f"  - 历史API: http://localhost:{processor.api_port}/history")
     else:
         print("API服务: 未启用")
     
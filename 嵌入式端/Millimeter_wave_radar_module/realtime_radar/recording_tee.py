@@ -0,0 +1,214 @@
+"""
+实时处理器的录制分流
+接收循环把每个数据报拷贝进预分配的记录环（不加锁、不分配内存），
+后台写入线程批量写入录制文件并按大小/时长轮换文件；
+写入跟不上时丢弃新记录并计数，不会阻塞接收循环
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from radar_recording import RecordingWriter, RECORDING_EXTENSION, FRAME_HEADER_SIZE, record_dtype, default_frame_size
+
+QUEUE_FRAMES = 1024             # 记录环容量（约34秒@30Hz）
+WAKE_FRAMES = 32                # 积累多少条记录后唤醒写入线程
+FLUSH_INTERVAL = 1.0            # 写入线程最长等待时间（秒）
+MAX_FILE_MB = 1024              # 单个文件的最大大小（MB）
+MAX_FILE_MINUTES = 60           # 单个文件的最长时长（分钟）
+
+
+class RecordingTee:
+    """
+    单生产者单消费者的录制分流
+
+    submit()只在接收线程中调用，只修改写入序号；写入线程只修改读取序号，
+    两个序号之差即队列深度，超过容量时submit()丢弃记录
+    """
+
+    def __init__(self, directory, prefix='radar_data', params=None, frame_size=None,
+                 queue_frames=QUEUE_FRAMES, max_file_mb=MAX_FILE_MB, max_file_minutes=MAX_FILE_MINUTES,
+                 compression=None, metadata=None):
+        """
+        参数:
+            directory: 录制文件目录（不存在时创建）
+            prefix: 文件名前缀，文件名为 前缀_时间戳.rrec
+            params: 雷达参数字典，默认使用radar_settings中的参数
+            frame_size: 每帧样本数，默认由雷达参数计算
+            queue_frames: 记录环容量
+            max_file_mb: 单个文件超过该大小（MB）时轮换，0表示不限制
+            max_file_minutes: 单个文件超过该时长（分钟）时轮换，0表示不限制
+            compression: 压缩方式（见radar_recording.CODECS），None表示不压缩
+            metadata: 写入每个文件的附加元数据
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.params = params
+        self.frame_size = frame_size or default_frame_size(params)
+        self.max_file_bytes = int(max_file_mb * 1024 * 1024)
+        self.max_file_seconds = max_file_minutes * 60
+        self.compression = compression
+        self.metadata = metadata or {}
+        os.makedirs(directory, exist_ok=True)
+
+        self._ring = np.zeros(queue_frames, dtype=record_dtype(self.frame_size))
+        self._frame_numbers = self._ring['frame_number']
+        self._flags = self._ring['flags']
+        self._arrivals = self._ring['arrival_ns']
+        self._samples = self._ring['samples']
+        self._datagram_size = FRAME_HEADER_SIZE + 2 * self.frame_size
+        self._head = 0              # 已提交的记录数（接收线程写）
+        self._tail = 0              # 已写入文件的记录数（写入线程写）
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.closed = False
+
+        self.writer = None
+        self.current_file = None
+        self.file_started = 0.0
+        self.files = []
+        self.dropped = 0            # 队列满时丢弃的记录数
+        self.malformed = 0          # 长度不符的数据报
+        self.write_errors = 0
+        self.frames_written = 0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self):
+        return self._head - self._tail
+
+    def start(self):
+        """启动后台写入线程"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload, arrival_ns):
+        """
+        提交一个数据报（接收循环中调用，只做一次样本拷贝）
+
+        参数:
+            payload: 数据报内容（bytes或memoryview，调用返回后不再引用）
+            arrival_ns: 到达时间（纳秒时间戳）
+
+        返回:
+            是否已加入队列
+        """
+        if len(payload) != self._datagram_size:
+            self.malformed += 1
+            return False
+        depth = self._head - self._tail
+        if depth >= len(self._ring):
+            self.dropped += 1
+            return False
+
+        slot = self._head % len(self._ring)
+        self._frame_numbers[slot] = int.from_bytes(payload[2:6], 'little')
+        self._flags[slot] = int.from_bytes(payload[0:2], 'little')
+        self._arrivals[slot] = arrival_ns
+        self._samples[slot] = np.frombuffer(payload, dtype='<f2', offset=FRAME_HEADER_SIZE)
+        # 记录写完后再发布
+        self._head += 1
+
+        depth += 1
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        if depth == WAKE_FRAMES:
+            self._wake.set()
+        return True
+
+    # ------------------------------------------------------------------ 写入线程
+
+    def _open_file(self):
+        """打开新的录制文件"""
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        path = os.path.join(self.directory, f"{self.prefix}_{timestamp}{RECORDING_EXTENSION}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{suffix}{RECORDING_EXTENSION}")
+            suffix += 1
+        self.writer = RecordingWriter(path, params=self.params, frame_size=self.frame_size,
+                                      metadata=self.metadata, compression=self.compression)
+        self.current_file = path
+        self.file_started = time.time()
+        self.files.append(path)
+        print(f"开始录制: {path}")
+
+    def _close_file(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except OSError as e:
+                self.write_errors += 1
+                print(f"关闭录制文件失败: {e}")
+            self.writer = None
+
+    def _should_rotate(self):
+        writer = self.writer
+        if self.max_file_bytes and writer.bytes_written >= self.max_file_bytes:
+            return True
+        return bool(self.max_file_seconds) and time.time() - self.file_started >= self.max_file_seconds
+
+    def _drain(self):
+        """把队列中的记录写入文件（按环的连续段批量写入）"""
+        head = self._head
+        capacity = len(self._ring)
+        while self._tail < head:
+            start = self._tail % capacity
+            count = min(head - self._tail, capacity - start)
+            try:
+                if self.writer is None:
+                    self._open_file()
+                self.writer.write_records(self._ring[start:start + count])
+                self.frames_written += count
+                if self._should_rotate():
+                    self._close_file()
+            except OSError as e:
+                # 写入失败（例如磁盘已满）时丢弃这批记录，下一批重新打开文件
+                self.write_errors += 1
+                self.dropped += count
+                print(f"录制写入失败: {e}")
+                self.writer = None
+            self._tail += count
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self._drain()
+            if self.writer is not None and self._should_rotate():
+                self._close_file()
+        self._drain()
+        self._close_file()
+
+    def close(self):
+        """写完队列中剩余的记录并关闭文件"""
+        if self.closed:
+            return
+        self.closed = True
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self._drain()
+            self._close_file()
+
+    def get_stats(self):
+        """录制统计（用于API输出）"""
+        return {
+            'current_file': self.current_file,
+            'files': len(self.files),
+            'frames_written': self.frames_written,
+            'bytes_written': self.writer.bytes_written if self.writer else 0,
+            'queue_depth': self.queue_depth,
+            'queue_capacity': len(self._ring),
+            'max_queue_depth': self.max_queue_depth,
+            'dropped': self.dropped,
+            'malformed': self.malformed,
+            'write_errors': self.write_errors,
+            'compression': self.compression,
+        }
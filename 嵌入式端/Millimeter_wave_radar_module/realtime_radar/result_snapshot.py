@@ -0,0 +1,147 @@
+"""
+不可变的处理结果快照
+处理线程每完成一步创建一个新快照，通过一次引用赋值发布；API处理函数先取快照引用再读取，
+同一个响应中的所有值都来自同一个窗口，读写双方都不需要加锁。
+快照的序号同时作为ETag，重复轮询未变化的结果时返回304
+"""
+
+import time
+
+import numpy as np
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+# 快照中的标量字段（/ws 结果消息和JSON接口使用）
+SCALAR_FIELDS = ('seq', 'frame_number', 'window_start', 'window_end', 'data_time', 'created',
+                 'heart_rate', 'respiration_rate', 'target_bin', 'target_distance', 'target_angle', 'presence_detected',
+                 'presence_stable', 'window_loss', 'window_valid')
+
+
+def _readonly(array):
+    """把数组标记为只读（快照直接引用流水线生成的新数组，不拷贝）"""
+    array = np.asarray(array)
+    array.setflags(write=False)
+    return array
+
+
+def _target_scalars(target):
+    """目标结果字典的副本（numpy标量转换为Python类型，可直接序列化为JSON）"""
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in target.items()}
+
+
+class ResultSnapshot:
+    """
+    一个处理步骤的全部结果
+
+    属性在创建后不能修改，数组标记为只读；发布新结果时创建新对象，而不是修改旧对象
+    """
+
+    __slots__ = SCALAR_FIELDS + ('targets', 'phase_values', 'cwt_results', 'eemd_results', 'model_prediction',
+                                 'arrays', 'etag')
+
+    def __init__(self, seq=0, frame_number=None, window_start=None, window_end=None, data_time=None,
+                 heart_rate=None, respiration_rate=None, target_bin=None, target_distance=None, target_angle=None,
+                 presence_detected=False, presence_stable=False, window_loss=0.0, window_valid=True, targets=None,
+                 phase_values=None, cwt_results=None, eemd_results=None, model_prediction=None, range_angle=None,
+                 angles=None, breathing_phase=None, heart_phase=None):
+        """
+        参数:
+            seq: 结果序号（从1开始，0表示还没有结果）
+            frame_number: 窗口中最新帧的帧号
+            window_start: 窗口中最早帧的到达时间（秒）
+            window_end: 窗口中最新帧的到达时间（秒）
+            data_time: 结果所用数据的时间（与调度器的data_time相同）
+            targets: 各目标的结果字典列表（id、bin、distance、angle、power、respiration_rate、heart_rate等标量）
+            range_angle: 距离-角度功率图（多接收天线时）
+            angles: range_angle各行对应的方位角（度）
+            breathing_phase、heart_phase: 最强目标的呼吸和心跳频带相位
+            其余参数: 流水线结果字典中的同名字段
+        """
+        arrays = {}
+        if phase_values is not None:
+            arrays['phase'] = phase_values = _readonly(phase_values)
+        if breathing_phase is not None:
+            arrays['breathing_phase'] = _readonly(breathing_phase)
+            arrays['heart_phase'] = _readonly(heart_phase)
+        if cwt_results:
+            arrays['cwt_power'] = _readonly(cwt_results['power'])
+            arrays['cwt_freqs'] = _readonly(cwt_results['freqs'])
+        if eemd_results:
+            arrays['imfs'] = _readonly(eemd_results['imfs'])
+        if range_angle is not None:
+            arrays['range_angle'] = _readonly(range_angle)
+            arrays['angles'] = _readonly(angles)
+
+        values = {
+            'seq': seq,
+            'frame_number': frame_number,
+            'window_start': window_start,
+            'window_end': window_end,
+            'data_time': data_time,
+            'created': time.time(),
+            'heart_rate': float(heart_rate) if heart_rate is not None else None,
+            'respiration_rate': float(respiration_rate) if respiration_rate is not None else None,
+            'target_bin': int(target_bin) if target_bin is not None else None,
+            'target_distance': float(target_distance) if target_distance is not None else None,
+            'target_angle': float(target_angle) if target_angle is not None else None,
+            'presence_detected': bool(presence_detected),
+            'presence_stable': bool(presence_stable),
+            'window_loss': float(window_loss),
+            'window_valid': bool(window_valid),
+            'targets': tuple(_target_scalars(target) for target in targets or ()),
+            'phase_values': phase_values,
+            'cwt_results': cwt_results,
+            'eemd_results': eemd_results,
+            'model_prediction': model_prediction,
+            'arrays': arrays,
+            # 响应中还包含请求时计算的字段（timestamp、数据新鲜度），因此使用弱ETag
+            'etag': f'W/"{seq}"',
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("结果快照不可修改，请创建新的快照")
+
+    def __delattr__(self, name):
+        raise AttributeError("结果快照不可修改，请创建新的快照")
+
+    @property
+    def has_data(self):
+        return self.heart_rate is not None or self.target_bin is not None
+
+    def scalars(self):
+        """标量字段字典"""
+        return {name: getattr(self, name) for name in SCALAR_FIELDS}
+
+    def target_list(self):
+        """各目标结果（新的字典列表，调用方可以修改）"""
+        return [dict(target) for target in self.targets]
+
+
+def not_modified(request, snapshot):
+    """
+    If-None-Match与快照的ETag相同时返回304响应，否则返回None
+
+    参数:
+        request: FastAPI Request
+        snapshot: 当前结果快照
+    """
+    tags = request.headers.get('if-none-match')
+    if not tags:
+        return None
+    # 弱比较：忽略W/前缀
+    current = _opaque_tag(snapshot.etag)
+    if tags.strip() == '*' or any(_opaque_tag(tag) == current for tag in tags.split(',')):
+        return Response(status_code=304, headers={'ETag': snapshot.etag})
+    return None
+
+
+def _opaque_tag(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def snapshot_response(content, snapshot):
+    """带快照ETag的JSON响应"""
+    return JSONResponse(content, headers={'ETag': snapshot.etag, 'Cache-Control': 'no-cache'})
@@ -0,0 +1,181 @@
+"""
+处理结果的WebSocket推送
+处理线程每完成一步调用publish()：消息只序列化一次，通过call_soon_threadsafe交给API事件循环，
+再分发给所有订阅者。每个订阅者只保留最新一条结果（慢的订阅者自动合并为最新值），
+存在状态变化等事件消息按顺序保留，积压过多的订阅者被断开。处理线程从不等待网络发送
+"""
+
+import asyncio
+import json
+from collections import deque
+
+import numpy as np
+
+MAX_PENDING_EVENTS = 32         # 每个订阅者最多积压的事件消息数，超过后断开
+SEND_TIMEOUT = 5.0              # 单条消息的发送超时（秒），超时视为订阅者已失去响应
+
+
+def _json_default(value):
+    """numpy类型转换为JSON可序列化的值"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"无法序列化类型 {type(value).__name__}")
+
+
+class Subscriber:
+    """一个WebSocket订阅者的待发送消息"""
+
+    def __init__(self):
+        self.latest = None          # 最新一条结果消息（未发送的旧结果被覆盖）
+        self.events = deque()       # 按顺序发送的事件消息
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.sent = 0
+        self.coalesced = 0
+
+
+class ResultBroadcaster:
+    """
+    结果广播器
+
+    publish()可在任意线程调用；订阅者的增删和消息分发都在API事件循环中进行
+    """
+
+    def __init__(self, max_pending_events=MAX_PENDING_EVENTS, send_timeout=SEND_TIMEOUT):
+        self.max_pending_events = max_pending_events
+        self.send_timeout = send_timeout
+        self._loop = None
+        self._subscribers = set()
+
+        self.published = 0
+        self.coalesced = 0          # 被更新的结果覆盖、没有发送的消息数
+        self.disconnected = 0       # 因积压或发送超时被断开的订阅者数
+        self.total_subscribers = 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, message, event=False):
+        """
+        发布一条消息（处理线程调用，不阻塞）
+
+        参数:
+            message: 消息字典
+            event: True表示事件消息（不会被合并）
+
+        返回:
+            是否已交给事件循环（没有订阅者时不序列化，直接返回False）
+        """
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return False
+        text = json.dumps(message, ensure_ascii=False, default=_json_default)
+        try:
+            loop.call_soon_threadsafe(self._fanout, text, event)
+        except RuntimeError:
+            # 事件循环已关闭
+            return False
+        self.published += 1
+        return True
+
+    def _fanout(self, text, event):
+        """把一条已序列化的消息分发给所有订阅者（事件循环中执行）"""
+        for subscriber in self._subscribers:
+            if subscriber.closed:
+                continue
+            if event:
+                if len(subscriber.events) >= self.max_pending_events:
+                    subscriber.closed = True
+                    self.disconnected += 1
+                else:
+                    subscriber.events.append(text)
+            else:
+                if subscriber.latest is not None:
+                    subscriber.coalesced += 1
+                    self.coalesced += 1
+                subscriber.latest = text
+            subscriber.ready.set()
+
+    def subscribe(self):
+        """添加订阅者（事件循环中调用）"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        self.total_subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def next_message(self, subscriber):
+        """等待订阅者的下一条消息：先发事件，再发最新结果；订阅者被断开时返回None"""
+        while True:
+            if subscriber.closed:
+                return None
+            if subscriber.events:
+                return subscriber.events.popleft()
+            if subscriber.latest is not None:
+                text, subscriber.latest = subscriber.latest, None
+                return text
+            subscriber.ready.clear()
+            await subscriber.ready.wait()
+
+    async def _watch_disconnect(self, websocket, subscriber):
+        """读取客户端消息（忽略内容），连接断开时唤醒发送协程"""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+        except (RuntimeError, OSError):
+            pass
+        finally:
+            subscriber.closed = True
+            subscriber.ready.set()
+
+    async def serve(self, websocket, initial=None):
+        """
+        处理一个WebSocket连接，直到客户端断开或被判定为失去响应
+
+        参数:
+            websocket: FastAPI/Starlette的WebSocket对象
+            initial: 连接建立后先发送的消息字典（例如当前最新结果）
+        """
+        from fastapi import WebSocketDisconnect
+
+        await websocket.accept()
+        subscriber = self.subscribe()
+        watcher = asyncio.ensure_future(self._watch_disconnect(websocket, subscriber))
+        try:
+            if initial is not None:
+                await websocket.send_text(json.dumps(initial, ensure_ascii=False, default=_json_default))
+            while True:
+                text = await self.next_message(subscriber)
+                if text is None:
+                    break
+                await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+                subscriber.sent += 1
+        except asyncio.TimeoutError:
+            self.disconnected += 1
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            pass
+        finally:
+            self.unsubscribe(subscriber)
+            watcher.cancel()
+            try:
+                await websocket.close()
+            except (RuntimeError, OSError):
+                pass
+
+    def get_stats(self):
+        """广播统计（用于API输出）"""
+        return {
+            'subscribers': len(self._subscribers),
+            'total_subscribers': self.total_subscribers,
+            'published': self.published,
+            'coalesced': self.coalesced,
+            'disconnected': self.disconnected,
+        }
@@ -0,0 +1,226 @@
+"""
+共享内存帧环形缓冲区
+接收进程把解码后的帧写入multiprocessing.shared_memory中的环形缓冲区，
+DSP进程直接在共享内存上读取窗口视图，进程之间不需要序列化或拷贝帧数据
+"""
+
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 头部字段（int64数组中的下标）
+HDR_MAGIC = 0
+HDR_CAPACITY = 1
+HDR_FRAME_SIZE = 2
+HDR_WRITE_SEQ = 3           # 累计写入帧数（写完一帧后才递增，读端以此判断帧是否可用）
+HDR_SEGMENT_START = 4       # 当前连续数据段的起始序号（重新同步后之前的帧不再与新帧连续）
+HDR_WRITER_PID = 5
+HDR_HEARTBEAT_NS = 6        # 接收进程最近一次活动时间
+HDR_RECEIVED = 7            # 接收的数据报数
+HDR_LOST = 8                # 丢失（插值补齐）的帧数
+HDR_RESYNCS = 9             # 重新同步次数
+HDR_WRITER_STARTS = 10      # 接收进程启动次数
+HDR_STOP = 11               # 主进程请求所有子进程退出
+HDR_FIELDS = 16
+
+RING_MAGIC = 0x52414452     # 'RADR'
+
+
+class SharedFrameRing:
+    """
+    单写多读的共享内存帧环形缓冲区
+
+    每帧写入两次（位置i和i+capacity），因此任意不超过capacity帧的窗口在内存中都是连续的，
+    读端可以直接得到(frames, frame_size)的视图而不需要拼接。
+    写端先写帧数据再递增写入序号；读端用完视图后调用is_valid()确认期间没有被覆盖
+    """
+
+    def __init__(self, shm, owner):
+        """请使用create()或attach()创建实例"""
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HDR_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if self.header[HDR_MAGIC] != RING_MAGIC:
+            raise ValueError(f"共享内存 {shm.name} 不是帧环形缓冲区")
+        self.capacity = int(self.header[HDR_CAPACITY])
+        self.frame_size = int(self.header[HDR_FRAME_SIZE])
+
+        # 各数组在共享内存中的布局：头部 | 帧数据 | 帧号 | 到达时间 | 补齐标记
+        rows = 2 * self.capacity
+        offset = HDR_FIELDS * 8
+        self.data = np.ndarray((rows, self.frame_size), dtype=np.float32, buffer=shm.buf, offset=offset)
+        offset += self.data.nbytes
+        self.frame_numbers = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.frame_numbers.nbytes
+        self.arrival_ns = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.arrival_ns.nbytes
+        self.filled = np.ndarray((rows,), dtype=np.float32, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def nbytes(capacity, frame_size):
+        """指定容量所需的共享内存字节数"""
+        rows = 2 * capacity
+        return HDR_FIELDS * 8 + rows * frame_size * 4 + rows * (8 + 8 + 4)
+
+    @classmethod
+    def create(cls, capacity, frame_size, name=None):
+        """
+        创建共享内存环形缓冲区（由主进程调用，负责最终的unlink）
+
+        参数:
+            capacity: 保存的帧数，应大于处理窗口并留出DSP处理延迟的余量
+            frame_size: 每帧样本数
+            name: 共享内存名称，None时自动生成
+
+        返回:
+            SharedFrameRing实例
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.nbytes(capacity, frame_size))
+        header = np.ndarray((HDR_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[HDR_CAPACITY] = capacity
+        header[HDR_FRAME_SIZE] = frame_size
+        header[HDR_MAGIC] = RING_MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        连接到已存在的环形缓冲区（接收进程和DSP进程调用）
+
+        参数:
+            name: 共享内存名称
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_seq(self):
+        """累计写入的帧数"""
+        return int(self.header[HDR_WRITE_SEQ])
+
+    @property
+    def segment_start(self):
+        """当前连续数据段的起始序号"""
+        return int(self.header[HDR_SEGMENT_START])
+
+    @property
+    def stop_requested(self):
+        """主进程是否已请求退出"""
+        return bool(self.header[HDR_STOP])
+
+    def request_stop(self):
+        """
+        请求所有连接的进程退出
+
+        使用共享内存标志而不是multiprocessing.Event：被强制结束的进程可能停在Event内部的
+        条件变量上，之后Event.set()会一直阻塞
+        """
+        self.header[HDR_STOP] = 1
+
+    def available(self):
+        """当前连续数据段中可读取的帧数"""
+        return min(self.write_seq - self.segment_start, self.capacity)
+
+    # ------------------------------------------------------------------ 写端
+
+    def writer_started(self):
+        """接收进程（重新）启动：记录进程号，新的接收流与之前的帧不连续"""
+        self.header[HDR_WRITER_PID] = os.getpid()
+        self.header[HDR_WRITER_STARTS] += 1
+        self.header[HDR_HEARTBEAT_NS] = time.time_ns()
+        self.new_segment()
+
+    def new_segment(self):
+        """开始新的连续数据段（帧号跳变或接收进程重启）"""
+        self.header[HDR_SEGMENT_START] = self.header[HDR_WRITE_SEQ]
+
+    def append(self, samples, frame_number, filled=False, arrival_ns=0):
+        """
+        写入一帧（仅允许一个写进程）
+
+        参数:
+            samples: 一维样本数组，长度为frame_size
+            frame_number: 帧号
+            filled: 是否为插值补齐的帧
+            arrival_ns: 到达时间（纳秒时间戳）
+        """
+        seq = int(self.header[HDR_WRITE_SEQ])
+        slot = seq % self.capacity
+        for row in (slot, slot + self.capacity):
+            self.data[row] = samples
+            self.frame_numbers[row] = frame_number
+            self.arrival_ns[row] = arrival_ns
+            self.filled[row] = 1.0 if filled else 0.0
+        # 帧数据写完后再发布序号
+        self.header[HDR_WRITE_SEQ] = seq + 1
+        self.header[HDR_HEARTBEAT_NS] = arrival_ns or time.time_ns()
+
+    def update_counters(self, received, lost, resyncs):
+        """接收进程更新统计计数"""
+        self.header[HDR_RECEIVED] = received
+        self.header[HDR_LOST] = lost
+        self.header[HDR_RESYNCS] = resyncs
+
+    # ------------------------------------------------------------------ 读端
+
+    def _rows(self, end_seq, num_frames):
+        end = end_seq % self.capacity + self.capacity
+        return slice(end - num_frames, end)
+
+    def window(self, end_seq, num_frames):
+        """
+        获取以end_seq结尾的窗口视图（不拷贝）
+
+        参数:
+            end_seq: 窗口最后一帧之后的序号（即窗口结束时的write_seq）
+            num_frames: 窗口帧数，不超过capacity
+
+        返回:
+            (frames, filled, arrival_ns) 三个共享内存上的视图，
+            使用完毕后应调用is_valid()确认数据没有被写端覆盖
+        """
+        if num_frames > self.capacity:
+            raise ValueError(f"窗口帧数 {num_frames} 超过环形缓冲区容量 {self.capacity}")
+        rows = self._rows(end_seq, num_frames)
+        return self.data[rows], self.filled[rows], self.arrival_ns[rows]
+
+    def is_valid(self, end_seq, num_frames):
+        """窗口中的帧是否仍未被覆盖，并且属于同一连续数据段"""
+        start_seq = end_seq - num_frames
+        if start_seq < self.segment_start:
+            return False
+        # 写端正在写的slot也视为已覆盖
+        return self.write_seq + 1 - start_seq <= self.capacity
+
+    def stats(self):
+        """环形缓冲区和接收进程统计（用于API输出）"""
+        heartbeat = int(self.header[HDR_HEARTBEAT_NS])
+        return {
+            'capacity': self.capacity,
+            'frame_size': self.frame_size,
+            'write_seq': self.write_seq,
+            'segment_start': self.segment_start,
+            'writer_pid': int(self.header[HDR_WRITER_PID]),
+            'writer_starts': int(self.header[HDR_WRITER_STARTS]),
+            'heartbeat_age': (time.time_ns() - heartbeat) / 1e9 if heartbeat else None,
+            'received': int(self.header[HDR_RECEIVED]),
+            'lost': int(self.header[HDR_LOST]),
+            'resyncs': int(self.header[HDR_RESYNCS]),
+        }
+
+    def close(self):
+        """释放本进程中的视图并关闭共享内存；创建者同时删除共享内存"""
+        self.header = self.data = self.frame_numbers = self.arrival_ns = self.filled = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -104,3 +104,93 @@ def apply_cwt(signal, scales=None, wavelet='morl', sampling_period=1.0):
     coef, freqs = pywt.cwt(signal, scales, wavelet, sampling_period)
     
     return coef, freqs
+
+
+class CwtFilterBank:
+    """
+    预先计算的连续小波变换(CWT)滤波器组，结果与pywt.cwt相同（误差在浮点舍入范围内）
+
+    构造时对每个尺度计算一次小波积分核（包含pywt.cwt中的 -√scale 系数和差分），
+    按输出对齐循环移位后变换到频域；变换时只需对信号做一次FFT、与滤波器组相乘，
+    再在预先分配的工作数组中原地逆FFT，不随尺度数重复计算核和FFT
+    """
+
+    def __init__(self, scales, wavelet='morl', sampling_period=1.0, signal_length=300, max_signals=1,
+                 precision=12):
+        """
+        参数:
+            scales: 尺度参数
+            wavelet: 小波类型，默认'morl'(Morlet小波)
+            sampling_period: 采样周期（只影响输出的频率）
+            signal_length: 信号长度（点数）
+            max_signals: 一次变换的最大信号数（工作数组的大小，超过时自动扩大）
+            precision: 小波积分的精度（与pywt.cwt的precision相同）
+        """
+        try:
+            import pywt
+            from scipy.fft import next_fast_len
+        except ImportError:
+            raise ImportError("需要安装pywavelets库: pip install PyWavelets")
+
+        self.scales = np.atleast_1d(np.asarray(scales, dtype=float))
+        if np.any(self.scales <= 0):
+            raise ValueError("尺度必须为正数")
+        self.signal_length = signal_length
+        wavelet = pywt.DiscreteContinuousWavelet(wavelet)
+        self.complex_output = bool(wavelet.complex_cwt)
+
+        int_psi, x = pywt.integrate_wavelet(wavelet, precision=precision)
+        int_psi = np.conj(int_psi) if self.complex_output else np.asarray(int_psi)
+        step = x[1] - x[0]
+        kernels = []
+        for scale in self.scales:
+            j = (np.arange(scale * (x[-1] - x[0]) + 1) / (scale * step)).astype(int)
+            kernel = int_psi[j[j < int_psi.size]][::-1]
+            if kernel.size < 2:
+                raise ValueError(f"尺度 {scale} 过小")
+            # 差分和系数合并到核中: coef[n] = conv(signal, kernel)[n + 1 + floor(d)]
+            kernels.append(-np.sqrt(scale) * np.convolve(kernel, [1, -1]))
+
+        # 线性卷积长度不超过FFT长度，循环卷积不会混叠
+        self.fft_size = next_fast_len(signal_length + max(k.size for k in kernels))
+        bank = np.zeros((len(kernels), self.fft_size), dtype=complex)
+        for i, kernel in enumerate(kernels):
+            # 核长为L时pywt.cwt从差分结果的floor((L-3)/2)处截取，循环左移使输出从下标0开始
+            shift = 1 + (kernel.size - 3) // 2
+            bank[i, :kernel.size] = kernel
+            bank[i] = np.roll(bank[i], -shift)
+        self.bank = np.fft.fft(bank, axis=-1)
+        self.frequencies = np.atleast_1d(pywt.scale2frequency(wavelet, self.scales, precision)) / sampling_period
+        self._work = np.empty((max_signals, len(self.scales), self.fft_size), dtype=complex)
+
+    @property
+    def nbytes(self):
+        """滤波器组和工作数组占用的字节数"""
+        return self.bank.nbytes + self._work.nbytes
+
+    def transform(self, signals):
+        """
+        对多个等长信号执行CWT
+
+        参数:
+            signals: 形状为(n_signals, signal_length)的信号数组
+
+        返回:
+            coef: 新的小波系数数组，形状为(n_signals, len(scales), signal_length)
+            frequencies: 对应各尺度的频率
+        """
+        from scipy import fft as scipy_fft
+
+        signals = np.atleast_2d(signals)
+        num_signals, length = signals.shape
+        if length != self.signal_length:
+            raise ValueError(f"信号长度 {length} 与滤波器组的长度 {self.signal_length} 不一致")
+        if num_signals > len(self._work):
+            self._work = np.empty((num_signals,) + self._work.shape[1:], dtype=complex)
+
+        work = self._work[:num_signals]
+        spectrum = np.fft.fft(signals, self.fft_size, axis=-1)
+        np.multiply(spectrum[:, np.newaxis, :], self.bank[np.newaxis, :, :], out=work)
+        work = scipy_fft.ifft(work, axis=-1, overwrite_x=True)
+        coef = work[:, :, :length]
+        return (coef.copy() if self.complex_output else coef.real.copy()), self.frequencies
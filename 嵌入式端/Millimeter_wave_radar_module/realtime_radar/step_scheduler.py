@@ -0,0 +1,261 @@
+"""
+处理步骤调度模块
+位于接收器和信号处理之间：接收端每输出一帧通知调度器，处理端在步长帧数到齐时被唤醒；
+当处理速度跟不上数据速率时按配置的过载策略降级，并统计过载事件和端到端延迟
+"""
+
+import threading
+import time
+
+# 过载策略
+POLICY_SKIP = 'skip'            # 跳到最新窗口，丢弃积压的步骤
+POLICY_DEGRADE = 'degrade'      # 降低信号分解精度（减少EEMD集合次数；CWT使用预先计算的滤波器组，不降级）
+POLICY_THROTTLE = 'throttle'    # 降低处理步频（增大有效步长）
+OVERLOAD_POLICIES = (POLICY_SKIP, POLICY_DEGRADE, POLICY_THROTTLE)
+
+BACKLOG_TOLERANCE = 1.5         # 积压超过该倍数的步长视为过载
+RECOVER_STEPS = 5               # 连续多少个正常步骤后恢复一级
+MIN_FIDELITY = 0.25             # 降级策略的最低精度
+MAX_STEP_MULTIPLIER = 4         # 限速策略的最大步长倍数
+STALE_STEPS = 3                 # 结果超过该倍数的步长周期未更新视为过期
+
+
+class StepScheduler:
+    """
+    处理步骤调度器
+
+    接收端调用frame_arrived()/reset()，处理端调用wait_for_step()（阻塞）或poll_step()（非阻塞）
+    获取一个步骤，处理完成后调用step_finished()。所有方法都是线程安全的。
+    设置on_due回调时，frame_arrived()在步骤到期时（在接收端的线程中）调用它，
+    事件循环中的处理端可以据此等待asyncio事件而不占用线程
+    """
+
+    def __init__(self, window_frames, step_frames, frame_rate, policy=POLICY_SKIP,
+                 recover_steps=RECOVER_STEPS, min_fidelity=MIN_FIDELITY,
+                 max_step_multiplier=MAX_STEP_MULTIPLIER, on_due=None, degradable=True):
+        """
+        初始化调度器
+
+        参数:
+            window_frames: 处理窗口帧数
+            step_frames: 步长帧数
+            frame_rate: 帧率 (Hz)
+            policy: 过载策略 'skip'、'degrade' 或 'throttle'
+            recover_steps: 连续多少个正常步骤后恢复一级
+            min_fidelity: 降级策略的最低精度
+            max_step_multiplier: 限速策略的最大步长倍数
+            on_due: 步骤到期时调用的无参数回调（在调用frame_arrived()的线程中执行）
+            degradable: 降低精度是否有效（只有EEMD分解按精度减少集合次数），
+                        为False时降级策略不降低精度，过载时只跳过积压的窗口
+        """
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"不支持的过载策略: {policy}，仅支持 {', '.join(OVERLOAD_POLICIES)}")
+
+        self.window_frames = window_frames
+        self.step_frames = step_frames
+        self.frame_rate = frame_rate
+        self.policy = policy
+        self.recover_steps = recover_steps
+        self.min_fidelity = min_fidelity
+        self.max_step_multiplier = max_step_multiplier
+        self.on_due = on_due
+        self.degradable = degradable
+        if policy == POLICY_DEGRADE and not degradable:
+            print("当前信号分解类型不支持降低精度，降级策略过载时只跳过积压的窗口")
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self.buffered_frames = 0        # 缓冲区中的帧数
+        self.pending_frames = 0         # 自上次处理以来新增的帧数
+        self.last_arrival_time = None   # 最新一帧的到达时间
+        self.first_step_done = False
+
+        # 当前降级状态
+        self.fidelity = 1.0             # 信号分解精度（1.0为完整精度）
+        self.step_multiplier = 1        # 有效步长倍数
+        self._ok_steps = 0
+
+        # 统计
+        self.steps = 0                  # 已完成的步骤数
+        self.overload_events = 0        # 过载事件数
+        self.skipped_steps = 0          # 因积压被跳过的步骤数
+        self.degraded_steps = 0         # 以降低精度执行的步骤数
+        self.throttled_steps = 0        # 以增大步长执行的步骤数
+        self.last_processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.last_lag = 0.0             # 最近一次端到端延迟（最新帧到达 -> 结果产生）
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_result_time = None    # 最近一次结果产生时间
+        self.last_data_time = None      # 最近一次结果所用数据中最新帧的到达时间
+
+    @property
+    def step_period(self):
+        """当前有效步长对应的时间（秒）"""
+        return self.step_frames * self.step_multiplier / self.frame_rate
+
+    def frame_arrived(self, buffered_frames, arrival_time=None):
+        """
+        接收端通知新的一帧已写入缓冲区
+
+        参数:
+            buffered_frames: 写入后缓冲区中的帧数
+            arrival_time: 该帧的到达时间（秒），默认当前时间
+        """
+        with self._cond:
+            self.buffered_frames = buffered_frames
+            self.pending_frames += 1
+            self.last_arrival_time = arrival_time if arrival_time is not None else time.time()
+            due = self._due()
+            if due:
+                self._cond.notify()
+        on_due = self.on_due
+        if due and on_due is not None:
+            on_due()
+
+    def reset(self):
+        """缓冲区被清空（例如重新同步）"""
+        with self._cond:
+            self.buffered_frames = 0
+            self.pending_frames = 0
+
+    def close(self):
+        """关闭调度器，唤醒所有等待的处理线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _due(self):
+        if self.buffered_frames < self.window_frames:
+            return False
+        if not self.first_step_done:
+            return True
+        return self.pending_frames >= self.step_frames * self.step_multiplier
+
+    def _take_step(self):
+        """取出一个步骤（调用方持有锁）"""
+        new_frames = self.pending_frames
+        self.pending_frames = 0
+        self.first_step_done = True
+
+        # 积压超过容忍范围：之前的步骤没有及时完成，中间的窗口被跳过，直接处理最新窗口
+        backlog = new_frames / (self.step_frames * self.step_multiplier)
+        overloaded = self.steps > 0 and backlog > BACKLOG_TOLERANCE
+        if overloaded:
+            # 超过容忍范围时至少跳过了一个步骤（积压1.5~2倍时int(backlog)-1会记为0）
+            self.skipped_steps += max(1, round(backlog) - 1)
+
+        return {
+            'new_frames': new_frames,
+            'backlog': backlog,
+            'backlogged': overloaded,
+            'data_time': self.last_arrival_time,
+            'fidelity': self.fidelity,
+            'start_time': time.time(),
+        }
+
+    def poll_step(self):
+        """非阻塞地获取一个步骤，未到处理时间时返回None"""
+        with self._cond:
+            if self._closed or not self._due():
+                return None
+            return self._take_step()
+
+    def wait_for_step(self, timeout=None):
+        """
+        阻塞等待下一个步骤
+
+        参数:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        返回:
+            步骤信息字典（new_frames、backlog、data_time、fidelity、start_time），
+            超时或调度器关闭时返回None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._due(), timeout):
+                return None
+            if self._closed:
+                return None
+            return self._take_step()
+
+    def step_finished(self, step):
+        """
+        处理端完成一个步骤后调用，更新延迟统计并按过载策略调整
+
+        参数:
+            step: wait_for_step()/poll_step()返回的步骤信息
+        """
+        now = time.time()
+        with self._cond:
+            processing_time = now - step['start_time']
+            self.steps += 1
+            self.last_processing_time = processing_time
+            self.max_processing_time = max(self.max_processing_time, processing_time)
+            self.last_result_time = now
+            self.last_data_time = step['data_time']
+            if step['data_time'] is not None:
+                self.last_lag = now - step['data_time']
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.total_lag += self.last_lag
+            if step['fidelity'] < 1.0:
+                self.degraded_steps += 1
+            if self.step_multiplier > 1:
+                self.throttled_steps += 1
+
+            overloaded = step['backlogged'] or processing_time > self.step_period
+            if overloaded:
+                self.overload_events += 1
+                self._ok_steps = 0
+                if self.policy == POLICY_DEGRADE and self.degradable and self.fidelity > self.min_fidelity:
+                    self.fidelity = max(self.min_fidelity, self.fidelity / 2)
+                    print(f"处理过载，降低信号分解精度至 {self.fidelity:.2f}")
+                elif self.policy == POLICY_THROTTLE and self.step_multiplier < self.max_step_multiplier:
+                    self.step_multiplier = min(self.max_step_multiplier, self.step_multiplier * 2)
+                    print(f"处理过载，步长增大至 {self.step_multiplier}倍")
+            else:
+                self._ok_steps += 1
+                if self._ok_steps >= self.recover_steps:
+                    self._ok_steps = 0
+                    if self.fidelity < 1.0:
+                        self.fidelity = min(1.0, self.fidelity * 2)
+                    if self.step_multiplier > 1:
+                        self.step_multiplier //= 2
+
+    def staleness(self, now=None):
+        """
+        结果的新鲜度信息（用于API响应）
+
+        返回:
+            result_age: 距离最近一次结果产生的时间（秒）
+            data_age: 结果所用最新帧的到达时间距今（秒）
+            stale: 结果是否已过期（超过STALE_STEPS个步长周期未更新，或尚无结果）
+        """
+        if now is None:
+            now = time.time()
+        result_age = now - self.last_result_time if self.last_result_time is not None else None
+        data_age = now - self.last_data_time if self.last_data_time is not None else None
+        return {
+            'result_age': result_age,
+            'data_age': data_age,
+            'stale': result_age is None or result_age > STALE_STEPS * self.step_period,
+        }
+
+    def get_stats(self):
+        """调度统计字典（用于API输出和告警）"""
+        return {
+            'policy': self.policy,
+            'steps': self.steps,
+            'pending_frames': self.pending_frames,
+            'overload_events': self.overload_events,
+            'skipped_steps': self.skipped_steps,
+            'degraded_steps': self.degraded_steps,
+            'throttled_steps': self.throttled_steps,
+            'fidelity': self.fidelity,
+            'step_multiplier': self.step_multiplier,
+            'last_processing_ms': self.last_processing_time * 1000,
+            'max_processing_ms': self.max_processing_time * 1000,
+            'last_lag_ms': self.last_lag * 1000,
+            'avg_lag_ms': self.total_lag / self.steps * 1000 if self.steps else 0.0,
+            'max_lag_ms': self.max_lag * 1000,
+        }
@@ -0,0 +1,122 @@
+"""
+多目标跟踪
+每个处理步骤检测到的目标按距离（多接收天线时按距离和方位角确定的平面位置）与已有轨迹关联，
+为同一个人在各步骤之间分配不变的ID
+"""
+
+import numpy as np
+
+TRACK_GATE = 0.15           # 关联门限（米）：检测与轨迹的距离差（或平面位置差）超过该值时不关联
+MAX_MISSED_STEPS = 3        # 轨迹连续多少步没有关联到检测后删除
+DISTANCE_SMOOTHING = 0.5    # 轨迹距离的指数平滑系数（新检测的权重）
+
+
+class Track:
+    """一个目标轨迹"""
+
+    def __init__(self, track_id, distance, angle=None):
+        self.id = track_id
+        self.distance = distance
+        self.angle = angle      # 方位角（弧度），单天线时为None
+        self.age = 1            # 关联到检测的步骤数
+        self.missed = 0         # 连续没有关联到检测的步骤数
+
+    def as_dict(self):
+        return {'id': self.id, 'distance': self.distance,
+                'angle': None if self.angle is None else float(np.rad2deg(self.angle)),
+                'age': self.age, 'missed': self.missed}
+
+    def position(self):
+        """平面位置 (x, y)（米），x为横向、y为正前方；没有角度时视为正前方"""
+        angle = self.angle or 0.0
+        return self.distance * np.sin(angle), self.distance * np.cos(angle)
+
+
+class TargetTracker:
+    """
+    基于距离（或平面位置）的最近邻多目标跟踪器
+
+    每步把检测与轨迹的所有配对按距离差从小到大贪心关联（门限内），
+    没有关联到轨迹的检测创建新轨迹，连续多步没有关联到检测的轨迹被删除
+    """
+
+    def __init__(self, gate=TRACK_GATE, max_missed=MAX_MISSED_STEPS, smoothing=DISTANCE_SMOOTHING):
+        """
+        参数:
+            gate: 关联门限（米）
+            max_missed: 轨迹连续未关联的最大步骤数
+            smoothing: 轨迹距离的平滑系数（0-1，1表示直接使用新检测的距离）
+        """
+        self.gate = gate
+        self.max_missed = max_missed
+        self.smoothing = smoothing
+        self.tracks = []
+        self.next_id = 1
+
+    def update(self, distances, angles=None):
+        """
+        用本步骤检测到的目标距离更新轨迹
+
+        参数:
+            distances: 检测到的目标距离（米）序列
+            angles: 检测到的目标方位角（弧度）序列，None表示只按距离关联
+
+        返回:
+            与distances顺序相同的目标ID列表
+        """
+        distances = np.asarray(distances, dtype=float)
+        ids = [None] * len(distances)
+        matched_tracks = set()
+
+        if self.tracks and len(distances):
+            if angles is None:
+                track_distances = np.array([track.distance for track in self.tracks])
+                diff = np.abs(track_distances[:, np.newaxis] - distances[np.newaxis, :])
+            else:
+                # 同一距离、不同方向的目标在平面上相距较远，不会被关联到同一轨迹
+                track_xy = np.array([track.position() for track in self.tracks])
+                detection_xy = np.stack((distances * np.sin(angles), distances * np.cos(angles)), axis=1)
+                diff = np.linalg.norm(track_xy[:, np.newaxis, :] - detection_xy[np.newaxis, :, :], axis=2)
+            for flat in np.argsort(diff, axis=None):
+                t, d = np.unravel_index(flat, diff.shape)
+                if diff[t, d] > self.gate:
+                    break
+                if t in matched_tracks or ids[d] is not None:
+                    continue
+                track = self.tracks[t]
+                track.distance += self.smoothing * (float(distances[d]) - track.distance)
+                if angles is not None:
+                    angle = float(angles[d])
+                    track.angle = angle if track.angle is None else track.angle + self.smoothing * (angle - track.angle)
+                track.age += 1
+                track.missed = 0
+                matched_tracks.add(t)
+                ids[d] = track.id
+
+        # 未关联的轨迹计数，超过限制后删除
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            kept.append(track)
+
+        # 未关联的检测创建新轨迹
+        for d, distance in enumerate(distances):
+            if ids[d] is None:
+                track = Track(self.next_id, float(distance), None if angles is None else float(angles[d]))
+                self.next_id += 1
+                kept.append(track)
+                ids[d] = track.id
+
+        self.tracks = kept
+        return ids
+
+    def reset(self):
+        """清除所有轨迹（ID继续递增，不会与之前的目标混淆）"""
+        self.tracks = []
+
+    def get_tracks(self):
+        """当前轨迹列表（用于API输出）"""
+        return [track.as_dict() for track in self.tracks]
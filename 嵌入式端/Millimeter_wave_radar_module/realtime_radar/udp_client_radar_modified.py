@@ -43,6 +43,8 @@ import time
 import sys
 import struct  # 添加这行
 
+from radar_recording import RecordingWriter, RECORDING_EXTENSION
+
 
 BUFFER_SIZE = 65539
 
@@ -78,14 +80,15 @@ def udp_client_radar_test(server_ip, server_port):
                 except KeyboardInterrupt:
                         break
 
-def udp_client_radar(server_ip, server_port):
+def udp_client_radar(server_ip, server_port, compression=None):
     """
     处理雷达数据的UDP客户端
     - 每个UDP包是一个完整的帧
     - 每帧数据格式：
         - 2-6字节：帧号
         - 6字节之后：雷达数据
-    - 保存时在每帧前添加时间戳
+    - 保存为radar_recording格式：文件头保存雷达参数，每帧记录帧号和纳秒到达时间，
+      批量写入并生成索引文件；指定compression（zlib/lzma）时按块压缩保存
     """
     print("================================================================================")
     print("UDP Client for Radar data")
@@ -96,7 +99,7 @@ def udp_client_radar(server_ip, server_port):
     
     # 创建输出文件名（使用时间戳）
     timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
-    output_filename = f"radar_data_{timestamp}.bin"
+    output_filename = f"radar_data_{timestamp}{RECORDING_EXTENSION}"
     
     print(f"数据将被保存到: {output_filename}")
 
@@ -104,31 +107,25 @@ def udp_client_radar(server_ip, server_port):
     print("Start radar device with data tranmission enabled")
     s.sendto('{"radar_transmission":"enable"}'.encode(), (server_ip, server_port))
     
-    with open(output_filename, 'wb') as f:
+    with RecordingWriter(output_filename, metadata={'source': f"{server_ip}:{server_port}"},
+                         compression=compression) as writer:
         while True:
             try:
-                # 接收一帧数据
+                # 接收一帧数据，记录纳秒级到达时间
                 data, adr = s.recvfrom(BUFFER_SIZE)
+                arrival_ns = time.time_ns()
                 
                 # 获取帧号
                 frame_number = int.from_bytes(data[2:6], 'little')
                 print(f"帧号: {frame_number}")
                 
-                # 获取当前时间戳
-                current_timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
-                # 使用 encode() 将字符串转换为字节时，会自动添加一个字节的换行符
-                timestamp_bytes = current_timestamp.encode().ljust(14)
-                
-                # 写入时间戳（15字节）
-                f.write(timestamp_bytes)
-                
-                # 写入完整的帧数据（包含帧号和雷达数据）
-                f.write(data)
-                
-                f.flush()
+                # 写入缓冲区（满一批后写入文件，退出时写入剩余数据）
+                writer.write_datagram(data, arrival_ns)
 
             except KeyboardInterrupt:
                 break
+    
+    print(f"已保存 {writer.frames_written} 帧到 {output_filename}")
 
 	
 if __name__ == '__main__':
@@ -136,12 +133,13 @@ if __name__ == '__main__':
         parser.add_option("-p", "--port", dest="port", type="int", default=DEFAULT_PORT, help="Port to listen on [default: %default].")
         parser.add_option("--hostname", dest="hostname", default=DEFAULT_IP, help="Hostname or IP address of the server to connect to.")
         parser.add_option("-m", "--mode", dest="mode", type="string", default=DEFAULT_MODE, help="Mode for radar: test, data.")
+        parser.add_option("-c", "--compression", dest="compression", default=None, help="Recording compression: zlib, lzma [default: none].")
         (options, args) = parser.parse_args()
         #start udp client to connect to radar device
 
         if options.mode == "test":
                 udp_client_radar_test(options.hostname, options.port)
         else:
-                udp_client_radar(options.hostname, options.port)    
+                udp_client_radar(options.hostname, options.port, options.compression)    
 
 
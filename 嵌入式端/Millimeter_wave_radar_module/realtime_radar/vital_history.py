@@ -0,0 +1,385 @@
+"""
+生命体征历史存储
+最近的逐步结果保存在内存环形缓冲区中，同时由后台线程批量写入SQLite；
+写入时按分钟和小时增量更新预聚合表，历史范围查询直接读取聚合表
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+RING_SECONDS = 3600             # 内存中保存的逐步结果时长（秒，按每秒一步估算容量）
+FLUSH_INTERVAL = 5.0            # 批量写入间隔（秒）
+RAW_RETENTION_DAYS = 7          # SQLite中逐步结果的保留天数
+MINUTE_RETENTION_DAYS = 90      # 分钟聚合的保留天数（小时聚合永久保留）
+MAX_POINTS = 5000               # 单次查询最多返回的点数
+INLINE_FLUSH = 1000             # 没有后台线程（例如回放）时，积累多少条结果后直接写入
+
+RESOLUTIONS = {'raw': 0, 'minute': 60, 'hour': 3600}
+ROLLUP_TABLES = {'minute': 'rollup_minute', 'hour': 'rollup_hour'}
+
+# 环形缓冲区中每个结果的字段
+SAMPLE_DTYPE = np.dtype([('t', '<f8'), ('heart_rate', '<f4'), ('target_distance', '<f4'),
+                         ('presence', 'u1'), ('window_valid', 'u1'), ('respiration_rate', '<f4')])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    t REAL NOT NULL,
+    heart_rate REAL,
+    target_distance REAL,
+    presence INTEGER NOT NULL,
+    window_valid INTEGER NOT NULL,
+    respiration_rate REAL
+);
+CREATE INDEX IF NOT EXISTS samples_t ON samples (t);
+"""
+
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    presence_count INTEGER NOT NULL,
+    hr_count INTEGER NOT NULL,
+    hr_sum REAL NOT NULL,
+    hr_min REAL,
+    hr_max REAL,
+    distance_count INTEGER NOT NULL,
+    distance_sum REAL NOT NULL,
+    rr_count INTEGER NOT NULL DEFAULT 0,
+    rr_sum REAL NOT NULL DEFAULT 0,
+    rr_min REAL,
+    rr_max REAL
+);
+"""
+
+# 旧版本数据库中缺少的列（ALTER TABLE追加在表尾，与上面的建表语句列顺序一致）
+_ADDED_COLUMNS = {
+    'samples': (('respiration_rate', 'REAL'),),
+    'rollup': (('rr_count', 'INTEGER NOT NULL DEFAULT 0'), ('rr_sum', 'REAL NOT NULL DEFAULT 0'),
+               ('rr_min', 'REAL'), ('rr_max', 'REAL')),
+}
+
+# 与已有聚合行合并（增量更新）
+_ROLLUP_UPSERT = """
+INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(bucket) DO UPDATE SET
+    count = count + excluded.count,
+    presence_count = presence_count + excluded.presence_count,
+    hr_count = hr_count + excluded.hr_count,
+    hr_sum = hr_sum + excluded.hr_sum,
+    hr_min = CASE WHEN hr_min IS NULL OR excluded.hr_min < hr_min THEN excluded.hr_min ELSE hr_min END,
+    hr_max = CASE WHEN hr_max IS NULL OR excluded.hr_max > hr_max THEN excluded.hr_max ELSE hr_max END,
+    distance_count = distance_count + excluded.distance_count,
+    distance_sum = distance_sum + excluded.distance_sum,
+    rr_count = rr_count + excluded.rr_count,
+    rr_sum = rr_sum + excluded.rr_sum,
+    rr_min = CASE WHEN rr_min IS NULL OR excluded.rr_min < rr_min THEN excluded.rr_min ELSE rr_min END,
+    rr_max = CASE WHEN rr_max IS NULL OR excluded.rr_max > rr_max THEN excluded.rr_max ELSE rr_max END
+"""
+
+
+def _rollup_rows(samples, period):
+    """
+    把一批结果按时间桶聚合
+
+    参数:
+        samples: SAMPLE_DTYPE数组
+        period: 桶宽度（秒）
+
+    返回:
+        可直接用于_ROLLUP_UPSERT的行列表
+    """
+    buckets = (samples['t'] // period).astype(np.int64) * period
+    rows = []
+    for bucket in np.unique(buckets):
+        group = samples[buckets == bucket]
+        hr = group['heart_rate'][np.isfinite(group['heart_rate'])]
+        distance = group['target_distance'][np.isfinite(group['target_distance'])]
+        rr = group['respiration_rate'][np.isfinite(group['respiration_rate'])]
+        rows.append((int(bucket), len(group), int(group['presence'].sum()),
+                     len(hr), float(hr.sum()),
+                     float(hr.min()) if len(hr) else None, float(hr.max()) if len(hr) else None,
+                     len(distance), float(distance.sum()),
+                     len(rr), float(rr.sum()),
+                     float(rr.min()) if len(rr) else None, float(rr.max()) if len(rr) else None))
+    return rows
+
+
+class VitalHistory:
+    """
+    生命体征历史存储
+
+    add()由处理线程调用（只写内存环和待写入列表），后台线程每FLUSH_INTERVAL秒批量写入；
+    所有SQLite访问使用同一个连接并由锁保护
+    """
+
+    def __init__(self, db_path=None, ring_size=RING_SECONDS, flush_interval=FLUSH_INTERVAL,
+                 raw_retention_days=RAW_RETENTION_DAYS, minute_retention_days=MINUTE_RETENTION_DAYS,
+                 step_seconds=1.0):
+        """
+        参数:
+            db_path: SQLite数据库路径，None表示只保存在内存中（进程退出后丢失）
+            ring_size: 内存环形缓冲区容量（结果数）
+            flush_interval: 批量写入间隔（秒）
+            raw_retention_days: 逐步结果保留天数
+            minute_retention_days: 分钟聚合保留天数
+            step_seconds: 相邻结果的时间间隔（秒）；内存环中最早的结果比查询起点晚不超过一步时直接从内存环读取
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.step_seconds = step_seconds
+        self.raw_retention = raw_retention_days * 86400
+        self.minute_retention = minute_retention_days * 86400
+
+        self._ring = np.zeros(ring_size, dtype=SAMPLE_DTYPE)
+        self._count = 0             # 累计写入环的结果数
+        self._pending = []
+        self._pending_lock = threading.Lock()
+
+        if db_path and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path or ':memory:', check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            if db_path:
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(_SCHEMA)
+            self._add_missing_columns('samples', _ADDED_COLUMNS['samples'])
+            for table in ROLLUP_TABLES.values():
+                self._db.executescript(_ROLLUP_SCHEMA.format(table=table))
+                self._add_missing_columns(table, _ADDED_COLUMNS['rollup'])
+            self._db.commit()
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+        self.closed = False
+
+        self.samples_written = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.write_errors = 0
+
+    def _add_missing_columns(self, table, columns):
+        """为旧版本创建的表追加新增的列"""
+        existing = {row[1] for row in self._db.execute(f'PRAGMA table_info({table})')}
+        for name, definition in columns:
+            if name not in existing:
+                self._db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+    def start(self):
+        """启动后台写入线程"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, t, heart_rate, target_distance, presence, window_valid, respiration_rate=None):
+        """
+        记录一个处理步骤的结果（处理线程调用，不访问数据库）
+
+        参数:
+            t: 结果对应的时间（Unix秒）
+            heart_rate: 心率，None表示无结果
+            target_distance: 目标距离（米），None表示无目标
+            presence: 是否稳定检测到人体
+            window_valid: 窗口是否有效
+            respiration_rate: 呼吸频率（次/分钟），None表示无结果
+        """
+        sample = (t, np.nan if heart_rate is None else heart_rate,
+                  np.nan if target_distance is None else target_distance,
+                  1 if presence else 0, 1 if window_valid else 0,
+                  np.nan if respiration_rate is None else respiration_rate)
+        self._ring[self._count % len(self._ring)] = sample
+        self._count += 1
+        with self._pending_lock:
+            self._pending.append(sample)
+            pending = len(self._pending)
+        if self._thread is None and pending >= INLINE_FLUSH:
+            self.flush()
+
+    # ------------------------------------------------------------------ 写入
+
+    def flush(self):
+        """把待写入的结果批量写入SQLite并更新聚合表"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        samples = np.array(pending, dtype=SAMPLE_DTYPE)
+        rows = [(float(s['t']), None if np.isnan(s['heart_rate']) else float(s['heart_rate']),
+                 None if np.isnan(s['target_distance']) else float(s['target_distance']),
+                 int(s['presence']), int(s['window_valid']),
+                 None if np.isnan(s['respiration_rate']) else float(s['respiration_rate'])) for s in samples]
+        try:
+            with self._db_lock:
+                with self._db:
+                    self._db.executemany('INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)', rows)
+                    for name, table in ROLLUP_TABLES.items():
+                        self._db.executemany(_ROLLUP_UPSERT.format(table=table),
+                                             _rollup_rows(samples, RESOLUTIONS[name]))
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            print(f"历史数据写入失败: {e}")
+            return 0
+        self.samples_written += len(rows)
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return len(rows)
+
+    def prune(self, now=None):
+        """删除超过保留期的逐步结果和分钟聚合"""
+        now = time.time() if now is None else now
+        with self._db_lock:
+            with self._db:
+                self._db.execute('DELETE FROM samples WHERE t < ?', (now - self.raw_retention,))
+                self._db.execute('DELETE FROM rollup_minute WHERE bucket < ?', (now - self.minute_retention,))
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self._last_prune > 3600:
+                self.prune()
+                self._last_prune = time.time()
+        self.flush()
+
+    def close(self):
+        """写入剩余结果并关闭数据库"""
+        if self.closed:
+            return
+        self.closed = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------ 查询
+
+    def recent(self, start=None):
+        """
+        内存环中的结果（按时间顺序）
+
+        参数:
+            start: 只返回不早于该时间的结果
+        """
+        count = min(self._count, len(self._ring))
+        end = self._count % len(self._ring)
+        samples = np.concatenate([self._ring[end:], self._ring[:end]])[-count:] if count else self._ring[:0]
+        if start is not None:
+            samples = samples[samples['t'] >= start]
+        return samples
+
+    @staticmethod
+    def choose_resolution(span):
+        """按查询跨度自动选择分辨率：不超过2小时用逐步结果，不超过3天用分钟聚合，否则用小时聚合"""
+        if span <= 2 * 3600:
+            return 'raw'
+        if span <= 3 * 86400:
+            return 'minute'
+        return 'hour'
+
+    def query(self, start, end, resolution='auto', limit=MAX_POINTS):
+        """
+        查询时间范围内的历史
+
+        参数:
+            start: 起始时间（Unix秒）
+            end: 结束时间（Unix秒）
+            resolution: 'raw'、'minute'、'hour'或'auto'
+            limit: 最多返回的点数
+
+        返回:
+            (实际分辨率, 点列表)；逐步结果的点为 {t, heart_rate, respiration_rate, target_distance, presence,
+            window_valid}，聚合点为 {t, count, hr_mean, hr_min, hr_max, hr_count, rr_mean, rr_min, rr_max,
+            rr_count, presence_ratio, distance_mean}
+        """
+        if resolution == 'auto':
+            resolution = self.choose_resolution(end - start)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"不支持的分辨率: {resolution}，可选: auto, {', '.join(RESOLUTIONS)}")
+
+        if resolution == 'raw':
+            return resolution, self._query_raw(start, end, limit)
+
+        period = RESOLUTIONS[resolution]
+        first_bucket = int(start // period * period)
+        with self._db_lock:
+            rows = self._db.execute(
+                f'SELECT * FROM {ROLLUP_TABLES[resolution]} WHERE bucket >= ? AND bucket < ? '
+                f'ORDER BY bucket LIMIT ?', (first_bucket, end, limit)).fetchall()
+        # 合并尚未写入数据库的结果
+        points = {row[0]: list(row) for row in rows}
+        with self._pending_lock:
+            pending = np.array(self._pending, dtype=SAMPLE_DTYPE)
+        if len(pending):
+            pending = pending[(pending['t'] >= first_bucket) & (pending['t'] < end)]
+            for row in _rollup_rows(pending, period):
+                if row[0] in points:
+                    old = points[row[0]]
+                    for i in (1, 2, 3, 4, 7, 8, 9, 10):
+                        old[i] += row[i]
+                    for i, pick in ((5, min), (6, max), (11, min), (12, max)):
+                        values = [v for v in (old[i], row[i]) if v is not None]
+                        old[i] = pick(values) if values else None
+                elif len(points) < limit:
+                    points[row[0]] = list(row)
+
+        result = []
+        for bucket in sorted(points):
+            (_, count, presence_count, hr_count, hr_sum, hr_min, hr_max, distance_count, distance_sum,
+             rr_count, rr_sum, rr_min, rr_max) = points[bucket]
+            result.append({
+                't': bucket,
+                'count': count,
+                'hr_mean': hr_sum / hr_count if hr_count else None,
+                'hr_min': hr_min,
+                'hr_max': hr_max,
+                'hr_count': hr_count,
+                'rr_mean': rr_sum / rr_count if rr_count else None,
+                'rr_min': rr_min,
+                'rr_max': rr_max,
+                'rr_count': rr_count,
+                'presence_ratio': presence_count / count if count else 0.0,
+                'distance_mean': distance_sum / distance_count if distance_count else None,
+            })
+        return resolution, result
+
+    def _query_raw(self, start, end, limit):
+        """逐步结果：范围在内存环内（起点前最多差一步）时直接读取，否则查询数据库"""
+        recent = self.recent()
+        if len(recent) and recent['t'][0] <= start + self.step_seconds:
+            samples = recent[(recent['t'] >= start) & (recent['t'] < end)][:limit]
+            return [{'t': float(s['t']),
+                     'heart_rate': None if np.isnan(s['heart_rate']) else float(s['heart_rate']),
+                     'respiration_rate': None if np.isnan(s['respiration_rate']) else float(s['respiration_rate']),
+                     'target_distance': None if np.isnan(s['target_distance']) else float(s['target_distance']),
+                     'presence': bool(s['presence']), 'window_valid': bool(s['window_valid'])}
+                    for s in samples]
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute('SELECT * FROM samples WHERE t >= ? AND t < ? ORDER BY t LIMIT ?',
+                                    (start, end, limit)).fetchall()
+        return [{'t': t, 'heart_rate': hr, 'respiration_rate': rr, 'target_distance': distance,
+                 'presence': bool(presence), 'window_valid': bool(valid)}
+                for t, hr, distance, presence, valid, rr in rows]
+
+    def get_stats(self):
+        """存储统计（用于API输出）"""
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'db_path': self.db_path,
+            'ring_samples': min(self._count, len(self._ring)),
+            'pending': pending,
+            'samples_written': self.samples_written,
+            'flushes': self.flushes,
+            'last_flush_ms': self.last_flush_ms,
+            'write_errors': self.write_errors,
+        }